@@ -15,9 +15,13 @@
 """Utilities for agents."""
 
 import ast
+from collections.abc import Sequence
+import concurrent.futures
 import json
 import re
-from typing import Any
+from typing import Any, Callable, TypeVar
+
+T = TypeVar('T')
 
 
 def extract_json(s: str) -> dict[str, Any] | None:
@@ -50,3 +54,87 @@ def extract_json(s: str) -> dict[str, Any] | None:
         return None
   else:
     return None
+
+
+def first_valid_prediction(
+    predict_fn: Callable[[], T],
+    is_valid: Callable[[T], bool],
+    num_candidates: int = 1,
+) -> T:
+  """Samples candidates concurrently and returns the first valid one.
+
+  Candidates still running when a valid one completes are abandoned; the ones
+  that have not started yet are cancelled.
+
+  Args:
+    predict_fn: Function sampling one candidate, e.g. an LLM call.
+    is_valid: Predicate deciding whether a candidate can be used as is.
+    num_candidates: Number of candidates to sample. With 1, `predict_fn` is
+      called directly on the calling thread.
+
+  Returns:
+    The first candidate to complete that is valid, or, if none is valid, the
+    first one to complete.
+
+  Raises:
+    Exception: The error raised by the first candidate, if all of them raised.
+  """
+  if num_candidates <= 1:
+    return predict_fn()
+
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_candidates)
+  futures = [executor.submit(predict_fn) for _ in range(num_candidates)]
+  fallback = []
+  first_error = None
+  try:
+    for future in concurrent.futures.as_completed(futures):
+      try:
+        candidate = future.result()
+      except Exception as error:  # pylint: disable=broad-exception-caught
+        first_error = first_error or error
+        continue
+      if is_valid(candidate):
+        return candidate
+      if not fallback:
+        fallback.append(candidate)
+  finally:
+    executor.shutdown(wait=False, cancel_futures=True)
+  if fallback:
+    return fallback[0]
+  raise first_error
+
+
+class StepHistory(Sequence[dict[str, Any]]):
+  """History of an agent's steps, keeping only what prompts are built from.
+
+  The full step data, with screenshots and raw LLM responses, is returned to
+  the episode runner, which records it. The history only keeps the fields
+  listed in `retained_keys`, so it does not hold on to the step data after the
+  runner is done with it.
+  """
+
+  def __init__(self, retained_keys: Sequence[str] = ('summary',)):
+    self.retained_keys = tuple(retained_keys)
+    self._steps: list[dict[str, Any]] = []
+
+  def _compact(self, step_data: dict[str, Any]) -> dict[str, Any]:
+    return {key: step_data.get(key) for key in self.retained_keys}
+
+  def append(self, step_data: dict[str, Any]) -> dict[str, Any]:
+    """Records a step and returns its compact record."""
+    record = self._compact(step_data)
+    self._steps.append(record)
+    return record
+
+  def update(self, record: dict[str, Any], step_data: dict[str, Any]) -> None:
+    """Refreshes a record from step data filled in after it was appended."""
+    record.update(self._compact(step_data))
+
+  def clear(self) -> None:
+    self._steps.clear()
+
+  def __getitem__(self, index):
+    return self._steps[index]
+
+  def __len__(self) -> int:
+    return len(self._steps)
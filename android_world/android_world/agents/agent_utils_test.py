@@ -0,0 +1,144 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for agent_utils."""
+
+import threading
+
+from absl.testing import absltest
+from android_world.agents import agent_utils
+
+
+class FirstValidPredictionTest(absltest.TestCase):
+
+  def test_single_candidate_runs_on_calling_thread(self):
+    threads = []
+
+    def predict():
+      threads.append(threading.current_thread())
+      return 'invalid'
+
+    result = agent_utils.first_valid_prediction(
+        predict, lambda x: x == 'valid', num_candidates=1
+    )
+
+    self.assertEqual(result, 'invalid')
+    self.assertEqual(threads, [threading.current_thread()])
+
+  def test_returns_valid_candidate_completing_after_invalid_one(self):
+    outputs = iter(['invalid', 'valid', 'invalid'])
+    lock = threading.Lock()
+    invalid_returned = threading.Event()
+
+    def predict():
+      with lock:
+        output = next(outputs)
+      if output == 'valid':
+        # Only complete after an invalid candidate did.
+        invalid_returned.wait(timeout=5)
+      else:
+        invalid_returned.set()
+      return output
+
+    result = agent_utils.first_valid_prediction(
+        predict, lambda x: x == 'valid', num_candidates=3
+    )
+
+    self.assertEqual(result, 'valid')
+
+  def test_does_not_wait_for_slow_candidates(self):
+    outputs = iter(['valid', 'slow'])
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def predict():
+      with lock:
+        output = next(outputs)
+      if output == 'slow':
+        release.wait(timeout=5)
+      return output
+
+    result = agent_utils.first_valid_prediction(
+        predict, lambda x: x == 'valid', num_candidates=2
+    )
+    release.set()
+
+    self.assertEqual(result, 'valid')
+
+  def test_falls_back_to_invalid_candidate(self):
+    result = agent_utils.first_valid_prediction(
+        lambda: 'invalid', lambda x: x == 'valid', num_candidates=3
+    )
+
+    self.assertEqual(result, 'invalid')
+
+  def test_ignores_failed_candidates(self):
+    outputs = iter([RuntimeError('boom'), 'invalid'])
+    lock = threading.Lock()
+
+    def predict():
+      with lock:
+        output = next(outputs)
+      if isinstance(output, Exception):
+        raise output
+      return output
+
+    result = agent_utils.first_valid_prediction(
+        predict, lambda x: x == 'valid', num_candidates=2
+    )
+
+    self.assertEqual(result, 'invalid')
+
+  def test_raises_if_all_candidates_fail(self):
+    def predict():
+      raise RuntimeError('boom')
+
+    with self.assertRaisesRegex(RuntimeError, 'boom'):
+      agent_utils.first_valid_prediction(
+          predict, lambda x: True, num_candidates=2
+      )
+
+
+class StepHistoryTest(absltest.TestCase):
+
+  def test_keeps_only_retained_keys(self):
+    history = agent_utils.StepHistory()
+
+    history.append({'summary': 'a', 'raw_screenshot': object()})
+    history.append({'summary': 'b'})
+
+    self.assertEqual(list(history), [{'summary': 'a'}, {'summary': 'b'}])
+    self.assertEqual(history[-1], {'summary': 'b'})
+
+  def test_update_record(self):
+    history = agent_utils.StepHistory(retained_keys=('summary', 'action'))
+    step_data = {'summary': None, 'action': 'tap'}
+
+    record = history.append(step_data)
+    step_data['summary'] = 'done'
+    history.update(record, step_data)
+
+    self.assertEqual(history[0], {'summary': 'done', 'action': 'tap'})
+
+  def test_clear(self):
+    history = agent_utils.StepHistory()
+    history.append({'summary': 'a'})
+
+    history.clear()
+
+    self.assertEmpty(history)
+
+
+if __name__ == '__main__':
+  absltest.main()
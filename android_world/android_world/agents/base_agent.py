@@ -98,6 +98,14 @@ class EnvironmentInteractingAgent(abc.ABC):
     """Resets the agent."""
     self.env.reset(go_home=go_home)
 
+  def flush(self) -> None:
+    """Waits for work that `step` left running in the background.
+
+    Agents may finish filling in the data of a step after returning it, e.g.
+    to overlap an LLM call with the next observation. Once this returns, the
+    data of all previous steps is complete. Does nothing by default.
+    """
+
   def get_post_transition_state(self) -> interface.State:
     """Convenience function to get the agent state after the transition."""
     if self._transition_pause is None:
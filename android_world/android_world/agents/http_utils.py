@@ -0,0 +1,163 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pooled HTTP session shared by the LLM wrappers."""
+
+import asyncio
+import contextlib
+import os
+import threading
+from typing import Any, Callable, Iterator, Optional, Union
+
+import requests
+from requests import adapters
+
+OPENAI_CHAT_COMPLETIONS_URL = 'https://api.openai.com/v1/chat/completions'
+
+# Overrides the base URL of the OpenAI API, e.g. to point the agents at a local
+# OpenAI-compatible server such as `llm_stub_server`.
+OPENAI_BASE_URL_ENV_VAR = 'OPENAI_BASE_URL'
+
+# Either a single timeout, or a (connect, read) pair, in seconds.
+Timeout = Union[float, tuple[float, float]]
+DEFAULT_TIMEOUT_SEC: Timeout = (10.0, 300.0)
+
+# Maximum number of keep-alive connections kept open per host. Should be at
+# least the number of requests issued concurrently, e.g. by parallel episodes.
+_POOL_MAXSIZE = 32
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Posts a JSON payload and returns the response and its decoded body, see
+# `post_json`.
+Transport = Callable[
+    [str, dict[str, Any], Optional[dict[str, str]], Optional[Timeout]],
+    tuple[requests.Response, Optional[Any]],
+]
+
+_transport: Optional[Transport] = None
+
+
+def openai_chat_completions_url() -> str:
+  """Returns the chat completions URL, honoring `OPENAI_BASE_URL`."""
+  base_url = os.environ.get(OPENAI_BASE_URL_ENV_VAR)
+  if not base_url:
+    return OPENAI_CHAT_COMPLETIONS_URL
+  return base_url.rstrip('/') + '/chat/completions'
+
+
+def get_session() -> requests.Session:
+  """Returns the process-wide session, creating it on first use.
+
+  Reusing the session keeps connections alive between calls, so consecutive
+  LLM requests skip the TCP and TLS handshakes.
+  """
+  global _session
+  with _session_lock:
+    if _session is None:
+      session = requests.Session()
+      adapter = adapters.HTTPAdapter(
+          pool_connections=4, pool_maxsize=_POOL_MAXSIZE
+      )
+      session.mount('https://', adapter)
+      session.mount('http://', adapter)
+      _session = session
+    return _session
+
+
+def close_session() -> None:
+  """Closes the shared session and its pooled connections."""
+  global _session
+  with _session_lock:
+    if _session is not None:
+      _session.close()
+      _session = None
+
+
+def session_transport(
+    url: str,
+    payload: dict[str, Any],
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[Timeout] = DEFAULT_TIMEOUT_SEC,
+) -> tuple[requests.Response, Optional[Any]]:
+  """Default transport, posting over the network with the shared session."""
+  response = get_session().post(
+      url, headers=headers, json=payload, timeout=timeout
+  )
+  try:
+    body = response.json()
+  except ValueError:
+    body = None
+  return response, body
+
+
+@contextlib.contextmanager
+def use_transport(transport: Transport) -> Iterator[Transport]:
+  """Routes all `post_json` calls through `transport` within the context.
+
+  The transport is process-wide rather than thread-local, so requests issued
+  from worker threads, e.g. concurrent action candidates, are routed too.
+
+  Args:
+    transport: The transport to use, e.g. a `llm_replay.RecordingTransport`.
+
+  Yields:
+    The transport.
+  """
+  global _transport
+  previous = _transport
+  _transport = transport
+  try:
+    yield transport
+  finally:
+    _transport = previous
+
+
+def post_json(
+    url: str,
+    payload: dict[str, Any],
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[Timeout] = DEFAULT_TIMEOUT_SEC,
+) -> tuple[requests.Response, Optional[Any]]:
+  """Posts a JSON payload using the current transport.
+
+  Unless overridden with `use_transport`, this uses the shared session.
+
+  Args:
+    url: The URL to post to.
+    payload: The JSON payload.
+    headers: Request headers.
+    timeout: Timeout in seconds, see `Timeout`. None waits forever.
+
+  Returns:
+    The response and its decoded JSON body, or None if the body is not valid
+    JSON. The body is only decoded once.
+  """
+  transport = _transport or session_transport
+  return transport(url, payload, headers, timeout)
+
+
+async def post_json_async(
+    url: str,
+    payload: dict[str, Any],
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[Timeout] = DEFAULT_TIMEOUT_SEC,
+) -> tuple[requests.Response, Optional[Any]]:
+  """Same as `post_json`, without blocking the event loop.
+
+  Requests run in the default executor and share the connection pool, so many
+  calls can be in flight at once.
+  """
+  return await asyncio.to_thread(post_json, url, payload, headers, timeout)
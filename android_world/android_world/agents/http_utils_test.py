@@ -0,0 +1,163 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for http_utils, against a local stub HTTP server."""
+
+import asyncio
+from http import server
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import http_utils
+import requests
+
+
+class _StubHandler(server.BaseHTTPRequestHandler):
+  """Echoes the JSON payload back and counts connections."""
+
+  protocol_version = 'HTTP/1.1'  # Enables keep-alive.
+  disable_nagle_algorithm = True
+
+  def setup(self):
+    super().setup()
+    with self.server.lock:
+      self.server.num_connections += 1
+
+  def do_POST(self):  # pylint: disable=invalid-name
+    length = int(self.headers['Content-Length'])
+    payload = json.loads(self.rfile.read(length))
+    delay_sec = payload.get('delay_sec', 0.0)
+    if delay_sec:
+      time.sleep(delay_sec)
+    if payload.get('invalid'):
+      body = b'not json'
+    else:
+      body = json.dumps({'echo': payload}).encode()
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    del args
+
+
+class HttpUtilsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.server = server.ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    self.server.lock = threading.Lock()
+    self.server.num_connections = 0
+    self.server.daemon_threads = True
+    thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    thread.start()
+    self.url = f'http://127.0.0.1:{self.server.server_port}/'
+    http_utils.close_session()
+
+  def tearDown(self):
+    http_utils.close_session()
+    self.server.shutdown()
+    self.server.server_close()
+    super().tearDown()
+
+  def test_post_json_decodes_body(self):
+    response, body = http_utils.post_json(self.url, {'a': 1})
+
+    self.assertTrue(response.ok)
+    self.assertEqual(body, {'echo': {'a': 1}})
+
+  def test_post_json_invalid_body(self):
+    response, body = http_utils.post_json(self.url, {'invalid': True})
+
+    self.assertTrue(response.ok)
+    self.assertIsNone(body)
+    self.assertEqual(response.text, 'not json')
+
+  def test_connections_are_reused(self):
+    for i in range(20):
+      http_utils.post_json(self.url, {'i': i})
+
+    self.assertEqual(self.server.num_connections, 1)
+
+  def test_new_connection_after_close(self):
+    http_utils.post_json(self.url, {})
+    http_utils.close_session()
+    http_utils.post_json(self.url, {})
+
+    self.assertEqual(self.server.num_connections, 2)
+
+  def test_post_json_async_runs_concurrently(self):
+    num_requests = 8
+    delay_sec = 0.2
+
+    async def post_all():
+      return await asyncio.gather(*[
+          http_utils.post_json_async(self.url, {'i': i, 'delay_sec': delay_sec})
+          for i in range(num_requests)
+      ])
+
+    start = time.monotonic()
+    results = asyncio.run(post_all())
+    elapsed = time.monotonic() - start
+
+    self.assertEqual(
+        [body['echo']['i'] for _, body in results], list(range(num_requests))
+    )
+    # Sequential requests would take num_requests * delay_sec.
+    self.assertLess(elapsed, num_requests * delay_sec / 2)
+
+  def test_timeout(self):
+    with self.assertRaises(requests.exceptions.Timeout):
+      http_utils.post_json(self.url, {'delay_sec': 1.0}, timeout=0.1)
+
+  def test_use_transport(self):
+    transport = mock.Mock(return_value=(mock.Mock(), {'a': 1}))
+
+    with http_utils.use_transport(transport):
+      _, body = http_utils.post_json(self.url, {'b': 2}, timeout=1.0)
+    _, body_after = http_utils.post_json(self.url, {'b': 2})
+
+    self.assertEqual(body, {'a': 1})
+    transport.assert_called_once_with(self.url, {'b': 2}, None, 1.0)
+    self.assertEqual(body_after, {'echo': {'b': 2}})
+    self.assertEqual(self.server.num_connections, 1)
+
+
+class OpenAiUrlTest(absltest.TestCase):
+
+  def test_default(self):
+    with mock.patch.dict(os.environ, clear=True):
+      self.assertEqual(
+          http_utils.openai_chat_completions_url(),
+          http_utils.OPENAI_CHAT_COMPLETIONS_URL,
+      )
+
+  def test_base_url_override(self):
+    with mock.patch.dict(
+        os.environ, {http_utils.OPENAI_BASE_URL_ENV_VAR: 'http://host:1/v1/'}
+    ):
+      self.assertEqual(
+          http_utils.openai_chat_completions_url(),
+          'http://host:1/v1/chat/completions',
+      )
+
+
+if __name__ == '__main__':
+  absltest.main()
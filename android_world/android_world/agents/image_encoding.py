@@ -0,0 +1,151 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Encodes screenshots for multimodal LLM requests."""
+
+import base64
+import collections
+import dataclasses
+import hashlib
+import io
+import threading
+from typing import Any, Optional
+
+import numpy as np
+from PIL import Image
+
+
+@dataclasses.dataclass(frozen=True)
+class EncodedImage:
+  """An image encoded for upload.
+
+  Attributes:
+    data: The encoded image bytes.
+    mime_type: MIME type of `data`, e.g. 'image/jpeg'.
+  """
+
+  data: bytes
+  mime_type: str
+
+  def to_base64(self) -> str:
+    return base64.b64encode(self.data).decode('utf-8')
+
+  def to_data_url(self) -> str:
+    return f'data:{self.mime_type};base64,{self.to_base64()}'
+
+  def to_blob(self) -> dict[str, Any]:
+    """Returns the image as a blob dict accepted by the Gemini API."""
+    return {'mime_type': self.mime_type, 'data': self.data}
+
+
+def _array_key(image: np.ndarray) -> tuple[Any, ...]:
+  """Returns a key identifying the contents of an array."""
+  image = np.ascontiguousarray(image)
+  # SHA-256 is hardware accelerated on most CPUs, and much cheaper than
+  # re-encoding the image.
+  digest = hashlib.sha256(memoryview(image).cast('B'))
+  return image.shape, image.dtype.str, digest.digest()
+
+
+class ImageEncoder:
+  """Encodes numpy images, optionally downscaled, with an LRU cache.
+
+  Agents often send the same frame several times per step (e.g. once for
+  action selection and once for summarization). Results are cached by the
+  contents of the array, so a frame is only resized and encoded once, even if
+  it was copied in between.
+  """
+
+  def __init__(
+      self,
+      image_format: str = 'JPEG',
+      max_side: Optional[int] = None,
+      quality: Optional[int] = None,
+      cache_size: int = 8,
+  ):
+    """Initializes the encoder.
+
+    Args:
+      image_format: PIL format to encode to, e.g. 'JPEG' or 'WEBP'. WEBP is
+        lossless unless `quality` is set.
+      max_side: If set, images whose width or height exceeds this are
+        downscaled, keeping their aspect ratio, before being encoded.
+      quality: Encoder quality, between 0 and 100. Defaults to PIL's default
+        for the format.
+      cache_size: Maximum number of encoded images to keep.
+    """
+    if max_side is not None and max_side <= 0:
+      raise ValueError(f'max_side must be positive, got {max_side}.')
+    self.image_format = image_format.upper()
+    self.max_side = max_side
+    self.quality = quality
+    self._cache_size = cache_size
+    self._cache: collections.OrderedDict[tuple[Any, ...], EncodedImage] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+    self.num_cache_hits = 0
+    self.num_cache_misses = 0
+
+  @property
+  def mime_type(self) -> str:
+    return Image.MIME[self.image_format]
+
+  def _save_kwargs(self) -> dict[str, Any]:
+    if self.quality is not None:
+      return {'quality': self.quality}
+    if self.image_format == 'WEBP':
+      return {'lossless': True}
+    return {}
+
+  def resize(self, image: Image.Image) -> Image.Image:
+    """Downscales the image so that neither side exceeds `max_side`."""
+    if self.max_side is None or max(image.size) <= self.max_side:
+      return image
+    scale = self.max_side / max(image.size)
+    size = (
+        max(1, round(image.width * scale)),
+        max(1, round(image.height * scale)),
+    )
+    return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+  def _encode(self, image: np.ndarray) -> EncodedImage:
+    pil_image = self.resize(Image.fromarray(image))
+    if self.image_format == 'JPEG' and pil_image.mode != 'RGB':
+      pil_image = pil_image.convert('RGB')
+    buffer = io.BytesIO()
+    pil_image.save(buffer, format=self.image_format, **self._save_kwargs())
+    return EncodedImage(buffer.getvalue(), self.mime_type)
+
+  def encode(self, image: np.ndarray) -> EncodedImage:
+    """Encodes an image, reusing a previous result for identical contents."""
+    key = _array_key(image)
+    with self._lock:
+      encoded = self._cache.get(key)
+      if encoded is not None:
+        self._cache.move_to_end(key)
+        self.num_cache_hits += 1
+        return encoded
+      self.num_cache_misses += 1
+
+    encoded = self._encode(image)
+    with self._lock:
+      self._cache[key] = encoded
+      while len(self._cache) > self._cache_size:
+        self._cache.popitem(last=False)
+    return encoded
+
+  def clear_cache(self) -> None:
+    with self._lock:
+      self._cache.clear()
@@ -0,0 +1,134 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for image_encoding."""
+
+import io
+
+from absl.testing import absltest
+from android_world.agents import image_encoding
+import numpy as np
+from PIL import Image
+
+
+def _random_image(height: int = 64, width: int = 32, seed: int = 0):
+  rng = np.random.default_rng(seed)
+  return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def _decode(encoded: image_encoding.EncodedImage) -> Image.Image:
+  return Image.open(io.BytesIO(encoded.data))
+
+
+class ImageEncoderTest(absltest.TestCase):
+
+  def test_encode_jpeg(self):
+    encoder = image_encoding.ImageEncoder()
+
+    encoded = encoder.encode(_random_image())
+
+    self.assertEqual(encoded.mime_type, 'image/jpeg')
+    self.assertEqual(_decode(encoded).format, 'JPEG')
+    self.assertEqual(_decode(encoded).size, (32, 64))
+    self.assertTrue(
+        encoded.to_data_url().startswith('data:image/jpeg;base64,')
+    )
+
+  def test_encode_webp_is_lossless_by_default(self):
+    image = _random_image()
+    encoder = image_encoding.ImageEncoder('WEBP')
+
+    encoded = encoder.encode(image)
+
+    self.assertEqual(encoded.mime_type, 'image/webp')
+    np.testing.assert_array_equal(
+        np.asarray(_decode(encoded).convert('RGB')), image
+    )
+
+  def test_cache_is_keyed_by_contents(self):
+    image = _random_image()
+    encoder = image_encoding.ImageEncoder()
+
+    first = encoder.encode(image)
+    second = encoder.encode(image.copy())
+    other = encoder.encode(_random_image(seed=1))
+
+    self.assertIs(first, second)
+    self.assertIsNot(first, other)
+    self.assertEqual(encoder.num_cache_hits, 1)
+    self.assertEqual(encoder.num_cache_misses, 2)
+
+  def test_mutated_image_is_reencoded(self):
+    image = _random_image()
+    encoder = image_encoding.ImageEncoder()
+    first = encoder.encode(image)
+
+    image[0, 0] = 255 - image[0, 0]
+    second = encoder.encode(image)
+
+    self.assertIsNot(first, second)
+    self.assertEqual(encoder.num_cache_misses, 2)
+
+  def test_non_contiguous_image(self):
+    image = _random_image()
+    encoder = image_encoding.ImageEncoder()
+
+    encoded = encoder.encode(image[:, ::2])
+
+    self.assertEqual(_decode(encoded).size, (16, 64))
+    self.assertIs(encoder.encode(np.ascontiguousarray(image[:, ::2])), encoded)
+
+  def test_cache_evicts_least_recently_used(self):
+    images = [_random_image(seed=i) for i in range(3)]
+    encoder = image_encoding.ImageEncoder(cache_size=2)
+
+    encoder.encode(images[0])
+    encoder.encode(images[1])
+    encoder.encode(images[0])
+    encoder.encode(images[2])  # Evicts images[1].
+    encoder.encode(images[0])
+    encoder.encode(images[1])
+
+    self.assertEqual(encoder.num_cache_hits, 2)
+    self.assertEqual(encoder.num_cache_misses, 4)
+
+  def test_downscales_to_max_side(self):
+    encoder = image_encoding.ImageEncoder(max_side=16)
+
+    encoded = encoder.encode(_random_image(height=64, width=32))
+
+    self.assertEqual(_decode(encoded).size, (8, 16))
+
+  def test_small_images_are_not_resized(self):
+    encoder = image_encoding.ImageEncoder(max_side=100)
+
+    encoded = encoder.encode(_random_image(height=64, width=32))
+
+    self.assertEqual(_decode(encoded).size, (32, 64))
+
+  def test_quality_shrinks_output(self):
+    image = _random_image(height=128, width=128)
+
+    high = image_encoding.ImageEncoder(quality=95).encode(image)
+    low = image_encoding.ImageEncoder(quality=30).encode(image)
+
+    self.assertLess(len(low.data), len(high.data))
+
+  def test_invalid_max_side(self):
+    with self.assertRaises(ValueError):
+      image_encoding.ImageEncoder(max_side=0)
+
+
+if __name__ == '__main__':
+  absltest.main()
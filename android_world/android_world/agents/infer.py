@@ -15,11 +15,18 @@
 """Some LLM inference interface."""
 
 import abc
+import asyncio
 import base64
+import collections
+import dataclasses
+import hashlib
 import io
 import os
+import threading
 import time
 from typing import Any, Optional
+from android_world.agents import http_utils
+from android_world.agents import image_encoding
 import google.generativeai as genai
 from google.generativeai import types
 from google.generativeai.types import answer_types
@@ -34,6 +41,260 @@ import requests
 ERROR_CALLING_LLM = 'Error calling LLM'
 
 
+@dataclasses.dataclass(frozen=True)
+class ResponseRecord:
+  """Compact record of a raw LLM response, stored in step data.
+
+  Raw responses, e.g. `requests.Response` objects, carry connection state and
+  headers, are large to pickle, and may not unpickle with other library
+  versions. This keeps what is useful to analyze an episode.
+
+  Attributes:
+    text: The text of the first candidate.
+    model: The model that produced the response, if known.
+    finish_reason: Why generation stopped, e.g. 'stop' or 'SAFETY'.
+    prompt_tokens: Number of input tokens, if reported.
+    completion_tokens: Number of output tokens, if reported.
+    cached_tokens: Number of input tokens served from the provider's prompt
+      cache, if reported.
+    latency_sec: Wall-clock time of the call, including retries, if measured.
+  """
+
+  text: Optional[str] = None
+  model: Optional[str] = None
+  finish_reason: Optional[str] = None
+  prompt_tokens: Optional[int] = None
+  completion_tokens: Optional[int] = None
+  cached_tokens: Optional[int] = None
+  latency_sec: Optional[float] = None
+
+
+def to_response_record(
+    raw_response: Any, latency_sec: Optional[float] = None
+) -> Optional[ResponseRecord]:
+  """Converts a raw response returned by a wrapper to a `ResponseRecord`.
+
+  Args:
+    raw_response: The raw response, e.g. from `Gpt4Wrapper` or
+      `GeminiGcpWrapper`. Other types are recorded by their string
+      representation.
+    latency_sec: Wall-clock time of the call.
+
+  Returns:
+    The record, or None if there is no response.
+  """
+  if raw_response is None:
+    return None
+  if isinstance(raw_response, ResponseRecord):
+    if latency_sec is None:
+      return raw_response
+    return dataclasses.replace(raw_response, latency_sec=latency_sec)
+  if isinstance(raw_response, requests.Response):
+    return _openai_response_record(raw_response, latency_sec)
+  if hasattr(raw_response, 'candidates'):
+    return _gemini_response_record(raw_response, latency_sec)
+  return ResponseRecord(text=str(raw_response), latency_sec=latency_sec)
+
+
+def _openai_response_record(
+    response: requests.Response, latency_sec: Optional[float]
+) -> ResponseRecord:
+  try:
+    body = response.json()
+  except ValueError:
+    return ResponseRecord(text=response.text, latency_sec=latency_sec)
+  choice = (body.get('choices') or [{}])[0]
+  usage = body.get('usage') or {}
+  return ResponseRecord(
+      text=(choice.get('message') or {}).get('content'),
+      model=body.get('model'),
+      finish_reason=choice.get('finish_reason'),
+      prompt_tokens=usage.get('prompt_tokens'),
+      completion_tokens=usage.get('completion_tokens'),
+      cached_tokens=openai_cached_tokens(body),
+      latency_sec=latency_sec,
+  )
+
+
+def _gemini_response_record(
+    response: Any, latency_sec: Optional[float]
+) -> ResponseRecord:
+  try:
+    text = response.text
+  except Exception:  # pylint: disable=broad-exception-caught
+    # Raised when the response has no text, e.g. if it was blocked.
+    text = None
+  finish_reason = None
+  if response.candidates:
+    reason = response.candidates[0].finish_reason
+    finish_reason = getattr(reason, 'name', str(reason))
+  usage = getattr(response, 'usage_metadata', None)
+  return ResponseRecord(
+      text=text,
+      model=getattr(response, 'model_version', None) or None,
+      finish_reason=finish_reason,
+      prompt_tokens=getattr(usage, 'prompt_token_count', None),
+      completion_tokens=getattr(usage, 'candidates_token_count', None),
+      cached_tokens=getattr(usage, 'cached_content_token_count', None),
+      latency_sec=latency_sec,
+  )
+
+
+def openai_cached_tokens(body: Any) -> Optional[int]:
+  """Returns the cached prompt tokens reported in an OpenAI response body."""
+  if not isinstance(body, dict):
+    return None
+  details = (body.get('usage') or {}).get('prompt_tokens_details') or {}
+  return details.get('cached_tokens')
+
+
+def gemini_usage_tokens(response: Any) -> tuple[Optional[int], Optional[int]]:
+  """Returns the prompt and cached tokens reported in a Gemini response."""
+  usage = getattr(response, 'usage_metadata', None)
+  return (
+      getattr(usage, 'prompt_token_count', None),
+      getattr(usage, 'cached_content_token_count', None),
+  )
+
+
+@dataclasses.dataclass(frozen=True)
+class PromptCacheStats:
+  """Prompt cache usage over the requests of a run.
+
+  Attributes:
+    num_requests: Number of requests.
+    prompt_tokens: Input tokens reported by the provider.
+    cached_tokens: Input tokens the provider reported as served from its
+      prompt cache.
+    estimated_prompt_tokens: Input text tokens, estimated locally.
+    estimated_reusable_tokens: Estimated input text tokens in a prefix already
+      sent in a previous request, i.e. that a prefix cache could serve.
+  """
+
+  num_requests: int = 0
+  prompt_tokens: int = 0
+  cached_tokens: int = 0
+  estimated_prompt_tokens: int = 0
+  estimated_reusable_tokens: int = 0
+
+  @property
+  def cached_ratio(self) -> float:
+    return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0
+
+  @property
+  def estimated_reusable_ratio(self) -> float:
+    if not self.estimated_prompt_tokens:
+      return 0
+    return self.estimated_reusable_tokens / self.estimated_prompt_tokens
+
+  def __str__(self) -> str:
+    return (
+        f'{self.num_requests} requests, {self.cached_tokens}/'
+        f'{self.prompt_tokens} prompt tokens cached by the provider'
+        f' ({self.cached_ratio:.0%}), ~{self.estimated_reusable_tokens}/'
+        f'{self.estimated_prompt_tokens} in reusable prefixes'
+        f' ({self.estimated_reusable_ratio:.0%})'
+    )
+
+
+class PromptCacheTracker:
+  """Accounts for prompt caching across requests.
+
+  Providers cache prompt prefixes: OpenAI does it automatically for prompts of
+  at least 1024 tokens, in blocks of 128 tokens, and Gemini for some models.
+  The tokens they report as cached are accumulated here.
+
+  As not all providers report cached tokens, prefixes are also tracked locally:
+  prompts are hashed in blocks, and the longest prefix of blocks already seen
+  in a previous request is counted as reusable. Agent prompts start with
+  static instructions, and successive steps share the goal and the history of
+  previous steps, so this estimates what a prefix cache can save.
+
+  Thread-safe, so one tracker can be shared by concurrent requests.
+  """
+
+  def __init__(
+      self,
+      block_chars: int = 512,
+      min_prefix_chars: int = 4096,
+      max_blocks: int = 100_000,
+  ):
+    """Initializes the tracker.
+
+    Args:
+      block_chars: Granularity of the local prefix matching, in characters.
+        The default is about OpenAI's 128 token blocks.
+      min_prefix_chars: Minimum length of a reusable prefix, in characters.
+        The default is about OpenAI's 1024 token minimum.
+      max_blocks: Maximum number of prefix hashes remembered; the least
+        recently used ones are forgotten first.
+    """
+    self.block_chars = block_chars
+    self.min_prefix_chars = min_prefix_chars
+    self.max_blocks = max_blocks
+    self._prefixes: collections.OrderedDict[bytes, None] = (
+        collections.OrderedDict()
+    )
+    self._stats = PromptCacheStats()
+    self._lock = threading.Lock()
+
+  @property
+  def stats(self) -> PromptCacheStats:
+    with self._lock:
+      return self._stats
+
+  def record(
+      self,
+      prompt_text: str,
+      prompt_tokens: Optional[int] = None,
+      cached_tokens: Optional[int] = None,
+  ) -> None:
+    """Records a request.
+
+    Args:
+      prompt_text: The text of the prompt, in the order it is sent.
+      prompt_tokens: Input tokens reported by the provider, if any.
+      cached_tokens: Cached input tokens reported by the provider, if any.
+    """
+    digest = hashlib.sha256()
+    digests = []
+    for end in range(
+        self.block_chars, len(prompt_text) + 1, self.block_chars
+    ):
+      digest.update(prompt_text[end - self.block_chars : end].encode('utf-8'))
+      digests.append(digest.digest())
+    with self._lock:
+      reusable_chars = 0
+      for i, prefix in enumerate(digests):
+        if prefix not in self._prefixes:
+          break
+        self._prefixes.move_to_end(prefix)
+        reusable_chars = (i + 1) * self.block_chars
+      if reusable_chars < self.min_prefix_chars:
+        reusable_chars = 0
+      for prefix in digests:
+        self._prefixes[prefix] = None
+        self._prefixes.move_to_end(prefix)
+      while len(self._prefixes) > self.max_blocks:
+        self._prefixes.popitem(last=False)
+      self._stats = PromptCacheStats(
+          num_requests=self._stats.num_requests + 1,
+          prompt_tokens=self._stats.prompt_tokens + (prompt_tokens or 0),
+          cached_tokens=self._stats.cached_tokens + (cached_tokens or 0),
+          estimated_prompt_tokens=self._stats.estimated_prompt_tokens
+          + _estimate_tokens(prompt_text),
+          estimated_reusable_tokens=self._stats.estimated_reusable_tokens
+          + _estimate_tokens(reusable_chars),
+      )
+
+
+def _estimate_tokens(text_or_length: str | int) -> int:
+  """Rough token count, at about 4 characters per token."""
+  if isinstance(text_or_length, str):
+    text_or_length = len(text_or_length)
+  return (text_or_length + 3) // 4
+
+
 def array_to_jpeg_bytes(image: np.ndarray) -> bytes:
   """Converts a numpy array into a byte string for a JPEG image."""
   image = Image.fromarray(image)
@@ -66,6 +327,11 @@ class LlmWrapper(abc.ABC):
       Text output, is_safe, and raw output.
     """
 
+  @property
+  def prompt_cache_stats(self) -> Optional[PromptCacheStats]:
+    """Prompt cache usage so far, or None if the wrapper does not track it."""
+    return None
+
 
 class MultimodalLlmWrapper(abc.ABC):
   """Abstract interface for Multimodal LLM."""
@@ -84,6 +350,19 @@ class MultimodalLlmWrapper(abc.ABC):
       Text output and raw output.
     """
 
+  @property
+  def uploaded_image_bytes(self) -> int:
+    """Total size of the encoded images sent to the model so far.
+
+    Wrappers that do not encode images themselves report 0.
+    """
+    return 0
+
+  @property
+  def prompt_cache_stats(self) -> Optional[PromptCacheStats]:
+    """Prompt cache usage so far, or None if the wrapper does not track it."""
+    return None
+
 
 SAFETY_SETTINGS_BLOCK_NONE = {
     types.HarmCategory.HARM_CATEGORY_HARASSMENT: (
@@ -111,6 +390,7 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       temperature: float = 0.0,
       top_p: float = 0.95,
       enable_safety_checks: bool = True,
+      image_encoder: Optional[image_encoding.ImageEncoder] = None,
   ):
     if 'GCP_API_KEY' not in os.environ:
       raise RuntimeError('GCP API key not set.')
@@ -128,6 +408,18 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       max_retry = 3
       print('Max_retry must be positive. Reset it to 3')
     self.max_retry = min(max_retry, 5)
+    # Lossless WebP is what the SDK would produce from a PIL image.
+    self.image_encoder = image_encoder or image_encoding.ImageEncoder('WEBP')
+    self._uploaded_image_bytes = 0
+    self.prompt_cache = PromptCacheTracker()
+
+  @property
+  def uploaded_image_bytes(self) -> int:
+    return self._uploaded_image_bytes
+
+  @property
+  def prompt_cache_stats(self) -> PromptCacheStats:
+    return self.prompt_cache.stats
 
   def predict(
       self,
@@ -159,16 +451,19 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
     counter = self.max_retry
     retry_delay = 1.0
     output = None
+    encoded_images = [self.image_encoder.encode(image) for image in images]
+    image_bytes = sum(len(image.data) for image in encoded_images)
     while counter > 0:
       try:
+        self._uploaded_image_bytes += image_bytes
         output = self.llm.generate_content(
-            [text_prompt] + [Image.fromarray(image) for image in images],
+            [text_prompt] + [image.to_blob() for image in encoded_images],
             safety_settings=None
             if enable_safety_checks
             else SAFETY_SETTINGS_BLOCK_NONE,
             generation_config=generation_config,
         )
-        return output.text, True, output
+        text = output.text
       except Exception as e:  # pylint: disable=broad-exception-caught
         counter -= 1
         print('Error calling LLM, will retry in {retry_delay} seconds')
@@ -177,6 +472,11 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
           # Expo backoff
           time.sleep(retry_delay)
           retry_delay *= 2
+        continue
+      # Recorded outside of the retry loop, so bookkeeping errors never cause
+      # the request to be sent again.
+      self.prompt_cache.record(text_prompt, *gemini_usage_tokens(output))
+      return text, True, output
 
     if (output is not None) and (not self.is_safe(output)):
       return ERROR_CALLING_LLM, False, output
@@ -235,7 +535,7 @@ class GeminiGcpWrapper(LlmWrapper, MultimodalLlmWrapper):
       if isinstance(item, str):
         converted.append(item)
       elif isinstance(item, np.ndarray):
-        converted.append(Image.fromarray(item))
+        converted.append(self.image_encoder.encode(item).to_blob())
       elif isinstance(item, Image.Image):
         converted.append(item)
     return converted
@@ -250,6 +550,10 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
     max_retry: Max number of retries when some error happens.
     temperature: The temperature parameter in LLM to control result stability.
     model: GPT model to use based on if it is multimodal.
+    timeout_sec: Timeout for each request, either a single value or a
+      (connect, read) pair.
+    image_encoder: Encoder for the images sent to the model. Configure it to
+      downscale images or change the JPEG quality.
   """
 
   RETRY_WAITING_SECONDS = 20
@@ -259,6 +563,8 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
       model_name: str,
       max_retry: int = 3,
       temperature: float = 0.0,
+      timeout_sec: http_utils.Timeout = http_utils.DEFAULT_TIMEOUT_SEC,
+      image_encoder: Optional[image_encoding.ImageEncoder] = None,
   ):
     if 'OPENAI_API_KEY' not in os.environ:
       raise RuntimeError('OpenAI API key not set.')
@@ -269,6 +575,18 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
     self.max_retry = min(max_retry, 5)
     self.temperature = temperature
     self.model = model_name
+    self.timeout_sec = timeout_sec
+    self.image_encoder = image_encoder or image_encoding.ImageEncoder()
+    self._uploaded_image_bytes = 0
+    self.prompt_cache = PromptCacheTracker()
+
+  @property
+  def uploaded_image_bytes(self) -> int:
+    return self._uploaded_image_bytes
+
+  @property
+  def prompt_cache_stats(self) -> PromptCacheStats:
+    return self.prompt_cache.stats
 
   @classmethod
   def encode_image(cls, image: np.ndarray) -> str:
@@ -302,32 +620,32 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
 
     # Gpt-4v supports multiple images, just need to insert them in the content
     # list.
+    image_bytes = 0
     for image in images:
+      encoded_image = self.image_encoder.encode(image)
+      image_bytes += len(encoded_image.data)
       payload['messages'][0]['content'].append({
           'type': 'image_url',
-          'image_url': {
-              'url': f'data:image/jpeg;base64,{self.encode_image(image)}'
-          },
+          'image_url': {'url': encoded_image.to_data_url()},
       })
 
     counter = self.max_retry
     wait_seconds = self.RETRY_WAITING_SECONDS
     while counter > 0:
       try:
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
+        self._uploaded_image_bytes += image_bytes
+        response, body = http_utils.post_json(
+            http_utils.openai_chat_completions_url(),
+            payload,
             headers=headers,
-            json=payload,
+            timeout=self.timeout_sec,
         )
-        if response.ok and 'choices' in response.json():
-          return (
-              response.json()['choices'][0]['message']['content'],
-              None,
-              response,
-          )
+        if response.ok and 'choices' in body:
+          content = body['choices'][0]['message']['content']
+          break
         print(
             'Error calling OpenAI API with error message: '
-            + response.json()['error']['message']
+            + body['error']['message']
         )
         time.sleep(wait_seconds)
         wait_seconds *= 2
@@ -338,4 +656,17 @@ class Gpt4Wrapper(LlmWrapper, MultimodalLlmWrapper):
         counter -= 1
         print('Error calling LLM, will retry soon...')
         print(e)
-    return ERROR_CALLING_LLM, None, None
+    else:
+      return ERROR_CALLING_LLM, None, None
+    self.prompt_cache.record(
+        text_prompt,
+        (body.get('usage') or {}).get('prompt_tokens'),
+        openai_cached_tokens(body),
+    )
+    return content, None, response
+
+  async def predict_mm_async(
+      self, text_prompt: str, images: list[np.ndarray]
+  ) -> tuple[str, Optional[bool], Any]:
+    """Same as `predict_mm`, without blocking the event loop."""
+    return await asyncio.to_thread(self.predict_mm, text_prompt, images)
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import os
+import pickle
 import time
 from unittest import mock
 from absl.testing import absltest
@@ -21,6 +23,7 @@ import google.ai.generativelanguage as glm
 import google.generativeai as genai
 from google.generativeai.types import answer_types
 from google.generativeai.types import generation_types
+import numpy as np
 import requests
 
 
@@ -28,7 +31,7 @@ class InferTest(absltest.TestCase):
 
   def setUp(self):
     super().setUp()
-    self.mock_post = mock.patch.object(requests, "post").start()
+    self.mock_post = mock.patch.object(requests.Session, "post").start()
     self.mock_sleep = mock.patch.object(time, "sleep").start()
     os.environ["OPENAI_API_KEY"] = "fake_api_key"
     os.environ["GCP_API_KEY"] = "fake_api_key"
@@ -53,6 +56,28 @@ class InferTest(absltest.TestCase):
     self.assertEqual(text_output, "fake response")
     self.assertEqual(is_safe, True)
 
+  @mock.patch.object(genai.GenerativeModel, "generate_content")
+  def test_gemini_gcp_images(self, mock_generate_content):
+    mock_generate_content.return_value = (
+        generation_types.GenerateContentResponse.from_response(
+            glm.GenerateContentResponse({
+                "candidates": (
+                    [{"content": {"parts": [{"text": "fake response"}]}}]
+                )
+            })
+        )
+    )
+    llm = infer.GeminiGcpWrapper(model_name="some_gemini_model")
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    llm.predict_mm("fake prompt", [image, image])
+
+    contents = mock_generate_content.call_args.args[0]
+    self.assertEqual(contents[0], "fake prompt")
+    self.assertEqual(contents[1]["mime_type"], "image/webp")
+    self.assertIs(contents[1]["data"], contents[2]["data"])
+    self.assertEqual(llm.uploaded_image_bytes, 2 * len(contents[1]["data"]))
+
   @mock.patch.object(genai.GenerativeModel, "generate_content")
   def test_gemini_gcp_error(self, mock_generate_content):
     mock_generate_content.return_value = (
@@ -131,6 +156,253 @@ class InferTest(absltest.TestCase):
     gpt4v.predict_mm("fake prompt", [])
     self.mock_sleep.assert_called_once()
 
+  def test_gpt4v_encodes_repeated_images_once(self):
+    llm = infer.Gpt4Wrapper(model_name="gpt-4-turbo-2024-04-09")
+    mock_200_response = requests.Response()
+    mock_200_response.status_code = 200
+    mock_200_response._content = (
+        b'{"choices": [{"message": {"content": "fake response"}}]}'
+    )
+    self.mock_post.return_value = mock_200_response
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    llm.predict_mm("fake prompt", [image, image.copy()])
+    llm.predict_mm("fake prompt", [image])
+
+    self.assertEqual(llm.image_encoder.num_cache_misses, 1)
+    self.assertEqual(llm.image_encoder.num_cache_hits, 2)
+    image_size = len(llm.image_encoder.encode(image).data)
+    self.assertEqual(llm.uploaded_image_bytes, 3 * image_size)
+    content = self.mock_post.call_args.kwargs["json"]["messages"][0]["content"]
+    self.assertTrue(
+        content[1]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    )
+
+  def test_gpt4v_timeout(self):
+    gpt4v = infer.Gpt4Wrapper(
+        model_name="gpt-4-turbo-2024-04-09", timeout_sec=5.0
+    )
+    mock_200_response = requests.Response()
+    mock_200_response.status_code = 200
+    mock_200_response._content = (
+        b'{"choices": [{"message": {"content": "ok."}}]}'
+    )
+    self.mock_post.return_value = mock_200_response
+
+    gpt4v.predict_mm("fake prompt", [])
+
+    self.assertEqual(self.mock_post.call_args.kwargs["timeout"], 5.0)
+
+  def test_gpt4v_async(self):
+    llm = infer.Gpt4Wrapper(model_name="gpt-4-turbo-2024-04-09")
+    mock_200_response = requests.Response()
+    mock_200_response.status_code = 200
+    mock_200_response._content = (
+        b'{"choices": [{"message": {"content": "fake response"}}]}'
+    )
+    self.mock_post.return_value = mock_200_response
+
+    text_output, _, _ = asyncio.run(llm.predict_mm_async("fake prompt", []))
+
+    self.assertEqual(text_output, "fake response")
+
+  def test_gpt4v_prompt_cache_stats(self):
+    llm = infer.Gpt4Wrapper(model_name="gpt-4-turbo-2024-04-09")
+    mock_200_response = requests.Response()
+    mock_200_response.status_code = 200
+    mock_200_response._content = (
+        b'{"choices": [{"message": {"content": "ok"}}], "usage":'
+        b' {"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens":'
+        b" 1536}}}"
+    )
+    self.mock_post.return_value = mock_200_response
+
+    llm.predict_mm("fake prompt", [])
+
+    stats = llm.prompt_cache_stats
+    self.assertEqual(stats.num_requests, 1)
+    self.assertEqual(stats.prompt_tokens, 2000)
+    self.assertEqual(stats.cached_tokens, 1536)
+    self.assertAlmostEqual(stats.cached_ratio, 0.768)
+
+  @mock.patch.object(genai.GenerativeModel, "generate_content")
+  def test_gemini_prompt_cache_stats(self, mock_generate_content):
+    mock_generate_content.return_value = (
+        generation_types.GenerateContentResponse.from_response(
+            glm.GenerateContentResponse({
+                "candidates": [{"content": {"parts": [{"text": "ok"}]}}],
+                "usage_metadata": {
+                    "prompt_token_count": 100,
+                    "cached_content_token_count": 40,
+                },
+            })
+        )
+    )
+    llm = infer.GeminiGcpWrapper(model_name="some_gemini_model")
+
+    llm.predict("fake prompt")
+
+    self.assertEqual(llm.prompt_cache_stats.prompt_tokens, 100)
+    self.assertEqual(llm.prompt_cache_stats.cached_tokens, 40)
+
+  @mock.patch.object(genai.GenerativeModel, "generate_content")
+  def test_gemini_missing_usage_metadata_does_not_retry(
+      self, mock_generate_content
+  ):
+    mock_generate_content.return_value = mock.MagicMock(
+        text="ok", usage_metadata=None
+    )
+    llm = infer.GeminiGcpWrapper(model_name="some_gemini_model")
+
+    text_output, _, _ = llm.predict("fake prompt")
+
+    self.assertEqual(text_output, "ok")
+    mock_generate_content.assert_called_once()
+    self.assertEqual(llm.prompt_cache_stats.num_requests, 1)
+
+  def test_gemini_usage_tokens_without_metadata(self):
+    self.assertEqual(
+        infer.gemini_usage_tokens(mock.MagicMock(usage_metadata=None)),
+        (None, None),
+    )
+
+
+class PromptCacheTrackerTest(absltest.TestCase):
+
+  def test_shared_prefix_is_reusable(self):
+    tracker = infer.PromptCacheTracker(block_chars=4, min_prefix_chars=8)
+    static = "a" * 16
+
+    tracker.record(static + "first step")
+    tracker.record(static + "second step")
+
+    stats = tracker.stats
+    self.assertEqual(stats.num_requests, 2)
+    self.assertEqual(stats.estimated_prompt_tokens, 7 + 7)
+    # The 16 static characters of the second prompt.
+    self.assertEqual(stats.estimated_reusable_tokens, 4)
+    self.assertEqual(stats.prompt_tokens, 0)
+    self.assertEqual(stats.cached_ratio, 0)
+
+  def test_short_prefix_is_not_reusable(self):
+    tracker = infer.PromptCacheTracker(block_chars=4, min_prefix_chars=8)
+
+    tracker.record("abcd" + "first")
+    tracker.record("abcd" + "other")
+
+    self.assertEqual(tracker.stats.estimated_reusable_tokens, 0)
+
+  def test_prefix_must_match_from_start(self):
+    tracker = infer.PromptCacheTracker(block_chars=4, min_prefix_chars=4)
+
+    tracker.record("abcdefgh")
+    tracker.record("xbcdefgh")
+
+    self.assertEqual(tracker.stats.estimated_reusable_tokens, 0)
+
+  def test_forgets_least_recently_used_prefixes(self):
+    tracker = infer.PromptCacheTracker(
+        block_chars=4, min_prefix_chars=4, max_blocks=2
+    )
+
+    tracker.record("aaaa")
+    tracker.record("bbbb")
+    tracker.record("cccc")
+    tracker.record("aaaa")
+
+    self.assertEqual(tracker.stats.estimated_reusable_tokens, 0)
+
+  def test_str(self):
+    tracker = infer.PromptCacheTracker()
+    tracker.record("prompt", prompt_tokens=10, cached_tokens=5)
+
+    self.assertIn(
+        "5/10 prompt tokens cached by the provider (50%)", str(tracker.stats)
+    )
+
+
+class ResponseRecordTest(absltest.TestCase):
+
+  def test_openai_response(self):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Set-Cookie"] = "session=secret"
+    response._content = (
+        b'{"model": "gpt-4", "choices": [{"message": {"content": "hi"},'
+        b' "finish_reason": "stop"}], "usage": {"prompt_tokens": 10,'
+        b' "completion_tokens": 2, "prompt_tokens_details": {"cached_tokens":'
+        b" 8}}}"
+    )
+
+    record = infer.to_response_record(response, latency_sec=1.5)
+
+    self.assertEqual(
+        record,
+        infer.ResponseRecord(
+            text="hi",
+            model="gpt-4",
+            finish_reason="stop",
+            prompt_tokens=10,
+            completion_tokens=2,
+            cached_tokens=8,
+            latency_sec=1.5,
+        ),
+    )
+    self.assertNotIn(b"secret", pickle.dumps(record))
+
+  def test_openai_non_json_response(self):
+    response = requests.Response()
+    response.status_code = 502
+    response._content = b"bad gateway"
+
+    record = infer.to_response_record(response)
+
+    self.assertEqual(record, infer.ResponseRecord(text="bad gateway"))
+
+  def test_gemini_response(self):
+    response = generation_types.GenerateContentResponse.from_response(
+        glm.GenerateContentResponse({
+            "candidates": [{
+                "content": {"parts": [{"text": "fake response"}]},
+                "finish_reason": "STOP",
+            }],
+            "usage_metadata": {
+                "prompt_token_count": 7,
+                "candidates_token_count": 3,
+            },
+        })
+    )
+
+    record = infer.to_response_record(response, latency_sec=0.5)
+
+    self.assertEqual(record.text, "fake response")
+    self.assertEqual(record.finish_reason, "STOP")
+    self.assertEqual(record.prompt_tokens, 7)
+    self.assertEqual(record.completion_tokens, 3)
+    self.assertEqual(record.latency_sec, 0.5)
+
+  def test_blocked_gemini_response(self):
+    response = generation_types.GenerateContentResponse.from_response(
+        glm.GenerateContentResponse({
+            "candidates": [{
+                "content": {"parts": []},
+                "finish_reason": answer_types.FinishReason.SAFETY,
+            }]
+        })
+    )
+
+    record = infer.to_response_record(response)
+
+    self.assertIsNone(record.text)
+    self.assertEqual(record.finish_reason, "SAFETY")
+
+  def test_other_responses(self):
+    self.assertIsNone(infer.to_response_record(None))
+    self.assertEqual(
+        infer.to_response_record("raw", latency_sec=1.0),
+        infer.ResponseRecord(text="raw", latency_sec=1.0),
+    )
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -0,0 +1,163 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Record/replay transports for `http_utils`, for offline agent benchmarking.
+
+Record the LLM traffic of a run once against the real API, then replay it to
+measure agent-loop overhead deterministically and without network access:
+
+  with http_utils.use_transport(llm_replay.RecordingTransport(path)):
+    ...  # Run the agent against the real API.
+
+  with http_utils.use_transport(llm_replay.ReplayTransport(path)):
+    ...  # Same run, answered from the recording.
+
+Requests are matched on their JSON payload only, so request headers, which
+carry API keys, are never written to disk.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Optional
+
+from android_world.agents import http_utils
+import requests
+
+
+def request_key(payload: dict[str, Any]) -> str:
+  """Returns the key used to match a request payload with its recording."""
+  serialized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+  return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class ReplayMissError(LookupError):
+  """Raised when a request has no recorded response left to replay."""
+
+
+class RecordingTransport:
+  """Forwards requests to another transport and appends them to a file.
+
+  Each exchange is written as one JSON line with the request key, the response
+  status and body, and the observed latency.
+  """
+
+  def __init__(
+      self,
+      path: str,
+      transport: Optional[http_utils.Transport] = None,
+  ):
+    """Initializes the transport.
+
+    Args:
+      path: JSONL file to append the exchanges to.
+      transport: Transport that actually serves the requests. Defaults to
+        `http_utils.session_transport`.
+    """
+    self.path = path
+    self._transport = transport or http_utils.session_transport
+    self._lock = threading.Lock()
+    self.num_recorded = 0
+
+  def __call__(
+      self,
+      url: str,
+      payload: dict[str, Any],
+      headers: Optional[dict[str, str]] = None,
+      timeout: Optional[http_utils.Timeout] = http_utils.DEFAULT_TIMEOUT_SEC,
+  ) -> tuple[requests.Response, Optional[Any]]:
+    start = time.perf_counter()
+    response, body = self._transport(url, payload, headers, timeout)
+    record = {
+        'key': request_key(payload),
+        'status_code': response.status_code,
+        'body': body,
+        'elapsed_sec': time.perf_counter() - start,
+    }
+    if body is None:
+      record['text'] = response.text
+    line = json.dumps(record) + '\n'
+    with self._lock:
+      with open(self.path, 'a') as f:
+        f.write(line)
+      self.num_recorded += 1
+    return response, body
+
+
+class ReplayTransport:
+  """Answers requests from a file written by `RecordingTransport`.
+
+  Identical requests are answered in the order they were recorded; once they
+  are exhausted, the last response is repeated. This keeps replays of agents
+  that retry the same prompt deterministic.
+  """
+
+  def __init__(self, path: str, latency_scale: float = 0.0):
+    """Initializes the transport.
+
+    Args:
+      path: JSONL file written by `RecordingTransport`.
+      latency_scale: Factor applied to the recorded latencies before answering.
+        0 answers immediately, 1 reproduces the latencies of the recording.
+    """
+    self.path = path
+    self.latency_scale = latency_scale
+    self._records: dict[str, collections.deque[dict[str, Any]]] = (
+        collections.defaultdict(collections.deque)
+    )
+    with open(path) as f:
+      for line in f:
+        if line.strip():
+          record = json.loads(line)
+          self._records[record['key']].append(record)
+    self._lock = threading.Lock()
+    self.num_replayed = 0
+
+  def __call__(
+      self,
+      url: str,
+      payload: dict[str, Any],
+      headers: Optional[dict[str, str]] = None,
+      timeout: Optional[http_utils.Timeout] = http_utils.DEFAULT_TIMEOUT_SEC,
+  ) -> tuple[requests.Response, Optional[Any]]:
+    del headers, timeout
+    key = request_key(payload)
+    with self._lock:
+      records = self._records.get(key)
+      if not records:
+        raise ReplayMissError(f'No recorded response for request {key}.')
+      record = records.popleft() if len(records) > 1 else records[0]
+      self.num_replayed += 1
+    if self.latency_scale > 0:
+      time.sleep(record['elapsed_sec'] * self.latency_scale)
+    return _make_response(url, record), record['body']
+
+
+def _make_response(url: str, record: dict[str, Any]) -> requests.Response:
+  """Rebuilds a `requests.Response` from a recorded exchange."""
+  response = requests.Response()
+  response.url = url
+  response.status_code = record['status_code']
+  # pylint: disable=protected-access
+  if record['body'] is not None:
+    response._content = json.dumps(record['body']).encode('utf-8')
+    response.headers['Content-Type'] = 'application/json'
+  else:
+    response._content = record.get('text', '').encode('utf-8')
+  # pylint: enable=protected-access
+  response.encoding = 'utf-8'
+  return response
@@ -0,0 +1,153 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for llm_replay."""
+
+import os
+import tempfile
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import http_utils
+from android_world.agents import infer
+from android_world.agents import llm_replay
+from android_world.agents import llm_stub_server
+from android_world.agents import seeact_utils
+import requests
+
+
+class _Counter:
+  """Responder returning a different completion for every request."""
+
+  def __init__(self):
+    self.count = 0
+
+  def __call__(self, payload):
+    del payload
+    self.count += 1
+    return f'response {self.count}'
+
+
+class LlmReplayTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = self.enter_context(tempfile.TemporaryDirectory())
+    self.path = os.path.join(temp_dir, 'llm.jsonl')
+    self.server = llm_stub_server.LlmStubServer(responder=_Counter()).start()
+    self.enter_context(
+        mock.patch.dict(
+            os.environ,
+            {
+                http_utils.OPENAI_BASE_URL_ENV_VAR: self.server.base_url,
+                'OPENAI_API_KEY': 'secret-key',
+            },
+        )
+    )
+    http_utils.close_session()
+
+  def tearDown(self):
+    http_utils.close_session()
+    self.server.stop()
+    super().tearDown()
+
+  def _record(self, prompts):
+    llm = infer.Gpt4Wrapper('model')
+    with http_utils.use_transport(llm_replay.RecordingTransport(self.path)):
+      return [llm.predict(prompt)[0] for prompt in prompts]
+
+  def test_replay_matches_recording(self):
+    recorded = self._record(['a', 'b', 'c'])
+    self.server.stop()
+
+    llm = infer.Gpt4Wrapper('model')
+    transport = llm_replay.ReplayTransport(self.path)
+    with http_utils.use_transport(transport):
+      replayed = [llm.predict(prompt)[0] for prompt in ['c', 'a', 'b']]
+
+    self.assertEqual(recorded, ['response 1', 'response 2', 'response 3'])
+    self.assertEqual(replayed, ['response 3', 'response 1', 'response 2'])
+    self.assertEqual(transport.num_replayed, 3)
+
+  def test_repeated_requests_replay_in_order(self):
+    self._record(['a', 'a'])
+    transport = llm_replay.ReplayTransport(self.path)
+
+    with http_utils.use_transport(transport):
+      bodies = [
+          seeact_utils.execute_openai_request(
+              [{
+                  'role': 'user',
+                  'content': [{'type': 'text', 'text': 'a'}],
+              }],
+              model='model',
+              max_tokens=1000,
+          )
+          for _ in range(3)
+      ]
+
+    self.assertEqual(
+        [body['choices'][0]['message']['content'] for body in bodies],
+        ['response 1', 'response 2', 'response 2'],
+    )
+
+  def test_api_key_is_not_recorded(self):
+    self._record(['a'])
+
+    with open(self.path) as f:
+      self.assertNotIn('secret-key', f.read())
+
+  def test_miss(self):
+    self._record(['a'])
+    transport = llm_replay.ReplayTransport(self.path)
+
+    with self.assertRaises(llm_replay.ReplayMissError):
+      transport('url', {'model': 'other'})
+
+  def test_latency_scale(self):
+    self.server.latency_fn = llm_stub_server.constant_latency(0.2)
+    self._record(['a'])
+    transport = llm_replay.ReplayTransport(self.path, latency_scale=0.5)
+
+    start = time.monotonic()
+    with http_utils.use_transport(transport):
+      infer.Gpt4Wrapper('model').predict('a')
+
+    self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+  def test_non_json_body(self):
+    def transport(url, payload, headers, timeout):
+      del payload, headers, timeout
+      response = requests.Response()
+      response.url = url
+      response.status_code = 502
+      response._content = b'bad gateway'
+      return response, None
+
+    with http_utils.use_transport(
+        llm_replay.RecordingTransport(self.path, transport)
+    ):
+      http_utils.post_json('url', {'a': 1})
+    with http_utils.use_transport(llm_replay.ReplayTransport(self.path)):
+      response, body = http_utils.post_json('url', {'a': 1})
+
+    self.assertEqual(response.status_code, 502)
+    self.assertEqual(response.text, 'bad gateway')
+    self.assertIsNone(body)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,292 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Local OpenAI-compatible chat completions server for offline benchmarking.
+
+The server answers `POST .../chat/completions` after a configurable latency,
+so the overhead of the agent loop can be measured without network access or
+API costs. Point the agents at it through `OPENAI_BASE_URL`:
+
+  python -m android_world.agents.llm_stub_server --stub_port=8000
+  OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=stub python run.py
+
+or, in-process:
+
+  with llm_stub_server.LlmStubServer(
+      latency_fn=llm_stub_server.lognormal_latency(median_sec=2.0)
+  ) as server:
+    os.environ[http_utils.OPENAI_BASE_URL_ENV_VAR] = server.base_url
+"""
+
+from collections.abc import Sequence
+from http import server
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from absl import app
+from absl import flags
+
+# Returns the text of the completion for a chat completion request payload.
+Responder = Callable[[dict[str, Any]], str]
+# Returns the time to wait before answering a request, in seconds.
+LatencyFn = Callable[[], float]
+
+# Parses as a valid action for both M3A and T3A.
+DEFAULT_RESPONSE = 'Reason: Stub response.\nAction: {"action_type": "wait"}'
+
+
+def default_responder(payload: dict[str, Any]) -> str:
+  del payload
+  return DEFAULT_RESPONSE
+
+
+def constant_latency(latency_sec: float) -> LatencyFn:
+  """Returns a latency function always returning `latency_sec`."""
+  return lambda: latency_sec
+
+
+def uniform_latency(
+    low_sec: float, high_sec: float, seed: Optional[int] = None
+) -> LatencyFn:
+  """Returns a latency function sampling uniformly in [low_sec, high_sec]."""
+  rng = random.Random(seed)
+  lock = threading.Lock()
+
+  def sample() -> float:
+    with lock:
+      return rng.uniform(low_sec, high_sec)
+
+  return sample
+
+
+def lognormal_latency(
+    median_sec: float, sigma: float = 0.5, seed: Optional[int] = None
+) -> LatencyFn:
+  """Returns a latency function sampling from a log-normal distribution.
+
+  LLM API latencies are right-skewed; a log-normal distribution reproduces the
+  long tail that dominates the wall-clock time of an episode.
+
+  Args:
+    median_sec: Median latency, in seconds.
+    sigma: Standard deviation of the underlying normal distribution. Larger
+      values give a longer tail.
+    seed: Seed for the random number generator.
+  """
+  rng = random.Random(seed)
+  lock = threading.Lock()
+  mu = math.log(median_sec)
+
+  def sample() -> float:
+    with lock:
+      return rng.lognormvariate(mu, sigma)
+
+  return sample
+
+
+def chat_completion(payload: dict[str, Any], content: str) -> dict[str, Any]:
+  """Returns an OpenAI chat completion response body with `content`."""
+  prompt_chars = sum(
+      len(part.get('text', ''))
+      for message in payload.get('messages', [])
+      for part in (
+          message['content']
+          if isinstance(message.get('content'), list)
+          else [{'text': message.get('content') or ''}]
+      )
+  )
+  # Rough estimate, good enough for code that reads the usage fields.
+  prompt_tokens = prompt_chars // 4
+  completion_tokens = len(content) // 4
+  return {
+      'id': 'chatcmpl-stub',
+      'object': 'chat.completion',
+      'created': int(time.time()),
+      'model': payload.get('model', 'stub'),
+      'choices': [{
+          'index': 0,
+          'message': {'role': 'assistant', 'content': content},
+          'finish_reason': 'stop',
+      }],
+      'usage': {
+          'prompt_tokens': prompt_tokens,
+          'completion_tokens': completion_tokens,
+          'total_tokens': prompt_tokens + completion_tokens,
+      },
+  }
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+  """Handles chat completion requests for `LlmStubServer`."""
+
+  protocol_version = 'HTTP/1.1'  # Enables keep-alive.
+  disable_nagle_algorithm = True
+
+  server: '_HttpServer'
+
+  def do_POST(self):  # pylint: disable=invalid-name
+    length = int(self.headers.get('Content-Length', 0))
+    try:
+      payload = json.loads(self.rfile.read(length))
+    except ValueError:
+      self._send(400, {'error': {'message': 'Invalid JSON payload.'}})
+      return
+    if not self.path.rstrip('/').endswith('/chat/completions'):
+      self._send(404, {'error': {'message': f'Unknown path {self.path}.'}})
+      return
+    stub = self.server.stub
+    latency_sec = stub.latency_fn()
+    if latency_sec > 0:
+      time.sleep(latency_sec)
+    body = chat_completion(payload, stub.responder(payload))
+    stub.record_request(latency_sec)
+    self._send(200, body)
+
+  def _send(self, status: int, body: dict[str, Any]) -> None:
+    data = json.dumps(body).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def log_message(self, *args):
+    del args
+
+
+class _HttpServer(server.ThreadingHTTPServer):
+  daemon_threads = True
+  stub: 'LlmStubServer'
+
+
+class LlmStubServer:
+  """OpenAI-compatible chat completions server running in a background thread.
+
+  Requests are served concurrently, so latencies overlap like they do against
+  the real API.
+  """
+
+  def __init__(
+      self,
+      responder: Responder = default_responder,
+      latency_fn: LatencyFn = constant_latency(0.0),
+      host: str = '127.0.0.1',
+      port: int = 0,
+  ):
+    """Initializes the server.
+
+    Args:
+      responder: Returns the completion text for a request payload. Called
+        concurrently from the request threads.
+      latency_fn: Returns the time to wait before answering each request.
+      host: Host to listen on.
+      port: Port to listen on; 0 picks a free port.
+    """
+    self.responder = responder
+    self.latency_fn = latency_fn
+    self._address = (host, port)
+    self._httpd: Optional[_HttpServer] = None
+    self._thread: Optional[threading.Thread] = None
+    self._lock = threading.Lock()
+    self.num_requests = 0
+    self.total_latency_sec = 0.0
+
+  @property
+  def port(self) -> int:
+    if self._httpd is None:
+      raise RuntimeError('Server is not running.')
+    return self._httpd.server_port
+
+  @property
+  def base_url(self) -> str:
+    """Base URL to use as `OPENAI_BASE_URL`."""
+    return f'http://{self._address[0]}:{self.port}/v1'
+
+  def record_request(self, latency_sec: float) -> None:
+    with self._lock:
+      self.num_requests += 1
+      self.total_latency_sec += latency_sec
+
+  def start(self) -> 'LlmStubServer':
+    if self._httpd is not None:
+      raise RuntimeError('Server is already running.')
+    self._httpd = _HttpServer(self._address, _Handler)
+    self._httpd.stub = self
+    self._thread = threading.Thread(
+        target=self._httpd.serve_forever, daemon=True
+    )
+    self._thread.start()
+    return self
+
+  def stop(self) -> None:
+    if self._httpd is None:
+      return
+    self._httpd.shutdown()
+    self._httpd.server_close()
+    self._thread.join()
+    self._httpd = None
+    self._thread = None
+
+  def __enter__(self) -> 'LlmStubServer':
+    return self.start()
+
+  def __exit__(self, *args) -> None:
+    self.stop()
+
+
+_PORT = flags.DEFINE_integer('stub_port', 8000, 'Port to listen on.')
+_LATENCY_MEDIAN_SEC = flags.DEFINE_float(
+    'stub_latency_median_sec', 0.0, 'Median latency of each response.'
+)
+_LATENCY_SIGMA = flags.DEFINE_float(
+    'stub_latency_sigma',
+    0.0,
+    'Sigma of the log-normal latency distribution; 0 for a constant latency.',
+)
+_SEED = flags.DEFINE_integer('stub_seed', None, 'Seed for the latencies.')
+_RESPONSE = flags.DEFINE_string(
+    'stub_response', DEFAULT_RESPONSE, 'Text of every completion.'
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  del argv
+  if _LATENCY_MEDIAN_SEC.value > 0 and _LATENCY_SIGMA.value > 0:
+    latency_fn = lognormal_latency(
+        _LATENCY_MEDIAN_SEC.value, _LATENCY_SIGMA.value, _SEED.value
+    )
+  else:
+    latency_fn = constant_latency(_LATENCY_MEDIAN_SEC.value)
+  response = _RESPONSE.value
+  stub = LlmStubServer(
+      responder=lambda payload: response,
+      latency_fn=latency_fn,
+      port=_PORT.value,
+  )
+  with stub:
+    print(f'Serving chat completions at {stub.base_url}')
+    try:
+      while True:
+        time.sleep(3600)
+    except KeyboardInterrupt:
+      pass
+
+
+if __name__ == '__main__':
+  app.run(main)
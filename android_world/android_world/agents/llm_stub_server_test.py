@@ -0,0 +1,126 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for llm_stub_server, driving the agents' OpenAI clients against it."""
+
+import os
+import statistics
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.agents import http_utils
+from android_world.agents import infer
+from android_world.agents import llm_stub_server
+from android_world.agents import seeact_utils
+import numpy as np
+
+
+class LatencyTest(absltest.TestCase):
+
+  def test_constant(self):
+    latency_fn = llm_stub_server.constant_latency(0.5)
+
+    self.assertEqual([latency_fn() for _ in range(3)], [0.5] * 3)
+
+  def test_uniform_is_seeded(self):
+    first = llm_stub_server.uniform_latency(1.0, 2.0, seed=1)
+    second = llm_stub_server.uniform_latency(1.0, 2.0, seed=1)
+
+    samples = [first() for _ in range(100)]
+    self.assertEqual(samples, [second() for _ in range(100)])
+    self.assertTrue(all(1.0 <= s <= 2.0 for s in samples))
+
+  def test_lognormal_median(self):
+    latency_fn = llm_stub_server.lognormal_latency(2.0, sigma=0.5, seed=0)
+
+    samples = [latency_fn() for _ in range(5000)]
+
+    self.assertAlmostEqual(statistics.median(samples), 2.0, delta=0.1)
+    # Right-skewed: the mean is above the median.
+    self.assertGreater(statistics.mean(samples), 2.0)
+
+
+class LlmStubServerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.server = llm_stub_server.LlmStubServer().start()
+    self.enter_context(
+        mock.patch.dict(
+            os.environ,
+            {
+                http_utils.OPENAI_BASE_URL_ENV_VAR: self.server.base_url,
+                'OPENAI_API_KEY': 'stub',
+            },
+        )
+    )
+    http_utils.close_session()
+
+  def tearDown(self):
+    http_utils.close_session()
+    self.server.stop()
+    super().tearDown()
+
+  def test_gpt4_wrapper(self):
+    self.server.responder = lambda payload: payload['model']
+    llm = infer.Gpt4Wrapper('stub-model')
+
+    output, _, response = llm.predict_mm(
+        'prompt', [np.zeros((8, 8, 3), dtype=np.uint8)]
+    )
+
+    self.assertEqual(output, 'stub-model')
+    self.assertTrue(response.ok)
+    self.assertEqual(self.server.num_requests, 1)
+
+  def test_seeact_request(self):
+    body = seeact_utils.execute_openai_request(
+        [{'role': 'user', 'content': 'hello'}]
+    )
+
+    self.assertEqual(
+        body['choices'][0]['message']['content'],
+        llm_stub_server.DEFAULT_RESPONSE,
+    )
+    self.assertEqual(body['usage']['prompt_tokens'], len('hello') // 4)
+
+  def test_latency(self):
+    self.server.latency_fn = llm_stub_server.constant_latency(0.2)
+
+    start = time.monotonic()
+    seeact_utils.execute_openai_request([{'role': 'user', 'content': 'a'}])
+
+    self.assertGreaterEqual(time.monotonic() - start, 0.2)
+    self.assertAlmostEqual(self.server.total_latency_sec, 0.2)
+
+  def test_unknown_path(self):
+    response, body = http_utils.post_json(
+        self.server.base_url + '/embeddings', {}
+    )
+
+    self.assertEqual(response.status_code, 404)
+    self.assertIn('error', body)
+    self.assertEqual(self.server.num_requests, 0)
+
+  def test_port_requires_running_server(self):
+    self.server.stop()
+
+    with self.assertRaises(RuntimeError):
+      _ = self.server.port
+
+
+if __name__ == '__main__':
+  absltest.main()
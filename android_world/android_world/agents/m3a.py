@@ -14,14 +14,19 @@
 
 """A Multimodal Autonomous Agent for Android (M3A)."""
 
+import concurrent.futures
+import functools
 import time
+from typing import Any, Optional, Sequence
 from android_world.agents import agent_utils
 from android_world.agents import base_agent
 from android_world.agents import infer
 from android_world.agents import m3a_utils
+from android_world.agents import prompt_budget
 from android_world.env import interface
 from android_world.env import json_action
 from android_world.env import representation_utils
+import numpy as np
 
 PROMPT_PREFIX = (
     'You are an agent who can operate an Android phone on behalf of a user.'
@@ -167,6 +172,30 @@ ACTION_SELECTION_PROMPT_TEMPLATE = (
 )
 
 
+# Same as ACTION_SELECTION_PROMPT_TEMPLATE, with the guidelines moved before
+# the goal so that all static instructions come first. Providers cache
+# prompt prefixes, and can then serve them from cache at every step.
+CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE = (
+    PROMPT_PREFIX
+    + GUIDANCE
+    + '\nThe current user goal/request is: {goal}\n\n'
+    'Here is a history of what you have done so far:\n{history}\n\n'
+    'The current screenshot and the same screenshot with bounding boxes'
+    ' and labels added are also given to you.\n'
+    'Here is a list of detailed'
+    ' information for some of the UI elements (notice that some elements in'
+    ' this list may not be visible in the current screen and so you can not'
+    ' interact with it, can try to scroll the screen to reveal it first),'
+    ' the numeric indexes are'
+    ' consistent with the ones in the labeled screenshot:\n{ui_elements}\n'
+    + '{additional_guidelines}'
+    + '\nNow output an action from the above list in the correct JSON format,'
+    ' following the reason why you do that. Your answer should look like:\n'
+    'Reason: ...\nAction: {{"action_type":...}}\n\n'
+    'Your Answer:\n'
+)
+
+
 SUMMARY_PROMPT_TEMPLATE = (
     PROMPT_PREFIX
     + '\nThe (overall) user goal/request is: {goal}\n'
@@ -246,18 +275,27 @@ def _generate_ui_element_description(
 
 
 def _generate_ui_elements_description_list(
-    ui_elements: list[representation_utils.UIElement],
+    ui_elements: Sequence[representation_utils.UIElement],
     screen_width_height_px: tuple[int, int],
+    budget: Optional[prompt_budget.PromptBudget] = None,
 ) -> str:
   """Generate concise information for a list of UIElement.
 
   Args:
     ui_elements: UI elements for the current screen.
     screen_width_height_px: The height and width of the screen in pixels.
+    budget: If set, elements are filtered and encoded to fit the budget.
 
   Returns:
     Concise information for each UIElement.
   """
+  if budget is not None:
+    return prompt_budget.describe_ui_elements(
+        ui_elements,
+        screen_width_height_px,
+        budget,
+        _generate_ui_element_description,
+    )
   tree_info = ''
   for index, ui_element in enumerate(ui_elements):
     if m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
@@ -270,6 +308,7 @@ def _action_selection_prompt(
     history: list[str],
     ui_elements: str,
     additional_guidelines: list[str] | None = None,
+    cache_friendly: bool = False,
 ) -> str:
   """Generate the prompt for the action selection.
 
@@ -278,6 +317,8 @@ def _action_selection_prompt(
     history: Summaries for previous steps.
     ui_elements: A list of descriptions for the UI elements.
     additional_guidelines: Task specific guidelines.
+    cache_friendly: Whether to use
+      CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.
 
   Returns:
     The text prompt for action selection that will be sent to gpt4v.
@@ -293,7 +334,12 @@ def _action_selection_prompt(
     for guideline in additional_guidelines:
       extra_guidelines += f'- {guideline}\n'
 
-  return ACTION_SELECTION_PROMPT_TEMPLATE.format(
+  template = (
+      CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE
+      if cache_friendly
+      else ACTION_SELECTION_PROMPT_TEMPLATE
+  )
+  return template.format(
       goal=goal,
       history=history,
       ui_elements=ui_elements if ui_elements else 'Not available',
@@ -301,6 +347,54 @@ def _action_selection_prompt(
   )
 
 
+def _history(
+    summaries: Sequence[str],
+    budget: Optional[prompt_budget.PromptBudget] = None,
+) -> list[str]:
+  """Numbers the summaries of previous steps, keeping those within budget."""
+  return prompt_budget.window_history(
+      [
+          'Step ' + str(i + 1) + '- ' + summary
+          for i, summary in enumerate(summaries)
+      ],
+      budget,
+  )
+
+
+def build_action_selection_prompt(
+    goal: str,
+    summaries: Sequence[str],
+    ui_elements: Sequence[representation_utils.UIElement],
+    budget: Optional[prompt_budget.PromptBudget] = None,
+    screen_width_height_px: tuple[int, int] = (1080, 2400),
+    additional_guidelines: list[str] | None = None,
+    cache_friendly: bool = False,
+) -> str:
+  """Builds the action selection prompt from the state of an episode.
+
+  Args:
+    goal: The current goal.
+    summaries: Summaries of the previous steps.
+    ui_elements: UI elements for the current screen.
+    budget: If set, the UI element list and history are limited to it.
+    screen_width_height_px: The logical screen size.
+    additional_guidelines: Task specific guidelines.
+    cache_friendly: Whether to put all static instructions first.
+
+  Returns:
+    The text prompt for action selection.
+  """
+  return _action_selection_prompt(
+      goal,
+      _history(summaries, budget),
+      _generate_ui_elements_description_list(
+          ui_elements, screen_width_height_px, budget
+      ),
+      additional_guidelines,
+      cache_friendly,
+  )
+
+
 def _summarize_prompt(
     action: str,
     reason: str,
@@ -329,6 +423,28 @@ def _summarize_prompt(
   )
 
 
+# Action types that refer to a UI element by its index.
+_INDEX_ACTION_TYPES = (
+    json_action.CLICK,
+    json_action.LONG_PRESS,
+    json_action.INPUT_TEXT,
+    json_action.SCROLL,
+)
+
+
+def _is_valid_prediction(
+    prediction: tuple[str, Optional[bool], Any], num_ui_elements: int
+) -> bool:
+  """Whether an action selection prediction can be used without retrying."""
+  action_output, is_safe, raw_response = prediction
+  if is_safe == False:  # pylint: disable=singleton-comparison
+    # Handled as an infeasible task.
+    return True
+  return bool(raw_response) and m3a_utils.is_valid_action_output(
+      action_output, num_ui_elements, _INDEX_ACTION_TYPES
+  )
+
+
 class M3A(base_agent.EnvironmentInteractingAgent):
   """M3A which stands for Multimodal Autonomous Agent for Android."""
 
@@ -338,6 +454,10 @@ class M3A(base_agent.EnvironmentInteractingAgent):
       llm: infer.MultimodalLlmWrapper,
       name: str = 'M3A',
       wait_after_action_seconds: float = 2.0,
+      pipeline_summarization: bool = False,
+      num_action_candidates: int = 1,
+      budget: Optional[prompt_budget.PromptBudget] = None,
+      cache_friendly_prompts: bool = False,
   ):
     """Initializes a M3A Agent.
 
@@ -347,21 +467,92 @@ class M3A(base_agent.EnvironmentInteractingAgent):
       name: The agent name.
       wait_after_action_seconds: Seconds to wait for the screen to stablize
         after executing an action
+      pipeline_summarization: If True, the summarization call of a step runs on
+        a worker thread, overlapping with the next observation and SoM
+        rendering, and `step` returns before the summary is available. The
+        next step waits for it before building its action prompt, so prompts
+        are unchanged. Use `flush` to wait for the last summary.
+      num_action_candidates: Number of concurrent action selection calls per
+        step. The first output that parses into an action on a valid UI
+        element is used, so a malformed output does not waste a step.
+      budget: If set, limits the UI element lists and the history in prompts,
+        see `prompt_budget.PromptBudget`.
+      cache_friendly_prompts: Whether action selection prompts put all static
+        instructions first, so providers can serve them from their prompt
+        cache. See CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.
     """
     super().__init__(env, name)
     self.llm = llm
-    self.history = []
+    self.prompt_budget = budget
+    self.cache_friendly_prompts = cache_friendly_prompts
+    self.history = agent_utils.StepHistory()
     self.additional_guidelines = None
     self.wait_after_action_seconds = wait_after_action_seconds
+    self._summary_executor = (
+        concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='m3a_summary'
+        )
+        if pipeline_summarization
+        else None
+    )
+    self._pending_summary: Optional[concurrent.futures.Future[None]] = None
+    self.num_action_candidates = num_action_candidates
 
   def set_task_guidelines(self, task_guidelines: list[str]) -> None:
     self.additional_guidelines = task_guidelines
 
   def reset(self, go_home_on_reset: bool = False):
+    self.flush()
     super().reset(go_home_on_reset)
     # Hide the coordinates on screen which might affect the vision model.
     self.env.hide_automation_ui()
-    self.history = []
+    self.history.clear()
+
+  def flush(self) -> None:
+    """Waits for the pending summarization call, if any."""
+    if self._pending_summary is not None:
+      pending_summary, self._pending_summary = self._pending_summary, None
+      pending_summary.result()
+
+  def _summarize(
+      self,
+      step_data: dict[str, Any],
+      action: str,
+      summary_prompt: str,
+      screenshots: list[np.ndarray],
+      uploaded_image_bytes_at_start: int,
+  ) -> None:
+    """Calls the LLM to summarize the step, and records it in step_data."""
+    start = time.perf_counter()
+    summary, is_safe, raw_response = self.llm.predict_mm(
+        summary_prompt, screenshots
+    )
+    latency_sec = time.perf_counter() - start
+    step_data['image_bytes_uploaded'] = (
+        self.llm.uploaded_image_bytes - uploaded_image_bytes_at_start
+    )
+
+    if is_safe == False:  # pylint: disable=singleton-comparison
+      #  is_safe could be None
+      summary = """Summary triggered LLM safety classifier."""
+
+    if not raw_response:
+      print(
+          'Error calling LLM in summarization phase. This should not happen: '
+          f'{summary}'
+      )
+      step_data['summary'] = (
+          'Some error occurred calling LLM during summarization phase: %s'
+          % summary
+      )
+      return
+
+    step_data['summary_prompt'] = summary_prompt
+    step_data['summary'] = f'Action selected: {action}. {summary}'
+    print('Summary: ' + summary)
+    step_data['summary_raw_response'] = infer.to_response_record(
+        raw_response, latency_sec
+    )
 
   def step(self, goal: str) -> base_agent.AgentInteractionResult:
     step_data = {
@@ -377,49 +568,66 @@ class M3A(base_agent.EnvironmentInteractingAgent):
         'summary_prompt': None,
         'summary': None,
         'summary_raw_response': None,
+        'image_bytes_uploaded': 0,
     }
     print('----------step ' + str(len(self.history) + 1))
 
     state = self.get_post_transition_state()
-    logical_screen_size = self.env.logical_screen_size
-    orientation = self.env.orientation
-    physical_frame_boundary = self.env.physical_frame_boundary
+    geometry = self.env.get_screen_geometry()
+    logical_screen_size = geometry.logical_screen_size
+    orientation = geometry.orientation
+    physical_frame_boundary = geometry.physical_frame_boundary
 
     before_ui_elements = state.ui_elements
     step_data['before_ui_elements'] = before_ui_elements
     before_ui_elements_list = _generate_ui_elements_description_list(
-        before_ui_elements, logical_screen_size
+        before_ui_elements, logical_screen_size, self.prompt_budget
     )
     step_data['raw_screenshot'] = state.pixels.copy()
     before_screenshot = state.pixels.copy()
-    for index, ui_element in enumerate(before_ui_elements):
-      if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-        m3a_utils.add_ui_element_mark(
-            before_screenshot,
-            ui_element,
-            index,
-            logical_screen_size,
-            physical_frame_boundary,
-            orientation,
-        )
-    step_data['before_screenshot_with_som'] = before_screenshot.copy()
+    m3a_utils.add_ui_element_marks(
+        before_screenshot,
+        before_ui_elements,
+        logical_screen_size,
+        physical_frame_boundary,
+        orientation,
+    )
+    # Not modified until summarization, where a labelled copy replaces it.
+    step_data['before_screenshot_with_som'] = before_screenshot
 
+    # The previous summary is needed for the prompt from here on.
+    self.flush()
+    uploaded_image_bytes_at_start = self.llm.uploaded_image_bytes
     action_prompt = _action_selection_prompt(
         goal,
-        [
-            'Step ' + str(i + 1) + '- ' + step_info['summary']
-            for i, step_info in enumerate(self.history)
-        ],
+        _history(
+            [step_info['summary'] for step_info in self.history],
+            self.prompt_budget,
+        ),
         before_ui_elements_list,
         self.additional_guidelines,
+        self.cache_friendly_prompts,
     )
     step_data['action_prompt'] = action_prompt
-    action_output, is_safe, raw_response = self.llm.predict_mm(
-        action_prompt,
-        [
-            step_data['raw_screenshot'],
-            before_screenshot,
-        ],
+    # Candidates use state.pixels, as the target element is marked on
+    # step_data['raw_screenshot'] while abandoned candidates may still run.
+    start = time.perf_counter()
+    action_output, is_safe, raw_response = (
+        agent_utils.first_valid_prediction(
+            functools.partial(
+                self.llm.predict_mm,
+                action_prompt,
+                [state.pixels, before_screenshot],
+            ),
+            functools.partial(
+                _is_valid_prediction, num_ui_elements=len(before_ui_elements)
+            ),
+            self.num_action_candidates,
+        )
+    )
+    latency_sec = time.perf_counter() - start
+    step_data['image_bytes_uploaded'] = (
+        self.llm.uploaded_image_bytes - uploaded_image_bytes_at_start
     )
 
     if is_safe == False:  # pylint: disable=singleton-comparison
@@ -430,7 +638,9 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     if not raw_response:
       raise RuntimeError('Error calling LLM in action selection phase.')
     step_data['action_output'] = action_output
-    step_data['action_raw_response'] = raw_response
+    step_data['action_raw_response'] = infer.to_response_record(
+        raw_response, latency_sec
+    )
 
     reason, action = m3a_utils.parse_reason_action_output(action_output)
 
@@ -476,8 +686,7 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     action_index = converted_action.index
     num_ui_elements = len(before_ui_elements)
     if (
-        converted_action.action_type
-        in ['click', 'long_press', 'input_text', 'scroll']
+        converted_action.action_type in _INDEX_ACTION_TYPES
         and action_index is not None
     ):
       if action_index >= num_ui_elements:
@@ -532,30 +741,29 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     time.sleep(self.wait_after_action_seconds)
 
     state = self.env.get_state(wait_to_stabilize=False)
-    logical_screen_size = self.env.logical_screen_size
-    orientation = self.env.orientation
-    physical_frame_boundary = self.env.physical_frame_boundary
+    geometry = self.env.get_screen_geometry()
+    logical_screen_size = geometry.logical_screen_size
+    orientation = geometry.orientation
+    physical_frame_boundary = geometry.physical_frame_boundary
     after_ui_elements = state.ui_elements
     after_ui_elements_list = _generate_ui_elements_description_list(
-        after_ui_elements, logical_screen_size
+        after_ui_elements, logical_screen_size, self.prompt_budget
     )
     after_screenshot = state.pixels.copy()
-    for index, ui_element in enumerate(after_ui_elements):
-      if m3a_utils.validate_ui_element(ui_element, logical_screen_size):
-        m3a_utils.add_ui_element_mark(
-            after_screenshot,
-            ui_element,
-            index,
-            logical_screen_size,
-            physical_frame_boundary,
-            orientation,
-        )
+    m3a_utils.add_ui_element_marks(
+        after_screenshot,
+        after_ui_elements,
+        logical_screen_size,
+        physical_frame_boundary,
+        orientation,
+    )
 
+    step_data['before_screenshot_with_som'] = before_screenshot.copy()
     m3a_utils.add_screenshot_label(
         step_data['before_screenshot_with_som'], 'before'
     )
     m3a_utils.add_screenshot_label(after_screenshot, 'after')
-    step_data['after_screenshot_with_som'] = after_screenshot.copy()
+    step_data['after_screenshot_with_som'] = after_screenshot
 
     summary_prompt = _summarize_prompt(
         action,
@@ -564,39 +772,32 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         before_ui_elements_list,
         after_ui_elements_list,
     )
-    summary, is_safe, raw_response = self.llm.predict_mm(
-        summary_prompt,
-        [
-            before_screenshot,
-            after_screenshot,
-        ],
-    )
-
-    if is_safe == False:  # pylint: disable=singleton-comparison
-      #  is_safe could be None
-      summary = """Summary triggered LLM safety classifier."""
+    if self._summary_executor is not None:
+      # The step is recorded now, and its summary filled in by the worker.
+      record = self.history.append(step_data)
+
+      def summarize_and_record() -> None:
+        self._summarize(
+            step_data,
+            action,
+            summary_prompt,
+            [before_screenshot, after_screenshot],
+            uploaded_image_bytes_at_start,
+        )
+        self.history.update(record, step_data)
 
-    if not raw_response:
-      print(
-          'Error calling LLM in summarization phase. This should not happen: '
-          f'{summary}'
+      self._pending_summary = self._summary_executor.submit(
+          summarize_and_record
       )
-      step_data['summary'] = (
-          'Some error occurred calling LLM during summarization phase: %s'
-          % summary
-      )
-      self.history.append(step_data)
-      return base_agent.AgentInteractionResult(
-          False,
+    else:
+      self._summarize(
           step_data,
+          action,
+          summary_prompt,
+          [before_screenshot, after_screenshot],
+          uploaded_image_bytes_at_start,
       )
-
-    step_data['summary_prompt'] = summary_prompt
-    step_data['summary'] = f'Action selected: {action}. {summary}'
-    print('Summary: ' + summary)
-    step_data['summary_raw_response'] = raw_response
-
-    self.history.append(step_data)
+      self.history.append(step_data)
     return base_agent.AgentInteractionResult(
         False,
         step_data,
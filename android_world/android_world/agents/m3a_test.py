@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
 from typing import Any
 from unittest import mock
 from absl.testing import absltest
 from android_world.agents import infer
 from android_world.agents import m3a
+from android_world.env import representation_utils
 from android_world.env import adb_utils
 from android_world.utils import test_utils
 import numpy as np
@@ -40,6 +43,32 @@ class MockMultimodalLlmWrapper(infer.MultimodalLlmWrapper):
       return infer.ERROR_CALLING_LLM, None, None
 
 
+class RecordingLlmWrapper(infer.MultimodalLlmWrapper):
+  """Waits, then completes the task after `num_steps`, recording prompts."""
+
+  def __init__(self, num_steps: int, summary_gate=None):
+    self.num_steps = num_steps
+    # Called before returning a summary.
+    self.summary_gate = summary_gate
+    self.prompts = []
+    self.num_action_prompts = 0
+
+  def predict_mm(
+      self, text_prompt: str, images: list[np.ndarray]
+  ) -> tuple[str, Any]:
+    self.prompts.append(text_prompt)
+    if 'summerize the latest step' in text_prompt:
+      if self.summary_gate is not None:
+        self.summary_gate()
+      return f'summary {len(self.prompts)}', None, 'raw'
+    self.num_action_prompts += 1
+    if self.num_action_prompts > self.num_steps:
+      action = "{'action_type': 'status', 'goal_status': 'complete'}"
+    else:
+      action = "{'action_type': 'wait'}"
+    return f'Reason: r.\nAction: {action}', None, 'raw'
+
+
 class M3AInteractionTest(absltest.TestCase):
 
   def setUp(self):
@@ -52,6 +81,15 @@ class M3AInteractionTest(absltest.TestCase):
         adb_utils,
         'get_physical_frame_boundary',
     ).start()
+    self.mock_get_device_state = mock.patch.object(
+        adb_utils,
+        'get_device_state',
+        return_value=adb_utils.DeviceState(
+            orientation=0,
+            logical_screen_size=(100, 100),
+            physical_frame_boundary=(0, 0, 100, 100),
+        ),
+    ).start()
 
   def tearDown(self):
     super().tearDown()
@@ -66,13 +104,12 @@ class M3AInteractionTest(absltest.TestCase):
         ),
         'test raw response',
     )])
-    self.mock_get_orientation.return_value = 0
-    self.mock_get_physical_frame_boundary.return_value = [0, 0, 100, 100]
     agent = m3a.M3A(env, llm)
 
     goal = 'do something'
     step_data = agent.step(goal)
     self.assertTrue(step_data.done)
+    self.assertEqual(step_data.data['image_bytes_uploaded'], 0)
 
   def test_step_method_with_invalid_action_output(self):
     env = test_utils.FakeAsyncEnv()
@@ -113,12 +150,6 @@ class M3AInteractionTest(absltest.TestCase):
             'test raw response',
         ),
     ])
-    self.mock_get_orientation.side_effect = [0, 0, 0]
-    self.mock_get_physical_frame_boundary.side_effect = [
-        [0, 0, 100, 100],
-        [0, 0, 100, 100],
-        [0, 0, 100, 100],
-    ]
     agent = m3a.M3A(env, llm)
 
     goal = 'do something'
@@ -129,6 +160,135 @@ class M3AInteractionTest(absltest.TestCase):
     step2_data = agent.step(goal)
     self.assertTrue(step2_data.done)
     self.assertLen(agent.history, 2)
+    self.assertIsInstance(
+        step1_data.data['action_raw_response'], infer.ResponseRecord
+    )
+    self.assertIsInstance(
+        step1_data.data['summary_raw_response'], infer.ResponseRecord
+    )
+    # Screenshots are returned to the caller, not kept by the agent.
+    self.assertIn('raw_screenshot', step1_data.data)
+    self.assertEqual(set(agent.history[0]), {'summary'})
+    # Each observation reads the screen geometry with a single adb call.
+    self.assertEqual(self.mock_get_device_state.call_count, 3)
+    self.mock_get_orientation.assert_not_called()
+    self.mock_get_physical_frame_boundary.assert_not_called()
+
+  def _run_steps(self, agent, num_steps):
+    for _ in range(num_steps):
+      agent.step('do something')
+    agent.flush()
+
+  def test_speculative_action_selection_skips_malformed_output(self):
+    responses = iter([
+        'Output in incorrect format.',
+        (
+            "Reason: completed.\nAction: {'action_type': 'status',"
+            " 'goal_status': 'complete'}"
+        ),
+    ])
+    lock = threading.Lock()
+
+    class SpeculativeLlm(infer.MultimodalLlmWrapper):
+
+      def predict_mm(self, text_prompt, images):
+        with lock:
+          return next(responses), None, 'raw'
+
+    agent = m3a.M3A(
+        test_utils.FakeAsyncEnv(), SpeculativeLlm(), num_action_candidates=2
+    )
+
+    step_data = agent.step('do something')
+
+    self.assertTrue(step_data.done)
+
+  @mock.patch.object(time, 'sleep')
+  def test_pipelined_summarization_keeps_prompts(self, unused_mock_sleep):
+    sequential_llm = RecordingLlmWrapper(num_steps=3)
+    pipelined_llm = RecordingLlmWrapper(num_steps=3)
+    sequential_agent = m3a.M3A(test_utils.FakeAsyncEnv(), sequential_llm)
+    pipelined_agent = m3a.M3A(
+        test_utils.FakeAsyncEnv(),
+        pipelined_llm,
+        pipeline_summarization=True,
+    )
+
+    self._run_steps(sequential_agent, 4)
+    self._run_steps(pipelined_agent, 4)
+
+    self.assertLen(pipelined_llm.prompts, 7)
+    self.assertEqual(pipelined_llm.prompts, sequential_llm.prompts)
+    self.assertEqual(
+        [step['summary'] for step in pipelined_agent.history],
+        [step['summary'] for step in sequential_agent.history],
+    )
+
+  @mock.patch.object(time, 'sleep')
+  def test_pipelined_summarization_overlaps_next_observation(
+      self, unused_mock_sleep
+  ):
+    env = test_utils.FakeAsyncEnv()
+    observations = threading.Condition()
+    num_observations = [0]
+    get_state = env.get_state
+
+    def counting_get_state(*args, **kwargs):
+      with observations:
+        num_observations[0] += 1
+        observations.notify_all()
+      return get_state(*args, **kwargs)
+
+    summary_overlapped = []
+
+    def wait_for_next_observation():
+      with observations:
+        start = num_observations[0]
+        summary_overlapped.append(
+            observations.wait_for(
+                lambda: num_observations[0] > start, timeout=5
+            )
+        )
+
+    env.get_state = counting_get_state
+    llm = RecordingLlmWrapper(
+        num_steps=1, summary_gate=wait_for_next_observation
+    )
+    agent = m3a.M3A(env, llm, pipeline_summarization=True)
+
+    first_step = agent.step('do something')
+    second_step = agent.step('do something')
+
+    # The summary call only returned once the next step observed the screen.
+    self.assertEqual(summary_overlapped, [True])
+    self.assertIn('summary', first_step.data['summary'])
+    self.assertTrue(second_step.done)
+
+
+class ActionSelectionPromptTest(absltest.TestCase):
+
+  def test_cache_friendly_prompt_has_static_prefix(self):
+    ui_elements = [
+        representation_utils.UIElement(
+            text='OK',
+            bbox_pixels=representation_utils.BoundingBox(0, 10, 0, 10),
+            is_visible=True,
+        )
+    ]
+    args = ('goal', ['summary'], ui_elements)
+
+    prompt = m3a.build_action_selection_prompt(*args)
+    cache_friendly_prompt = m3a.build_action_selection_prompt(
+        *args, cache_friendly=True
+    )
+
+    # The templates escape braces.
+    static_prefix = (m3a.PROMPT_PREFIX + m3a.GUIDANCE).format()
+    self.assertTrue(cache_friendly_prompt.startswith(static_prefix))
+    self.assertFalse(prompt.startswith(static_prefix))
+    self.assertCountEqual(
+        cache_friendly_prompt.split('\n'), prompt.split('\n')
+    )
 
 
 if __name__ == '__main__':
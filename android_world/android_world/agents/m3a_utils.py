@@ -16,10 +16,13 @@
 
 import ast
 import base64
+import functools
 import json
 import math
 import re
-from typing import Any, Optional
+from typing import Any, Collection, Optional, Sequence
+from android_world.agents import agent_utils
+from android_world.env import json_action
 from android_world.env import representation_utils
 import cv2
 import numpy as np
@@ -139,6 +142,190 @@ def get_ui_element_bbox_pixels(
     return None
 
 
+# For each orientation, the columns of [x_min, y_min, x_max, y_max] holding the
+# logical upper left and lower right corners, see _ui_element_logical_corner.
+_LOGICAL_CORNER_COLUMNS = {
+    0: (0, 1, 2, 3),
+    1: (0, 3, 2, 1),
+    2: (2, 3, 0, 1),
+    3: (2, 1, 0, 3),
+}
+
+
+def _logical_to_physical_points(
+    points: np.ndarray,
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+) -> np.ndarray:
+  """Vectorized version of _logical_to_physical for an (N, 2) int array."""
+  x, y = points[:, 0], points[:, 1]
+  px0, py0, px1, py1 = physical_frame_boundary
+  px, py = px1 - px0, py1 - py0
+  lx, ly = logical_screen_size
+
+  def scale(values: np.ndarray, numerator: int, denominator: int):
+    # Same float division and truncation towards zero as int(v * n / d).
+    return np.trunc(values * numerator / denominator).astype(np.int64)
+
+  if orientation == 0:
+    physical = (scale(x, px, lx) + px0, scale(y, py, ly) + py0)
+  elif orientation == 1:
+    physical = (px - scale(y, px, ly) + px0, scale(x, py, lx) + py0)
+  elif orientation == 2:
+    physical = (px - scale(x, px, lx) + px0, py - scale(y, py, ly) + py0)
+  elif orientation == 3:
+    physical = (scale(y, px, ly) + px0, py - scale(x, py, lx) + py0)
+  else:
+    raise ValueError('Unsupported orientation.')
+  return np.stack(physical, axis=1)
+
+
+@functools.lru_cache(maxsize=1024)
+def _text_mask(
+    text: str, font_scale: float, thickness: int
+) -> tuple[np.ndarray, int, int]:
+  """Renders text once, as cv2.putText would draw it.
+
+  Args:
+    text: The text to render.
+    font_scale: Font scale passed to cv2.putText.
+    thickness: Line thickness passed to cv2.putText.
+
+  Returns:
+    A boolean mask of the drawn pixels, and the offset (x, y) of its upper left
+    corner relative to the text origin.
+  """
+  (width, height), baseline = cv2.getTextSize(
+      text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness
+  )
+  pad = height + 2 * thickness + 2
+  canvas = np.zeros(
+      (height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8
+  )
+  origin = (pad, pad + height)
+  cv2.putText(
+      canvas,
+      text,
+      origin,
+      cv2.FONT_HERSHEY_SIMPLEX,
+      font_scale,
+      255,
+      thickness=thickness,
+  )
+  rows = np.flatnonzero(canvas.any(axis=1))
+  cols = np.flatnonzero(canvas.any(axis=0))
+  if not rows.size:
+    return np.zeros((0, 0), dtype=bool), 0, 0
+  mask = canvas[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1] > 0
+  return mask, int(cols[0]) - origin[0], int(rows[0]) - origin[1]
+
+
+def _put_text(
+    screenshot: np.ndarray,
+    text: str,
+    origin: tuple[int, int],
+    font_scale: float,
+    thickness: int,
+) -> None:
+  """Draws black text, reusing a cached rendering when it fits on screen."""
+  mask, dx, dy = _text_mask(text, font_scale, thickness)
+  x, y = origin[0] + dx, origin[1] + dy
+  height, width = mask.shape
+  # Text touching the border is clipped by cv2, which can change the drawn
+  # pixels, so only use the cached rendering when there is a margin.
+  if (
+      0 < x
+      and 0 < y
+      and x + width < screenshot.shape[1]
+      and y + height < screenshot.shape[0]
+  ):
+    screenshot[y : y + height, x : x + width][mask] = (0, 0, 0)
+  else:
+    cv2.putText(
+        screenshot,
+        text,
+        origin,
+        cv2.FONT_HERSHEY_SIMPLEX,
+        font_scale,
+        (0, 0, 0),
+        thickness=thickness,
+    )
+
+
+def _add_marks(
+    screenshot: np.ndarray,
+    ui_elements: Sequence[representation_utils.UIElement],
+    indices: Sequence[int | str],
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+) -> None:
+  """Draws the marks of UI elements that all have a bounding box."""
+  if not ui_elements:
+    return
+  if orientation not in _LOGICAL_CORNER_COLUMNS:
+    raise ValueError('Unsupported orientation.')
+  bboxes = np.trunc(
+      np.array(
+          [
+              (
+                  element.bbox_pixels.x_min,
+                  element.bbox_pixels.y_min,
+                  element.bbox_pixels.x_max,
+                  element.bbox_pixels.y_max,
+              )
+              for element in ui_elements
+          ],
+          dtype=np.float64,
+      )
+  ).astype(np.int64)
+  columns = _LOGICAL_CORNER_COLUMNS[orientation]
+  upper_left = _logical_to_physical_points(
+      bboxes[:, columns[:2]],
+      logical_screen_size,
+      physical_frame_boundary,
+      orientation,
+  )
+  lower_right = _logical_to_physical_points(
+      bboxes[:, columns[2:]],
+      logical_screen_size,
+      physical_frame_boundary,
+      orientation,
+  )
+
+  x_scale = screenshot.shape[1] / physical_frame_boundary[2]
+  y_scale = screenshot.shape[0] / physical_frame_boundary[3]
+  iso_scale = math.sqrt(x_scale * x_scale + y_scale * y_scale)
+  scales = np.array([x_scale, y_scale])
+  upper_left = np.trunc(upper_left * scales).astype(np.int64).tolist()
+  lower_right = np.trunc(lower_right * scales).astype(np.int64).tolist()
+
+  thickness = int(2 * iso_scale)
+  font_scale = 0.7 * iso_scale
+  label_left, label_right = int(1 * x_scale), int(35 * x_scale)
+  label_top, label_bottom = int(1 * y_scale), int(25 * y_scale)
+  text_baseline = int(20 * y_scale)
+
+  # Marks are drawn in order, as later marks may cover earlier ones.
+  for index, (x0, y0), (x1, y1) in zip(indices, upper_left, lower_right):
+    cv2.rectangle(
+        screenshot, (x0, y0), (x1, y1), color=(0, 255, 0), thickness=thickness
+    )
+    screenshot[
+        y0 + label_top : y0 + label_bottom,
+        x0 + label_left : x0 + label_right,
+        :,
+    ] = (255, 255, 255)
+    _put_text(
+        screenshot,
+        str(index),
+        (x0 + label_left, y0 + text_baseline),
+        font_scale,
+        thickness,
+    )
+
+
 def add_ui_element_mark(
     screenshot: np.ndarray,
     ui_element: representation_utils.UIElement,
@@ -159,61 +346,51 @@ def add_ui_element_mark(
     orientation: The current screen orientation.
   """
   if ui_element.bbox_pixels:
-    upper_left_logical, lower_right_logical = _ui_element_logical_corner(
-        ui_element, orientation
-    )
-    upper_left_physical = _logical_to_physical(
-        upper_left_logical,
-        logical_screen_size,
-        physical_frame_boundary,
-        orientation,
-    )
-    lower_right_physical = _logical_to_physical(
-        lower_right_logical,
+    _add_marks(
+        screenshot,
+        [ui_element],
+        [index],
         logical_screen_size,
         physical_frame_boundary,
         orientation,
     )
-    x_scale = screenshot.shape[1] / physical_frame_boundary[2]
-    y_scale = screenshot.shape[0] / physical_frame_boundary[3]
-    iso_scale = math.sqrt(x_scale * x_scale + y_scale * y_scale)
-    upper_left_physical = (
-        int(upper_left_physical[0] * x_scale),
-        int(upper_left_physical[1] * y_scale),
-    )
-    lower_right_physical = (
-        int(lower_right_physical[0] * x_scale),
-        int(lower_right_physical[1] * y_scale),
-    )
 
-    cv2.rectangle(
-        screenshot,
-        upper_left_physical,
-        lower_right_physical,
-        color=(0, 255, 0),
-        thickness=int(2 * iso_scale),
-    )
-    screenshot[
-        upper_left_physical[1]
-        + int(1 * y_scale) : upper_left_physical[1]
-        + int(25 * y_scale),
-        upper_left_physical[0]
-        + int(1 * x_scale) : upper_left_physical[0]
-        + int(35 * x_scale),
-        :,
-    ] = (255, 255, 255)
-    cv2.putText(
-        screenshot,
-        str(index),
-        (
-            upper_left_physical[0] + int(1 * x_scale),
-            upper_left_physical[1] + int(20 * y_scale),
-        ),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        0.7 * iso_scale,
-        (0, 0, 0),
-        thickness=int(2 * iso_scale),
-    )
+
+def add_ui_element_marks(
+    screenshot: np.ndarray,
+    ui_elements: Sequence[representation_utils.UIElement],
+    logical_screen_size: tuple[int, int],
+    physical_frame_boundary: tuple[int, int, int, int],
+    orientation: int,
+):
+  """Add marks for all valid UI elements, indexed by position in the list.
+
+  Same as calling `add_ui_element_mark` for each element that passes
+  `validate_ui_element`, but transforms all bounding boxes at once and reuses
+  the rendering of index labels across calls.
+
+  Args:
+    screenshot: The screenshot as a numpy ndarray.
+    ui_elements: All UI elements on screen.
+    logical_screen_size: The logical screen size.
+    physical_frame_boundary: The physical coordinates in portrait orientation
+      for the upper left and lower right corner for the frame.
+    orientation: The current screen orientation.
+  """
+  indices = [
+      index
+      for index, ui_element in enumerate(ui_elements)
+      if ui_element.bbox_pixels
+      and validate_ui_element(ui_element, logical_screen_size)
+  ]
+  _add_marks(
+      screenshot,
+      [ui_elements[index] for index in indices],
+      indices,
+      logical_screen_size,
+      physical_frame_boundary,
+      orientation,
+  )
 
 
 def add_screenshot_label(screenshot: np.ndarray, label: str):
@@ -278,6 +455,39 @@ def parse_reason_action_output(
   return reason, action
 
 
+def is_valid_action_output(
+    action_output: str,
+    num_ui_elements: int,
+    index_action_types: Collection[str],
+) -> bool:
+  """Checks if an action selection output can be executed as is.
+
+  Args:
+    action_output: Raw output, in the format 'Reason: xxx\nAction: xxx'.
+    num_ui_elements: Number of UI elements the action may refer to.
+    index_action_types: Action types whose index must refer to a UI element.
+
+  Returns:
+    Whether the output parses into a JSONAction whose index, if any, is within
+    the UI element list.
+  """
+  reason, action = parse_reason_action_output(action_output)
+  if not reason or not action:
+    return False
+  try:
+    converted_action = json_action.JSONAction(
+        **agent_utils.extract_json(action)
+    )
+  except Exception:  # pylint: disable=broad-exception-caught
+    return False
+  if (
+      converted_action.action_type in index_action_types
+      and converted_action.index is not None
+  ):
+    return 0 <= converted_action.index < num_ui_elements
+  return True
+
+
 def extract_json(s: str) -> Optional[dict[str, Any]]:
   """Extracts JSON from string.
 
@@ -0,0 +1,186 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for m3a_utils."""
+
+import math
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+import cv2
+import numpy as np
+
+
+def _reference_add_ui_element_mark(
+    screenshot, ui_element, index, logical_screen_size, frame, orientation
+):
+  """Per-element drawing with cv2, as done before marks were batched."""
+  bbox = m3a_utils.get_ui_element_bbox_pixels(
+      ui_element, logical_screen_size, frame, orientation
+  )
+  x_scale = screenshot.shape[1] / frame[2]
+  y_scale = screenshot.shape[0] / frame[3]
+  iso_scale = math.sqrt(x_scale * x_scale + y_scale * y_scale)
+  x0, y0 = int(bbox.x_min * x_scale), int(bbox.y_min * y_scale)
+  x1, y1 = int(bbox.x_max * x_scale), int(bbox.y_max * y_scale)
+  cv2.rectangle(
+      screenshot,
+      (x0, y0),
+      (x1, y1),
+      color=(0, 255, 0),
+      thickness=int(2 * iso_scale),
+  )
+  screenshot[
+      y0 + int(1 * y_scale) : y0 + int(25 * y_scale),
+      x0 + int(1 * x_scale) : x0 + int(35 * x_scale),
+      :,
+  ] = (255, 255, 255)
+  cv2.putText(
+      screenshot,
+      str(index),
+      (x0 + int(1 * x_scale), y0 + int(20 * y_scale)),
+      cv2.FONT_HERSHEY_SIMPLEX,
+      0.7 * iso_scale,
+      (0, 0, 0),
+      thickness=int(2 * iso_scale),
+  )
+
+
+def _random_ui_elements(rng, num_elements, width, height):
+  ui_elements = []
+  for _ in range(num_elements):
+    x_min = float(rng.uniform(-50, width))
+    y_min = float(rng.uniform(-50, height))
+    ui_elements.append(
+        representation_utils.UIElement(
+            is_visible=bool(rng.random() > 0.1),
+            bbox_pixels=representation_utils.BoundingBox(
+                x_min=x_min,
+                x_max=x_min + float(rng.uniform(-5, 300)),
+                y_min=y_min,
+                y_max=y_min + float(rng.uniform(-5, 150)),
+            ),
+        )
+    )
+  ui_elements.append(representation_utils.UIElement(is_visible=True))
+  return ui_elements
+
+
+class AddUiElementMarksTest(parameterized.TestCase):
+
+  @parameterized.product(
+      orientation=(0, 1, 2, 3),
+      screenshot_scale=(1.0, 0.5),
+  )
+  def test_matches_per_element_drawing(self, orientation, screenshot_scale):
+    rng = np.random.default_rng(orientation)
+    if orientation in (0, 2):
+      logical_screen_size = (540, 1200)
+    else:
+      logical_screen_size = (1200, 540)
+    frame = (0, 0, 540, 1200)
+    screenshot = rng.integers(
+        0,
+        256,
+        size=(int(1200 * screenshot_scale), int(540 * screenshot_scale), 3),
+        dtype=np.uint8,
+    )
+    ui_elements = _random_ui_elements(rng, 150, *logical_screen_size)
+    expected = screenshot.copy()
+    for index, ui_element in enumerate(ui_elements):
+      if ui_element.bbox_pixels and m3a_utils.validate_ui_element(
+          ui_element, logical_screen_size
+      ):
+        _reference_add_ui_element_mark(
+            expected,
+            ui_element,
+            index,
+            logical_screen_size,
+            frame,
+            orientation,
+        )
+
+    m3a_utils.add_ui_element_marks(
+        screenshot, ui_elements, logical_screen_size, frame, orientation
+    )
+
+    np.testing.assert_array_equal(screenshot, expected)
+
+  def test_single_mark_matches_per_element_drawing(self):
+    ui_element = representation_utils.UIElement(
+        bbox_pixels=representation_utils.BoundingBox(
+            x_min=10.7, x_max=200.2, y_min=30.5, y_max=90.9
+        )
+    )
+    screenshot = np.zeros((400, 300, 3), dtype=np.uint8)
+    expected = screenshot.copy()
+    _reference_add_ui_element_mark(
+        expected, ui_element, 'label', (300, 400), (0, 0, 300, 400), 0
+    )
+
+    m3a_utils.add_ui_element_mark(
+        screenshot, ui_element, 'label', (300, 400), (0, 0, 300, 400), 0
+    )
+
+    np.testing.assert_array_equal(screenshot, expected)
+
+  def test_element_without_bbox_is_skipped(self):
+    screenshot = np.zeros((40, 30, 3), dtype=np.uint8)
+
+    m3a_utils.add_ui_element_mark(
+        screenshot,
+        representation_utils.UIElement(),
+        0,
+        (30, 40),
+        (0, 0, 30, 40),
+        0,
+    )
+
+    self.assertFalse(screenshot.any())
+
+  def test_invalid_orientation(self):
+    with self.assertRaises(ValueError):
+      m3a_utils.add_ui_element_marks(
+          np.zeros((40, 30, 3), dtype=np.uint8),
+          _random_ui_elements(np.random.default_rng(0), 3, 30, 40),
+          (30, 40),
+          (0, 0, 30, 40),
+          5,
+      )
+
+
+class IsValidActionOutputTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      ("Reason: r\nAction: {'action_type': 'click', 'index': 2}", True),
+      ("Reason: r\nAction: {'action_type': 'click', 'index': 3}", False),
+      ("Reason: r\nAction: {'action_type': 'scroll', 'index': 3}", True),
+      ("Reason: r\nAction: {'action_type': 'wait'}", True),
+      ("Reason: r\nAction: {'action_type': 'fly'}", False),
+      ("Action: {'action_type': 'wait'}", False),
+      ('Reason: r\nAction: not json', False),
+  )
+  def test_is_valid_action_output(self, action_output, expected):
+    self.assertEqual(
+        m3a_utils.is_valid_action_output(
+            action_output, num_ui_elements=3, index_action_types=('click',)
+        ),
+        expected,
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
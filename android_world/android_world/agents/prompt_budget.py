@@ -0,0 +1,336 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Token budgets for the UI element lists and step history in agent prompts.
+
+The UI element list grows with screen complexity and the step history with
+episode length, and together they dominate the size, latency and cost of the
+prompts of M3A and T3A. `PromptBudget` bounds both:
+
+- UI elements that carry no information (not interactable, no text) and
+  duplicates of the same on-screen element are dropped.
+- Elements are encoded compactly, listing only the attributes that are set.
+- If the list is still over budget, the least useful elements are dropped,
+  keeping interactable, labelled ones. Indexes are unchanged, so they still
+  refer to the same elements in actions and on the screenshot.
+- Only the summaries of the most recent steps are kept.
+
+`episode_token_report` compares the prompts of recorded episodes with and
+without a budget.
+"""
+
+import dataclasses
+import functools
+import math
+from typing import Any, Callable, Optional, Sequence
+
+from android_world.agents import m3a_utils
+from android_world.env import representation_utils
+
+# Describes a UI element given its index in the UI element list.
+DescribeFn = Callable[[representation_utils.UIElement, int], str]
+
+# Rough average for English text and JSON-like markup with GPT tokenizers.
+_CHARS_PER_TOKEN = 4
+
+_BOOLEAN_ATTRIBUTES = (
+    'is_checked',
+    'is_clickable',
+    'is_editable',
+    'is_focusable',
+    'is_long_clickable',
+    'is_scrollable',
+    'is_selected',
+)
+_TEXT_ATTRIBUTES = (
+    'text',
+    'content_description',
+    'hint_text',
+    'tooltip',
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class PromptBudget:
+  """Limits on the variable-size parts of an agent prompt.
+
+  Attributes:
+    max_ui_element_tokens: Maximum estimated number of tokens for the UI
+      element list, or None for no limit.
+    max_history_steps: Maximum number of step summaries in the history, or
+      None for no limit. The most recent steps are kept.
+    max_history_tokens: Maximum estimated number of tokens for the history, or
+      None for no limit. The most recent steps are kept.
+    compact: Whether to encode UI elements with only the attributes that are
+      set, instead of the agent's default encoding.
+  """
+
+  max_ui_element_tokens: Optional[int] = None
+  max_history_steps: Optional[int] = None
+  max_history_tokens: Optional[int] = None
+  compact: bool = True
+
+
+def estimate_tokens(text: str) -> int:
+  """Returns a rough estimate of the number of tokens in `text`."""
+  return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def is_interactable(ui_element: representation_utils.UIElement) -> bool:
+  return bool(
+      ui_element.is_clickable
+      or ui_element.is_long_clickable
+      or ui_element.is_editable
+      or ui_element.is_scrollable
+      or ui_element.is_checkable
+  )
+
+
+def _has_label(ui_element: representation_utils.UIElement) -> bool:
+  return any(getattr(ui_element, name) for name in _TEXT_ATTRIBUTES)
+
+
+def _priority(ui_element: representation_utils.UIElement) -> int:
+  """Returns how useful an element is to the agent, higher is better."""
+  return 2 * is_interactable(ui_element) + _has_label(ui_element)
+
+
+def compact_description(
+    ui_element: representation_utils.UIElement,
+    index: int,
+    include_bbox: bool = False,
+) -> str:
+  """Describes a UI element with only the attributes that are set.
+
+  Args:
+    ui_element: The UI element.
+    index: Its index in the UI element list.
+    include_bbox: Whether to include the bounding box in pixels, for agents
+      that do not see the screenshot.
+
+  Returns:
+    A line such as `UI element 3: {"text": "OK", "is_clickable": True}`.
+  """
+  fields = []
+  for name in _TEXT_ATTRIBUTES:
+    value = getattr(ui_element, name)
+    if value:
+      fields.append(f'"{name}": "{value}"')
+  for name in _BOOLEAN_ATTRIBUTES:
+    if getattr(ui_element, name):
+      fields.append(f'"{name}": True')
+  if include_bbox and ui_element.bbox_pixels:
+    bbox = ui_element.bbox_pixels
+    fields.append(
+        f'"bbox": [{bbox.x_min:g}, {bbox.y_min:g}, {bbox.x_max:g},'
+        f' {bbox.y_max:g}]'
+    )
+  return f'UI element {index}: {{{", ".join(fields)}}}'
+
+
+def _dedupe_key(ui_element: representation_utils.UIElement) -> Any:
+  bbox = ui_element.bbox_pixels
+  return (
+      (bbox.x_min, bbox.y_min, bbox.x_max, bbox.y_max) if bbox else None,
+      ui_element.text,
+      ui_element.content_description,
+  )
+
+
+def select_ui_elements(
+    ui_elements: Sequence[representation_utils.UIElement],
+    screen_width_height_px: tuple[int, int],
+) -> list[int]:
+  """Returns the indexes of the elements worth describing to the agent.
+
+  Keeps the valid elements, see `m3a_utils.validate_ui_element`, that are
+  interactable or labelled. Of the elements with the same bounding box and
+  label, e.g. a clickable container and its text child, only the most useful
+  one is kept.
+
+  Args:
+    ui_elements: UI elements for the current screen.
+    screen_width_height_px: The logical screen size.
+  """
+  selected = {}
+  for index, ui_element in enumerate(ui_elements):
+    if not m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
+      continue
+    if not _priority(ui_element):
+      continue
+    key = _dedupe_key(ui_element)
+    if key in selected and _priority(ui_elements[selected[key]]) >= _priority(
+        ui_element
+    ):
+      continue
+    selected[key] = index
+  return sorted(selected.values())
+
+
+def describe_ui_elements(
+    ui_elements: Sequence[representation_utils.UIElement],
+    screen_width_height_px: tuple[int, int],
+    budget: PromptBudget,
+    describe_fn: DescribeFn,
+    include_bbox: bool = False,
+) -> str:
+  """Describes the UI elements within the budget.
+
+  Args:
+    ui_elements: UI elements for the current screen.
+    screen_width_height_px: The logical screen size.
+    budget: The prompt budget.
+    describe_fn: Describes an element, used if the budget is not compact.
+    include_bbox: Whether compact descriptions include the bounding box, see
+      `compact_description`.
+
+  Returns:
+    One line per described element, in index order.
+  """
+  if budget.compact:
+    describe_fn = functools.partial(
+        compact_description, include_bbox=include_bbox
+    )
+  descriptions = {
+      index: describe_fn(ui_elements[index], index)
+      for index in select_ui_elements(ui_elements, screen_width_height_px)
+  }
+  if budget.max_ui_element_tokens is not None:
+    kept = {}
+    num_tokens = 0
+    # Most useful first; earlier elements first among equally useful ones.
+    for index in sorted(
+        descriptions, key=lambda i: (-_priority(ui_elements[i]), i)
+    ):
+      line_tokens = estimate_tokens(descriptions[index] + '\n')
+      if num_tokens + line_tokens > budget.max_ui_element_tokens:
+        continue
+      kept[index] = descriptions[index]
+      num_tokens += line_tokens
+    descriptions = kept
+  return ''.join(
+      descriptions[index] + '\n' for index in sorted(descriptions)
+  )
+
+
+def window_history(
+    history: Sequence[str], budget: Optional[PromptBudget]
+) -> list[str]:
+  """Keeps the most recent step summaries within the budget.
+
+  Args:
+    history: One line per previous step, oldest first.
+    budget: The prompt budget, or None to keep everything.
+
+  Returns:
+    The most recent lines, preceded by a note on how many steps were omitted.
+  """
+  if budget is None:
+    return list(history)
+  start = 0
+  if budget.max_history_steps is not None:
+    start = max(start, len(history) - budget.max_history_steps)
+  if budget.max_history_tokens is not None:
+    num_tokens = 0
+    end = len(history)
+    while end > start:
+      num_tokens += estimate_tokens(history[end - 1] + '\n')
+      if num_tokens > budget.max_history_tokens:
+        break
+      end -= 1
+    start = end
+  if not start:
+    return list(history)
+  return [f'(Steps 1 to {start} omitted.)'] + list(history[start:])
+
+
+@dataclasses.dataclass(frozen=True)
+class StepTokens:
+  """Estimated action selection prompt tokens for one step."""
+
+  step: int
+  tokens_before: int
+  tokens_after: int
+
+
+# Builds the action selection prompt of an agent from the goal, the summaries
+# of the previous steps and the UI elements, with an optional budget.
+BuildPromptFn = Callable[
+    [
+        str,
+        Sequence[str],
+        Sequence[representation_utils.UIElement],
+        Optional[PromptBudget],
+    ],
+    str,
+]
+
+
+def episode_token_report(
+    goal: str,
+    summaries: Sequence[str],
+    ui_elements: Sequence[Sequence[representation_utils.UIElement]],
+    build_prompt: BuildPromptFn,
+    budget: PromptBudget,
+) -> list[StepTokens]:
+  """Compares an episode's action selection prompts with and without budget.
+
+  Both prompts are rebuilt from the recorded data with `build_prompt`, e.g.
+  `m3a.build_action_selection_prompt`, so they are directly comparable.
+
+  Args:
+    goal: The goal of the episode.
+    summaries: The summary recorded for each step.
+    ui_elements: The UI elements observed at the start of each step.
+    build_prompt: Builds the agent's action selection prompt.
+    budget: The budget to evaluate.
+
+  Returns:
+    The estimated number of tokens of each step's prompt.
+  """
+  report = []
+  for step, step_ui_elements in enumerate(ui_elements):
+    previous = summaries[:step]
+    report.append(
+        StepTokens(
+            step=step + 1,
+            tokens_before=estimate_tokens(
+                build_prompt(goal, previous, step_ui_elements, None)
+            ),
+            tokens_after=estimate_tokens(
+                build_prompt(goal, previous, step_ui_elements, budget)
+            ),
+        )
+    )
+  return report
+
+
+def format_token_report(report: Sequence[StepTokens]) -> str:
+  """Formats a report from `episode_token_report` as a table."""
+  lines = ['step  before  after  saved']
+  for row in report:
+    saved = 1 - row.tokens_after / row.tokens_before if row.tokens_before else 0
+    lines.append(
+        f'{row.step:4d}  {row.tokens_before:6d}  {row.tokens_after:5d}'
+        f'  {saved:5.0%}'
+    )
+  total_before = sum(row.tokens_before for row in report)
+  total_after = sum(row.tokens_after for row in report)
+  if total_before:
+    lines.append(
+        f'total {total_before:6d}  {total_after:5d}'
+        f'  {1 - total_after / total_before:5.0%}'
+    )
+  return '\n'.join(lines)
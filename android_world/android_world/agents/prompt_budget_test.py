@@ -0,0 +1,195 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tests for prompt_budget."""
+
+import functools
+
+from absl.testing import absltest
+from android_world.agents import m3a
+from android_world.agents import prompt_budget
+from android_world.agents import t3a
+from android_world.env import representation_utils
+
+_SCREEN_SIZE = (1000, 1000)
+
+
+def _element(text=None, y=0, **kwargs):
+  return representation_utils.UIElement(
+      text=text,
+      bbox_pixels=representation_utils.BoundingBox(0, 100, y, y + 50),
+      is_visible=True,
+      **kwargs,
+  )
+
+
+class SelectUiElementsTest(absltest.TestCase):
+
+  def test_drops_invisible_and_uninformative_elements(self):
+    ui_elements = [
+        _element('Title'),
+        _element(y=100),  # No label, not interactable.
+        _element(y=200, is_clickable=True),
+        representation_utils.UIElement(text='Hidden', is_visible=False),
+    ]
+
+    self.assertEqual(
+        prompt_budget.select_ui_elements(ui_elements, _SCREEN_SIZE), [0, 2]
+    )
+
+  def test_dedupes_same_element(self):
+    ui_elements = [
+        _element('OK'),  # Text child of the button below.
+        _element('OK', is_clickable=True),
+        _element('OK', y=100, is_clickable=True),  # Another button.
+    ]
+
+    self.assertEqual(
+        prompt_budget.select_ui_elements(ui_elements, _SCREEN_SIZE), [1, 2]
+    )
+
+
+class DescribeUiElementsTest(absltest.TestCase):
+
+  def test_compact_description(self):
+    description = prompt_budget.compact_description(
+        _element('OK', is_clickable=True, is_checked=False), 3
+    )
+
+    self.assertEqual(
+        description, 'UI element 3: {"text": "OK", "is_clickable": True}'
+    )
+
+  def test_compact_description_with_bbox(self):
+    description = prompt_budget.compact_description(
+        _element('OK', y=10), 0, include_bbox=True
+    )
+
+    self.assertEqual(
+        description, 'UI element 0: {"text": "OK", "bbox": [0, 10, 100, 60]}'
+    )
+
+  def test_keeps_most_useful_elements_within_budget(self):
+    ui_elements = [
+        _element('Label 0'),
+        _element('Button 1', y=100, is_clickable=True),
+        _element('Label 2', y=200),
+        _element(y=300, is_editable=True),
+    ]
+    line_tokens = prompt_budget.estimate_tokens(
+        prompt_budget.compact_description(ui_elements[1], 1) + '\n'
+    )
+
+    description = prompt_budget.describe_ui_elements(
+        ui_elements,
+        _SCREEN_SIZE,
+        prompt_budget.PromptBudget(max_ui_element_tokens=2 * line_tokens),
+        describe_fn=None,
+    )
+
+    self.assertEqual(
+        description,
+        'UI element 1: {"text": "Button 1", "is_clickable": True}\n'
+        'UI element 3: {"is_editable": True}\n',
+    )
+
+  def test_uses_agent_encoding_if_not_compact(self):
+    description = prompt_budget.describe_ui_elements(
+        [_element('OK')],
+        _SCREEN_SIZE,
+        prompt_budget.PromptBudget(compact=False),
+        lambda ui_element, index: f'{index}: {ui_element.text}',
+    )
+
+    self.assertEqual(description, '0: OK\n')
+
+
+class WindowHistoryTest(absltest.TestCase):
+
+  def test_no_budget(self):
+    self.assertEqual(prompt_budget.window_history(['a', 'b'], None), ['a', 'b'])
+
+  def test_max_steps(self):
+    history = prompt_budget.window_history(
+        ['a', 'b', 'c'], prompt_budget.PromptBudget(max_history_steps=2)
+    )
+
+    self.assertEqual(history, ['(Steps 1 to 1 omitted.)', 'b', 'c'])
+
+  def test_max_tokens(self):
+    history = prompt_budget.window_history(
+        ['a' * 100, 'b' * 20, 'c' * 20],
+        prompt_budget.PromptBudget(max_history_tokens=15),
+    )
+
+    self.assertEqual(history, ['(Steps 1 to 1 omitted.)', 'b' * 20, 'c' * 20])
+
+  def test_within_budget(self):
+    history = prompt_budget.window_history(
+        ['a', 'b'], prompt_budget.PromptBudget(max_history_steps=2)
+    )
+
+    self.assertEqual(history, ['a', 'b'])
+
+
+class EpisodeTokenReportTest(absltest.TestCase):
+
+  def test_report(self):
+    ui_elements = [
+        [_element(f'Item {i}', y=i, is_clickable=True) for i in range(50)]
+        + [_element(y=i) for i in range(50)]
+    ] * 3
+    budget = prompt_budget.PromptBudget(
+        max_ui_element_tokens=200, max_history_steps=1
+    )
+
+    for build_prompt in (
+        m3a.build_action_selection_prompt,
+        t3a.build_action_selection_prompt,
+    ):
+      report = prompt_budget.episode_token_report(
+          'goal',
+          ['summary ' * 20] * 3,
+          ui_elements,
+          functools.partial(build_prompt, screen_width_height_px=_SCREEN_SIZE),
+          budget,
+      )
+
+      self.assertEqual([row.step for row in report], [1, 2, 3])
+      for row in report:
+        self.assertLess(row.tokens_after, row.tokens_before)
+      self.assertIn('total', prompt_budget.format_token_report(report))
+
+  def test_unbudgeted_prompt_is_unchanged(self):
+    ui_elements = [_element('OK', is_clickable=True)]
+
+    prompt = m3a.build_action_selection_prompt(
+        'goal', ['first'], ui_elements, screen_width_height_px=_SCREEN_SIZE
+    )
+
+    self.assertEqual(
+        prompt,
+        m3a._action_selection_prompt(
+            'goal',
+            ['Step 1- first'],
+            m3a._generate_ui_elements_description_list(
+                ui_elements, _SCREEN_SIZE
+            ),
+        ),
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
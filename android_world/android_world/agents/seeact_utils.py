@@ -25,6 +25,7 @@ import re
 import string
 from typing import Any
 from absl import logging
+from android_world.agents import http_utils
 from android_world.agents import infer
 from android_world.env import json_action
 from android_world.env import representation_utils
@@ -32,11 +33,15 @@ from IPython import display
 from matplotlib.pylab import plt
 import numpy as np
 import PIL
-import requests
 
 # OpenAI model used for these experiments.
 _GPT_TURBO = "gpt-4-turbo-2024-04-09"
 
+# Prompt cache usage of `execute_openai_request`. The system prompt and the
+# action generation turn are sent again as the prefix of the grounding request,
+# so they can be served from OpenAI's prompt cache.
+PROMPT_CACHE = infer.PromptCacheTracker()
+
 VALID_ACTIONS = {
     "CLICK",
     "TERMINATE",
@@ -294,11 +299,59 @@ def display_prompt(
   print(extra_text)
 
 
+def _openai_request(
+    messages_payload: list[dict[str, Any]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+) -> tuple[dict[str, Any], dict[str, str]]:
+  """Returns the payload and headers of a chat completion request."""
+  api_key = os.environ["OPENAI_API_KEY"]
+  headers = {
+      "Content-Type": "application/json",
+      "Authorization": f"Bearer {api_key}",
+  }
+  payload = {
+      "model": model,
+      "messages": messages_payload,
+      "temperature": temperature,
+      "max_tokens": max_tokens,
+  }
+  return payload, headers
+
+
+def _prompt_text(messages_payload: list[dict[str, Any]]) -> str:
+  """Returns the text parts of the messages, in the order they are sent."""
+  texts = []
+  for message in messages_payload:
+    content = message["content"]
+    if isinstance(content, str):
+      texts.append(content)
+      continue
+    for part in content:
+      if part.get("type") == "text":
+        texts.append(part["text"])
+  return "\n".join(texts)
+
+
+def _record_prompt_cache(
+    messages_payload: list[dict[str, Any]], body: dict[str, Any]
+) -> None:
+  if "choices" not in body:
+    return
+  PROMPT_CACHE.record(
+      _prompt_text(messages_payload),
+      (body.get("usage") or {}).get("prompt_tokens"),
+      infer.openai_cached_tokens(body),
+  )
+
+
 def execute_openai_request(
     messages_payload: list[dict[str, Any]],
     model: str = _GPT_TURBO,
     temperature: float = 0.0,
     max_tokens: int = 4096,
+    timeout_sec: http_utils.Timeout = http_utils.DEFAULT_TIMEOUT_SEC,
 ) -> dict[str, Any]:
   """Executes a request to the OpenAI API with the given JSON input.
 
@@ -307,29 +360,49 @@ def execute_openai_request(
     model: The model to use for the request.
     temperature: Temperature setting for GPT's responses.
     max_tokens: Max number of output tokens.
+    timeout_sec: Timeout for the request, see `http_utils.Timeout`.
 
   Returns:
     The response from the OpenAI API as a dictionary.
   """
-  api_key = os.environ["OPENAI_API_KEY"]
-  headers = {
-      "Content-Type": "application/json",
-      "Authorization": f"Bearer {api_key}",
-  }
-  payload = {
-      "model": model,
-      "messages": messages_payload,
-      "temperature": temperature,
-      "max_tokens": max_tokens,
-  }
-
-  response = requests.post(
-      "https://api.openai.com/v1/chat/completions",
+  payload, headers = _openai_request(
+      messages_payload, model, temperature, max_tokens
+  )
+  response, body = http_utils.post_json(
+      http_utils.openai_chat_completions_url(),
+      payload,
       headers=headers,
-      json=payload,
+      timeout=timeout_sec,
   )
+  if body is None:
+    response.raise_for_status()
+    raise ValueError(f"OpenAI API returned a non-JSON body: {response.text}")
+  _record_prompt_cache(messages_payload, body)
+  return body
+
 
-  return response.json()
+async def execute_openai_request_async(
+    messages_payload: list[dict[str, Any]],
+    model: str = _GPT_TURBO,
+    temperature: float = 0.0,
+    max_tokens: int = 4096,
+    timeout_sec: http_utils.Timeout = http_utils.DEFAULT_TIMEOUT_SEC,
+) -> dict[str, Any]:
+  """Same as `execute_openai_request`, without blocking the event loop."""
+  payload, headers = _openai_request(
+      messages_payload, model, temperature, max_tokens
+  )
+  response, body = await http_utils.post_json_async(
+      http_utils.openai_chat_completions_url(),
+      payload,
+      headers=headers,
+      timeout=timeout_sec,
+  )
+  if body is None:
+    response.raise_for_status()
+    raise ValueError(f"OpenAI API returned a non-JSON body: {response.text}")
+  _record_prompt_cache(messages_payload, body)
+  return body
 
 
 @dataclasses.dataclass(frozen=True)
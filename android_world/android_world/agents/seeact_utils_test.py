@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest import mock
+
 from absl.testing import absltest
+from android_world.agents import http_utils
 from android_world.agents import seeact_utils
 from android_world.env import json_action
 from android_world.env import representation_utils
@@ -417,5 +420,37 @@ class TestConvertSeeActActionToJSONAction(absltest.TestCase):
     self.assertEqual(result, expected_json_action)
 
 
+class ExecuteOpenaiRequestTest(absltest.TestCase):
+
+  @mock.patch.dict("os.environ", {"OPENAI_API_KEY": "key"})
+  @mock.patch.object(http_utils, "post_json")
+  @mock.patch.object(seeact_utils, "PROMPT_CACHE")
+  def test_records_prompt_cache_usage(self, mock_cache, mock_post_json):
+    body = {
+        "choices": [{"message": {"content": "ok"}}],
+        "usage": {
+            "prompt_tokens": 3000,
+            "prompt_tokens_details": {"cached_tokens": 2048},
+        },
+    }
+    mock_post_json.return_value = (mock.Mock(), body)
+    messages = [
+        {"role": "system", "content": [{"type": "text", "text": "system"}]},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": "query"},
+                {"type": "image_url", "image_url": {"url": "data:"}},
+            ],
+        },
+        {"role": "assistant", "content": "answer"},
+    ]
+
+    self.assertEqual(seeact_utils.execute_openai_request(messages), body)
+    mock_cache.record.assert_called_once_with(
+        "system\nquery\nanswer", 3000, 2048
+    )
+
+
 if __name__ == "__main__":
   absltest.main()
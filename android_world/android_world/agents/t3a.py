@@ -14,10 +14,14 @@
 
 """T3A: Text-only Autonomous Agent for Android."""
 
+import functools
+import time
+from typing import Any, Optional, Sequence
 from android_world.agents import agent_utils
 from android_world.agents import base_agent
 from android_world.agents import infer
 from android_world.agents import m3a_utils
+from android_world.agents import prompt_budget
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.env import json_action
@@ -153,6 +157,24 @@ ACTION_SELECTION_PROMPT_TEMPLATE = (
     'Your Answer:\n'
 )
 
+
+# Same as ACTION_SELECTION_PROMPT_TEMPLATE, with the guidelines moved before
+# the goal so that all static instructions come first. Providers cache
+# prompt prefixes, and can then serve them from cache at every step.
+CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE = (
+    PROMPT_PREFIX
+    + GUIDANCE
+    + '\nThe current user goal/request is: {goal}'
+    + '\n\nHere is a history of what you have done so far:\n{history}'
+    + '\n\nHere is a list of descriptions for some UI elements on the current'
+    ' screen:\n{ui_elements_description}\n'
+    + '{additional_guidelines}'
+    + '\n\nNow output an action from the above list in the correct JSON format,'
+    ' following the reason why you do that. Your answer should look like:\n'
+    'Reason: ...\nAction: {{"action_type":...}}\n\n'
+    'Your Answer:\n'
+)
+
 SUMMARIZATION_PROMPT_TEMPLATE = (
     PROMPT_PREFIX
     + '\nThe (overall) user goal/request is:{goal}\n'
@@ -184,30 +206,50 @@ SUMMARIZATION_PROMPT_TEMPLATE = (
 
 
 def _generate_ui_elements_description_list_full(
-    ui_elements: list[representation_utils.UIElement],
+    ui_elements: Sequence[representation_utils.UIElement],
     screen_width_height_px: tuple[int, int],
+    budget: Optional[prompt_budget.PromptBudget] = None,
 ) -> str:
   """Generate description for a list of UIElement using full information.
 
   Args:
     ui_elements: UI elements for the current screen.
     screen_width_height_px: Logical screen size.
+    budget: If set, elements are filtered and encoded to fit the budget.
 
   Returns:
     Information for each UIElement.
   """
+  if budget is not None:
+    return prompt_budget.describe_ui_elements(
+        ui_elements,
+        screen_width_height_px,
+        budget,
+        _generate_ui_element_description_full,
+        # Without a screenshot, the position of elements is only known from
+        # their description.
+        include_bbox=True,
+    )
   tree_info = ''
   for index, ui_element in enumerate(ui_elements):
     if m3a_utils.validate_ui_element(ui_element, screen_width_height_px):
-      tree_info += f'UI element {index}: {str(ui_element)}\n'
+      tree_info += _generate_ui_element_description_full(ui_element, index)
+      tree_info += '\n'
   return tree_info
 
 
+def _generate_ui_element_description_full(
+    ui_element: representation_utils.UIElement, index: int
+) -> str:
+  return f'UI element {index}: {str(ui_element)}'
+
+
 def _action_selection_prompt(
     goal: str,
     history: list[str],
     ui_elements_description: str,
     additional_guidelines: list[str] | None = None,
+    cache_friendly: bool = False,
 ) -> str:
   """Generate the prompt for the action selection.
 
@@ -216,6 +258,8 @@ def _action_selection_prompt(
     history: Summaries for previous steps.
     ui_elements_description: A list of descriptions for the UI elements.
     additional_guidelines: Task specific guidelines.
+    cache_friendly: Whether to use
+      CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.
 
   Returns:
     The text prompt for action selection that will be sent to gpt4v.
@@ -231,7 +275,12 @@ def _action_selection_prompt(
     for guideline in additional_guidelines:
       extra_guidelines += f'- {guideline}\n'
 
-  return ACTION_SELECTION_PROMPT_TEMPLATE.format(
+  template = (
+      CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE
+      if cache_friendly
+      else ACTION_SELECTION_PROMPT_TEMPLATE
+  )
+  return template.format(
       history=history,
       goal=goal,
       ui_elements_description=ui_elements_description
@@ -241,6 +290,54 @@ def _action_selection_prompt(
   )
 
 
+def _history(
+    summaries: Sequence[str],
+    budget: Optional[prompt_budget.PromptBudget] = None,
+) -> list[str]:
+  """Numbers the summaries of previous steps, keeping those within budget."""
+  return prompt_budget.window_history(
+      [
+          'Step ' + str(i + 1) + ': ' + summary
+          for i, summary in enumerate(summaries)
+      ],
+      budget,
+  )
+
+
+def build_action_selection_prompt(
+    goal: str,
+    summaries: Sequence[str],
+    ui_elements: Sequence[representation_utils.UIElement],
+    budget: Optional[prompt_budget.PromptBudget] = None,
+    screen_width_height_px: tuple[int, int] = (1080, 2400),
+    additional_guidelines: list[str] | None = None,
+    cache_friendly: bool = False,
+) -> str:
+  """Builds the action selection prompt from the state of an episode.
+
+  Args:
+    goal: The current task goal.
+    summaries: Summaries of the previous steps.
+    ui_elements: UI elements for the current screen.
+    budget: If set, the UI element list and history are limited to it.
+    screen_width_height_px: The logical screen size.
+    additional_guidelines: Task specific guidelines.
+    cache_friendly: Whether to put all static instructions first.
+
+  Returns:
+    The text prompt for action selection.
+  """
+  return _action_selection_prompt(
+      goal,
+      _history(summaries, budget),
+      _generate_ui_elements_description_list_full(
+          ui_elements, screen_width_height_px, budget
+      ),
+      additional_guidelines,
+      cache_friendly,
+  )
+
+
 def _summarize_prompt(
     goal: str,
     action: str,
@@ -269,6 +366,28 @@ def _summarize_prompt(
   )
 
 
+# Action types whose index is checked against the UI element list.
+_INDEX_ACTION_TYPES = (
+    json_action.CLICK,
+    json_action.LONG_PRESS,
+    json_action.INPUT_TEXT,
+    json_action.SCROLL,
+)
+
+
+def _is_valid_prediction(
+    prediction: tuple[str, Optional[bool], Any], num_ui_elements: int
+) -> bool:
+  """Whether an action selection prediction can be used without retrying."""
+  action_output, is_safe, raw_response = prediction
+  if is_safe == False:  # pylint: disable=singleton-comparison
+    # Handled as an infeasible task.
+    return True
+  return bool(raw_response) and m3a_utils.is_valid_action_output(
+      action_output, num_ui_elements, _INDEX_ACTION_TYPES
+  )
+
+
 class T3A(base_agent.EnvironmentInteractingAgent):
   """Text only autonomous agent for Android."""
 
@@ -277,6 +396,9 @@ class T3A(base_agent.EnvironmentInteractingAgent):
       env: interface.AsyncEnv,
       llm: infer.LlmWrapper,
       name: str = 'T3A',
+      num_action_candidates: int = 1,
+      budget: Optional[prompt_budget.PromptBudget] = None,
+      cache_friendly_prompts: bool = False,
   ):
     """Initializes a RandomAgent.
 
@@ -284,16 +406,27 @@ class T3A(base_agent.EnvironmentInteractingAgent):
       env: The environment.
       llm: The text only LLM.
       name: The agent name.
+      num_action_candidates: Number of concurrent action selection calls per
+        step. The first output that parses into an action on a valid UI
+        element is used, so a malformed output does not waste a step.
+      budget: If set, limits the UI element lists and the history in prompts,
+        see `prompt_budget.PromptBudget`.
+      cache_friendly_prompts: Whether action selection prompts put all static
+        instructions first, so providers can serve them from their prompt
+        cache. See CACHE_FRIENDLY_ACTION_SELECTION_PROMPT_TEMPLATE.
     """
     super().__init__(env, name)
     self.llm = llm
-    self.history = []
+    self.prompt_budget = budget
+    self.cache_friendly_prompts = cache_friendly_prompts
+    self.num_action_candidates = num_action_candidates
+    self.history = agent_utils.StepHistory()
     self.additional_guidelines = None
 
   def reset(self, go_home_on_reset: bool = False):
     super().reset(go_home_on_reset)
     self.env.hide_automation_ui()
-    self.history = []
+    self.history.clear()
 
   def set_task_guidelines(self, task_guidelines: list[str]) -> None:
     self.additional_guidelines = task_guidelines
@@ -320,6 +453,7 @@ class T3A(base_agent.EnvironmentInteractingAgent):
     before_element_list = _generate_ui_elements_description_list_full(
         ui_elements,
         logical_screen_size,
+        self.prompt_budget,
     )
     # Only save the screenshot for result visualization.
     step_data['before_screenshot'] = state.pixels.copy()
@@ -327,17 +461,26 @@ class T3A(base_agent.EnvironmentInteractingAgent):
 
     action_prompt = _action_selection_prompt(
         goal,
-        [
-            'Step ' + str(i + 1) + ': ' + step_info['summary']
-            for i, step_info in enumerate(self.history)
-        ],
+        _history(
+            [step_info['summary'] for step_info in self.history],
+            self.prompt_budget,
+        ),
         before_element_list,
         self.additional_guidelines,
+        self.cache_friendly_prompts,
     )
     step_data['action_prompt'] = action_prompt
-    action_output, is_safe, raw_response = self.llm.predict(
-        action_prompt,
+    start = time.perf_counter()
+    action_output, is_safe, raw_response = (
+        agent_utils.first_valid_prediction(
+            functools.partial(self.llm.predict, action_prompt),
+            functools.partial(
+                _is_valid_prediction, num_ui_elements=len(ui_elements)
+            ),
+            self.num_action_candidates,
+        )
     )
+    latency_sec = time.perf_counter() - start
 
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
@@ -348,7 +491,9 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
       raise RuntimeError('Error calling LLM in action selection phase.')
 
     step_data['action_output'] = action_output
-    step_data['action_raw_response'] = raw_response
+    step_data['action_raw_response'] = infer.to_response_record(
+        raw_response, latency_sec
+    )
 
     reason, action = m3a_utils.parse_reason_action_output(action_output)
 
@@ -388,10 +533,11 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
           step_data,
       )
 
-    if converted_action.action_type in ['click', 'long-press', 'input-text']:
-      if converted_action.index is not None and converted_action.index >= len(
-          ui_elements
-      ):
+    if (
+        converted_action.action_type in _INDEX_ACTION_TYPES
+        and converted_action.index is not None
+    ):
+      if not 0 <= converted_action.index < len(ui_elements):
         print('Index out of range.')
         step_data['summary'] = (
             'The parameter index is out of range. Remember the index must be in'
@@ -401,13 +547,17 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         return base_agent.AgentInteractionResult(False, step_data)
       else:
         # Add mark for the target ui element, just used for visualization.
+        device_state = adb_utils.get_device_state(
+            self.env.controller,
+            fields=('orientation', 'physical_frame_boundary'),
+        )
         m3a_utils.add_ui_element_mark(
             step_data['before_screenshot'],
             ui_elements[converted_action.index],
             converted_action.index,
             logical_screen_size,
-            adb_utils.get_physical_frame_boundary(self.env.controller),
-            adb_utils.get_orientation(self.env.controller),
+            device_state.physical_frame_boundary,
+            device_state.orientation,
         )
 
     if converted_action.action_type == 'status':
@@ -448,6 +598,7 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
     after_element_list = _generate_ui_elements_description_list_full(
         ui_elements,
         self.env.logical_screen_size,
+        self.prompt_budget,
     )
 
     # Save screenshot only for result visualization.
@@ -462,9 +613,11 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         after_element_list,
     )
 
+    start = time.perf_counter()
     summary, is_safe, raw_response = self.llm.predict(
         summary_prompt,
     )
+    latency_sec = time.perf_counter() - start
     if is_safe == False:  # pylint: disable=singleton-comparison
       #  is_safe could be None
       summary = """Summary triggered LLM safety classifier."""
@@ -476,7 +629,9 @@ Action: {{"action_type": "status", "goal_status": "infeasible"}}"""
         else 'Error calling LLM in summerization phase.'
     )
     print('Summary: ' + summary)
-    step_data['summary_raw_response'] = raw_response
+    step_data['summary_raw_response'] = infer.to_response_record(
+        raw_response, latency_sec
+    )
 
     self.history.append(step_data)
 
@@ -12,10 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
 from typing import Any
 from absl.testing import absltest
 from android_world.agents import infer
 from android_world.agents import t3a
+from android_world.env import representation_utils
 from android_world.utils import test_utils
 
 
@@ -40,6 +42,36 @@ class MockLlmWrapper(infer.LlmWrapper):
 
 class T3AInteractionTest(absltest.TestCase):
 
+  def test_speculative_action_selection_skips_malformed_output(self):
+    env = test_utils.FakeAsyncEnv()
+    responses = iter([
+        ("Output in incorrect format.", "fake_response_1"),
+        (
+            (
+                "Reason: completed.\nAction: {'action_type': 'status',"
+                " 'goal_status': 'complete'}"
+            ),
+            "fake_response_2",
+        ),
+    ])
+    lock = threading.Lock()
+
+    class SpeculativeLlm(infer.LlmWrapper):
+
+      def predict(self, text_prompt):
+        with lock:
+          output, raw_response = next(responses)
+        return output, None, raw_response
+
+    agent = t3a.T3A(env, SpeculativeLlm(), num_action_candidates=2)
+
+    step_data = agent.step("do something")
+
+    self.assertTrue(step_data.done)
+    self.assertEqual(
+        step_data.data["action_raw_response"].text, "fake_response_2"
+    )
+
   def test_step_method_with_completion(self):
     env = test_utils.FakeAsyncEnv()
     mock_llm = MockLlmWrapper([(
@@ -56,6 +88,31 @@ class T3AInteractionTest(absltest.TestCase):
 
     self.assertTrue(step_data.done)
 
+  def test_out_of_range_input_text_index_is_rejected(self):
+    env = test_utils.FakeAsyncEnv()
+    mock_llm = MockLlmWrapper([(
+        (
+            "Reason: type.\nAction: {'action_type': 'input_text',"
+            " 'text': 'hello', 'index': 3}"
+        ),
+        "fake_response",
+    )])
+    agent = t3a.T3A(env, mock_llm)
+
+    step_data = agent.step("do something")
+
+    self.assertFalse(step_data.done)
+    self.assertIn("index is out of range", step_data.data["summary"])
+
+  def test_is_valid_prediction_checks_index_action_types(self):
+    for action in ("input_text", "long_press", "scroll"):
+      output = (
+          f"Reason: r.\nAction: {{'action_type': '{action}', 'index': 3}}"
+      )
+      with self.subTest(action):
+        self.assertFalse(t3a._is_valid_prediction((output, None, "raw"), 3))
+        self.assertTrue(t3a._is_valid_prediction((output, None, "raw"), 4))
+
   def test_history_recording(self):
     env = test_utils.FakeAsyncEnv()
     mock_llm = MockLlmWrapper([
@@ -89,5 +146,31 @@ class T3AInteractionTest(absltest.TestCase):
     self.assertLen(agent.history, 2)
 
 
+class ActionSelectionPromptTest(absltest.TestCase):
+
+  def test_cache_friendly_prompt_has_static_prefix(self):
+    ui_elements = [
+        representation_utils.UIElement(
+            text="OK",
+            bbox_pixels=representation_utils.BoundingBox(0, 10, 0, 10),
+            is_visible=True,
+        )
+    ]
+    args = ("goal", ["summary"], ui_elements)
+
+    prompt = t3a.build_action_selection_prompt(*args)
+    cache_friendly_prompt = t3a.build_action_selection_prompt(
+        *args, cache_friendly=True
+    )
+
+    # The templates escape braces.
+    static_prefix = (t3a.PROMPT_PREFIX + t3a.GUIDANCE).format()
+    self.assertTrue(cache_friendly_prompt.startswith(static_prefix))
+    self.assertFalse(prompt.startswith(static_prefix))
+    self.assertCountEqual(
+        cache_friendly_prompt.split("\n"), prompt.split("\n")
+    )
+
+
 if __name__ == "__main__":
   absltest.main()
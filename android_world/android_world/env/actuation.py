@@ -17,12 +17,14 @@
 import copy
 import logging
 import time
-from typing import Any
+from typing import Any, Optional
 from android_env import env_interface
 from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import fuzzy_match_lib
+from android_world.utils import wait_utils
 
 
 def execute_adb_action(
@@ -239,76 +241,117 @@ def find_and_click_element(
       element to tap.
   """
   # Find text.
-  action = _wait_and_find_click_element(element_text, env, case_sensitive)
+  index, ui_elements = wait_for_element(element_text, env, case_sensitive)
 
-  ui_elements = env.get_ui_elements()
+  action = json_action.JSONAction(action_type='click', index=index)
   screen_size = (0, 0)  # Unused, but required.
   execute_adb_action(action, ui_elements, screen_size, env)
 
 
-def _wait_and_find_click_element(
+def wait_for_element(
     target_text: str,
     env: android_world_controller.AndroidWorldController,
-    case_sensitive: bool,
+    case_sensitive: bool = False,
     dist_threshold: int = 1,  # Allow one character difference.
-) -> json_action.JSONAction:
-  """Wait for the screen to update until "element_text" appears."""
-  ui_elements = env.get_ui_elements()
-  element, distance = _find_target_element(
-      ui_elements, target_text, case_sensitive
-  )
-  start = time.time()
-  current = time.time()
-  while current - start < 10:
-    if distance <= dist_threshold:
-      return json_action.JSONAction(action_type='click', index=element)
+    timeout_sec: float = 10.0,
+) -> tuple[int, list[representation_utils.UIElement]]:
+  """Waits for the screen to update until "target_text" appears.
+
+  UI elements are polled with exponential backoff, so waiting for a slow screen
+  does not continuously fetch the accessibility tree.
+
+  Args:
+    target_text: Text or content description of the UI element to wait for.
+    env: The Android env instance.
+    case_sensitive: Whether to use case sensitivity when matching the text.
+    dist_threshold: Maximum edit distance between the target text and the text
+      of a matching element.
+    timeout_sec: Maximum time to wait, in seconds.
+
+  Returns:
+    The index of the matching element, and the UI elements it indexes into.
+
+  Raises:
+    ValueError: If no element matches before the timeout.
+  """
+
+  def poll() -> tuple[list[representation_utils.UIElement], tuple[int, int]]:
     ui_elements = env.get_ui_elements()
-    element, distance = _find_target_element(
-        ui_elements, target_text, case_sensitive
+    match = _find_target_element(
+        ui_elements, target_text, case_sensitive, max_distance=dist_threshold
     )
-    current = time.time()
-  raise ValueError(f'Target text "{target_text}" not found.')
+    return ui_elements, match
 
+  result = wait_utils.wait_until(
+      poll, lambda r: r[1][1] <= dist_threshold, timeout_sec=timeout_sec
+  )
+  if not result.satisfied:
+    raise ValueError(f'Target text "{target_text}" not found.')
+  ui_elements, (index, _) = result.value
+  return index, ui_elements
 
-def _find_target_element(
+
+def _index_element_texts(
     ui_elements: list[representation_utils.UIElement],
-    target_text: str,
     case_sensitive: bool,
-) -> tuple[int, int]:
-  """Determine the UI element with the closest match to target_text, by looking at the `text` and `content_description` of each UI element."""
-  best_match_index = -1
-  lowest_distance = int(1e9)
+) -> list[tuple[int, str]]:
+  """Returns (element index, text) pairs to match against for an observation.
+
+  Args:
+    ui_elements: The UI elements of the observation.
+    case_sensitive: If False, texts are lowercased once here instead of for
+      every comparison.
 
+  Returns:
+    A pair for the `text` and for the `content_description` of each element
+    that has them.
+  """
+  index = []
   for i, element in enumerate(ui_elements):
     for attr in [element.text, element.content_description]:
       if attr is not None:
-        if case_sensitive:
-          distance = _levenshtein_distance(target_text, attr)
-        else:
-          distance = _levenshtein_distance(target_text.lower(), attr.lower())
-        if distance < lowest_distance:
-          lowest_distance = distance
-          best_match_index = i
+        index.append((i, attr if case_sensitive else attr.lower()))
+  return index
 
-  return (best_match_index, lowest_distance)
 
+def _find_target_element(
+    ui_elements: list[representation_utils.UIElement],
+    target_text: str,
+    case_sensitive: bool,
+    max_distance: Optional[int] = None,
+) -> tuple[int, int]:
+  """Determines the UI element whose text best matches target_text.
 
-def _levenshtein_distance(s1: str, s2: str) -> int:
-  """Compute the Levenshtein distance between two strings."""
-  if len(s1) < len(s2):
-    s1, s2 = s2, s1
+  The `text` and `content_description` of each UI element are compared.
 
-  if not s2:
-    return len(s1)
+  Args:
+    ui_elements: The UI elements to search.
+    target_text: The text to match.
+    case_sensitive: Whether to use case sensitivity when matching.
+    max_distance: If set, only matches within this edit distance are
+      considered, which allows distance computations to stop early.
+
+  Returns:
+    The index of the closest element and its edit distance to target_text, or
+    (-1, int(1e9)) if there is no (close enough) match.
+  """
+  if not case_sensitive:
+    target_text = target_text.lower()
+  best_match_index = -1
+  lowest_distance = int(1e9)
 
-  previous_row = range(len(s2) + 1)
-  for i, c1 in enumerate(s1):
-    current_row = [i + 1]
-    for j, c2 in enumerate(s2):
-      insertions = previous_row[j + 1] + 1
-      deletions = current_row[j] + 1
-      substitutions = previous_row[j] + (c1 != c2)
-      current_row.append(min(insertions, deletions, substitutions))
-    previous_row = current_row
+  element_texts = _index_element_texts(ui_elements, case_sensitive)
+  for i, text in element_texts:
+    if text == target_text:
+      return (i, 0)
+  distances = fuzzy_match_lib.edit_distances(
+      target_text, [text for _, text in element_texts], max_distance
+  )
+  for (i, _), distance in zip(element_texts, distances):
+    if max_distance is not None and distance > max_distance:
+      continue
+    if distance < lowest_distance:
+      lowest_distance = distance
+      best_match_index = i
 
-  return previous_row[-1]
+  return (best_match_index, lowest_distance)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import copy
+import itertools
 import time
 from unittest import mock
 
@@ -23,13 +24,14 @@ from android_world.env import adb_utils
 from android_world.env import android_world_controller
 from android_world.env import json_action
 from android_world.env import representation_utils
+from android_world.utils import fuzzy_match_lib
 
 
 @mock.patch.object(time, 'sleep')
 @mock.patch.object(actuation, '_find_target_element')
 @mock.patch.object(android_world_controller, 'get_a11y_tree')
 @mock.patch.object(representation_utils, 'forest_to_ui_elements')
-class TestWaitAndFindClickElement(absltest.TestCase):
+class TestWaitForElement(absltest.TestCase):
 
   def test_element_found_immediately(
       self,
@@ -41,12 +43,10 @@ class TestWaitAndFindClickElement(absltest.TestCase):
     """Test when the element is found immediately."""
     mock_create.return_value = (0, 0)
     mock_sleep.side_effect = [0, 1]
-    action = actuation._wait_and_find_click_element(
+    index, _ = actuation.wait_for_element(
         'target', mock.MagicMock(), case_sensitive=True
     )
-    self.assertEqual(
-        action, json_action.JSONAction(action_type='click', index=0)
-    )
+    self.assertEqual(index, 0)
 
   def test_element_not_found_within_timeout(
       self,
@@ -57,14 +57,55 @@ class TestWaitAndFindClickElement(absltest.TestCase):
   ):
     """Test when the element is not found within the timeout period."""
     mock_create.return_value = (-1, float('inf'))
-    mock_sleep.side_effect = (
-        0,
-        11,
-    )  # Simulating 11 seconds have passed
-    with self.assertRaises(ValueError):
-      actuation._wait_and_find_click_element(
-          'target', mock.MagicMock(), case_sensitive=True
-      )
+    # Simulate one second passing between each poll.
+    with mock.patch.object(
+        time, 'monotonic', side_effect=itertools.count(step=1.0)
+    ):
+      with self.assertRaises(ValueError):
+        actuation.wait_for_element(
+            'target', mock.MagicMock(), case_sensitive=True
+        )
+    self.assertTrue(mock_sleep.called)
+    for call in mock_sleep.call_args_list:
+      self.assertLessEqual(call.args[0], 1.0)
+
+  def test_element_found_after_backoff(
+      self,
+      unused_mock_representation_utils,
+      unused_mock_get_a11y_tree,
+      mock_create,
+      mock_sleep,
+  ):
+    """Test that the screen is polled with growing intervals."""
+    mock_create.side_effect = [(-1, 5), (-1, 5), (-1, 5), (3, 1)]
+    env = mock.MagicMock()
+    index, ui_elements = actuation.wait_for_element(
+        'target', env, case_sensitive=True
+    )
+    self.assertEqual(index, 3)
+    self.assertIs(ui_elements, env.get_ui_elements.return_value)
+    self.assertEqual(env.get_ui_elements.call_count, 4)
+    self.assertEqual(
+        [call.args[0] for call in mock_sleep.call_args_list], [0.1, 0.2, 0.4]
+    )
+
+
+class TestFindAndClickElement(absltest.TestCase):
+
+  def test_clicks_matching_element_without_refetching(self):
+    env = mock.MagicMock()
+    env.get_ui_elements.return_value = [
+        representation_utils.UIElement(text='Cancel'),
+        representation_utils.UIElement(
+            text='SAVE',
+            bbox_pixels=representation_utils.BoundingBox(0, 20, 0, 40),
+        ),
+    ]
+    with mock.patch.object(adb_utils, 'tap_screen') as mock_tap_screen:
+      actuation.find_and_click_element('save', env)
+
+    env.get_ui_elements.assert_called_once()
+    mock_tap_screen.assert_called_once_with(10, 20, env)
 
 
 class TestCreateReferredClickAction(absltest.TestCase):
@@ -102,6 +143,22 @@ class TestCreateReferredClickAction(absltest.TestCase):
         (2, 0),
     )
 
+  def test_exact_match_skips_edit_distances(self):
+    ui_elements = [
+        representation_utils.UIElement(text='targ', content_description=''),
+        representation_utils.UIElement(text='Target', content_description=''),
+    ]
+    with mock.patch.object(
+        fuzzy_match_lib, 'edit_distances', autospec=True
+    ) as mock_edit_distances:
+      self.assertEqual(
+          actuation._find_target_element(
+              ui_elements, 'target', case_sensitive=False
+          ),
+          (1, 0),
+      )
+    mock_edit_distances.assert_not_called()
+
   def test_no_exact_match(self):
     """Test with no exact matching elements."""
     ui_elements = [
@@ -112,6 +169,24 @@ class TestCreateReferredClickAction(absltest.TestCase):
     )
     self.assertGreater(distance, 0)
 
+  def test_max_distance_ignores_distant_elements(self):
+    ui_elements = [
+        representation_utils.UIElement(text='no match', content_description=''),
+        representation_utils.UIElement(text='Targe', content_description=''),
+    ]
+    self.assertEqual(
+        actuation._find_target_element(
+            ui_elements, 'target', case_sensitive=False, max_distance=1
+        ),
+        (1, 1),
+    )
+    self.assertEqual(
+        actuation._find_target_element(
+            ui_elements, 'target', case_sensitive=True, max_distance=1
+        ),
+        (-1, int(1e9)),
+    )
+
 
 class ExecuteAdbActionTest(absltest.TestCase):
 
@@ -14,21 +14,34 @@
 
 """Utilties to interact with the environment using adb."""
 
+import dataclasses
 import os
 import re
 import time
-from typing import Any, Callable, Collection, Iterable, Literal, Optional, TypeVar
+from typing import Any, Callable, Collection, Iterable, Literal, Mapping, Optional, TypeVar
 import unicodedata
 from absl import logging
 from android_env import env_interface
 from android_env.components import errors
 from android_env.proto import adb_pb2
+from android_world.utils import wait_utils
 import immutabledict
 
 T = TypeVar('T')
 
 _DEFAULT_TIMEOUT_SECS = 10
 
+# Text longer than this is typed in chunks of words instead of word-by-word.
+_BULK_TYPING_MIN_LENGTH = 50
+# Maximum length of a chunk of adb-formatted text typed in a single adb call.
+_BULK_TYPING_CHUNK_LENGTH = 100
+# Statuses of input_text requests rejected before `input text` ran on the
+# device. Only chunks failing with these are safe to type again.
+_NOT_EXECUTED_STATUSES = frozenset({
+    adb_pb2.AdbResponse.Status.UNKNOWN_COMMAND,
+    adb_pb2.AdbResponse.Status.FAILED_PRECONDITION,
+})
+
 # pylint: disable=line-too-long
 # Maps app names to the activity that should be launched to open the app.
 _PATTERN_TO_ACTIVITY = immutabledict.immutabledict({
@@ -462,41 +475,110 @@ def _split_words_and_newlines(text: str) -> Iterable[str]:
       yield '\n'
 
 
+def _chunk_words_and_newlines(
+    words: Iterable[str], max_chunk_length: int
+) -> Iterable[list[str]]:
+  """Groups words and spaces into chunks of bounded length.
+
+  Words are never split across chunks and newlines are always yielded on their
+  own, so the chunks preserve the order of `_split_words_and_newlines`.
+
+  Args:
+    words: Output of `_split_words_and_newlines`.
+    max_chunk_length: Maximum length of a chunk after formatting for adb. A
+      single word longer than this is yielded as its own chunk.
+
+  Yields:
+    Lists of consecutive words, or ['\n'].
+  """
+  chunk = []
+  chunk_length = 0
+  for word in words:
+    if word == '\n':
+      if chunk:
+        yield chunk
+        chunk, chunk_length = [], 0
+      yield [word]
+      continue
+    formatted_length = len(_adb_text_format(word))
+    if chunk and chunk_length + formatted_length > max_chunk_length:
+      yield chunk
+      chunk, chunk_length = [], 0
+    chunk.append(word)
+    chunk_length += formatted_length
+  if chunk:
+    yield chunk
+
+
+def _input_text(
+    formatted: str,
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float],
+) -> adb_pb2.AdbResponse.Status:
+  """Types adb-formatted text and returns the response status."""
+  logging.info('Attempting to type: %r', formatted)
+  response = env.execute_adb_call(
+      adb_pb2.AdbRequest(
+          input_text=adb_pb2.AdbRequest.InputText(text=formatted),
+          timeout_sec=timeout_sec,
+      )
+  )
+  return response.status
+
+
 def type_text(
     text: str,
     env: env_interface.AndroidEnvInterface,
     timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+    bulk: Optional[bool] = None,
 ) -> None:
-  """Issues an AdbRequest to type the specified text string word-by-word.
+  """Issues AdbRequests to type the specified text string.
+
+  By default, short text is typed word-by-word to fix issue where sometimes long
+  text strings can be typed out of order at the character level. Additionally,
+  long strings can time out and word-by-word fixes this, while allowing us to
+  keep a lot timeout per word.
 
-  It types word-by-word to fix issue where sometimes long text strings can be
-  typed out of order at the character level. Additionally, long strings can time
-  out and word-by-word fixes this, while allowing us to keep a lot timeout per
-  word.
+  Typing word-by-word costs one adb call per word and per space, so text longer
+  than `_BULK_TYPING_MIN_LENGTH` is instead typed in chunks of whole words of at
+  most `_BULK_TYPING_CHUNK_LENGTH` characters. A chunk that was rejected before
+  it could be typed is retried word-by-word; other failures, such as timeouts,
+  are only logged since part of the chunk may already be on screen. Newlines are still typed by pressing the enter button
+  between chunks.
 
   Args:
     text: The text string to be typed.
     env: The environment.
     timeout_sec: A timeout to use for this operation. Note: For longer texts,
       this should be longer as it takes longer to type.
+    bulk: Whether to type the text in chunks. If None, chunks are used based
+      on the length of the text.
   """
+  if bulk is None:
+    bulk = len(text) > _BULK_TYPING_MIN_LENGTH
   words = _split_words_and_newlines(text)
-  for word in words:
-    if word == '\n':
+  if bulk:
+    chunks = _chunk_words_and_newlines(words, _BULK_TYPING_CHUNK_LENGTH)
+  else:
+    chunks = ([w] for w in words)
+  for chunk in chunks:
+    if chunk == ['\n']:
       logging.info('Found \\n, pressing enter button.')
       press_enter_button(env)
       continue
-    formatted = _adb_text_format(word)
-    logging.info('Attempting to type word: %r', formatted)
-    response = env.execute_adb_call(
-        adb_pb2.AdbRequest(
-            input_text=adb_pb2.AdbRequest.InputText(text=formatted),
-            timeout_sec=timeout_sec,
-        )
-    )
-
-    if response.status != adb_pb2.AdbResponse.Status.OK:
-      logging.error('Failed to type word: %r', formatted)
+    formatted = ''.join(_adb_text_format(w) for w in chunk)
+    status = _input_text(formatted, env, timeout_sec)
+    if status == adb_pb2.AdbResponse.Status.OK:
+      continue
+    if len(chunk) == 1 or status not in _NOT_EXECUTED_STATUSES:
+      logging.error('Failed to type: %r', formatted)
+      continue
+    logging.warning('Failed to type %r, retrying word by word.', formatted)
+    for word in chunk:
+      formatted_word = _adb_text_format(word)
+      status = _input_text(formatted_word, env, timeout_sec)
+      if status != adb_pb2.AdbResponse.Status.OK:
+        logging.error('Failed to type: %r', formatted_word)
 
 
 def issue_generic_request(
@@ -540,6 +622,78 @@ def issue_generic_request(
   return response
 
 
+# Marker echoed before the output of each command in a batched shell request.
+_SHELL_BATCH_DELIMITER = '__ANDROID_WORLD_SHELL_BATCH__'
+
+
+def _split_batched_shell_output(
+    raw_output: str, keys: Collection[str]
+) -> dict[str, str]:
+  """Splits the output of a batched shell request into per-command outputs."""
+  outputs = {key: '' for key in keys}
+  current_key = None
+  lines = []
+  for line in raw_output.replace('\r', '').split('\n'):
+    if line.startswith(_SHELL_BATCH_DELIMITER):
+      if current_key is not None:
+        outputs[current_key] = '\n'.join(lines).rstrip('\n')
+      current_key = line[len(_SHELL_BATCH_DELIMITER) :].strip()
+      lines = []
+    elif current_key is not None:
+      lines.append(line)
+  if current_key is not None:
+    outputs[current_key] = '\n'.join(lines).rstrip('\n')
+  return outputs
+
+
+def issue_batched_shell_request(
+    commands: Mapping[str, str],
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+) -> dict[str, str]:
+  """Runs several shell commands on the device in a single adb round-trip.
+
+  Each command is preceded by an echoed delimiter line so that the combined
+  output can be split back into the output of each individual command. Commands
+  are separated with `;`, so a failing command does not prevent the following
+  ones from running.
+
+  Example:
+  ~~~~~~~
+
+  issue_batched_shell_request(
+      {'user': 'whoami', 'sdk': 'getprop ro.build.version.sdk'}, env
+  )
+  # {'user': 'root', 'sdk': '34'}
+
+  Args:
+    commands: Mapping from a key to the shell command to run. Keys must be
+      non-empty and must not contain whitespace.
+    env: The environment.
+    timeout_sec: A timeout to use for this operation.
+
+  Returns:
+    Mapping from each key to the output of its command. If the request failed,
+    all outputs are empty.
+
+  Raises:
+    ValueError: If a key is empty or contains whitespace.
+  """
+  for key in commands:
+    if not key or re.search(r'\s', key):
+      raise ValueError(f'Invalid batched shell command key: {key!r}')
+  script = ' '.join(
+      f'echo {_SHELL_BATCH_DELIMITER}{key}; {command};'
+      for key, command in commands.items()
+  )
+  response = issue_generic_request(['shell', script], env, timeout_sec)
+  if response.status != adb_pb2.AdbResponse.Status.OK:
+    return {key: '' for key in commands}
+  return _split_batched_shell_output(
+      response.generic.output.decode('utf-8'), commands.keys()
+  )
+
+
 def get_adb_activity(app_name: str) -> Optional[str]:
   """Get a mapping of regex patterns to ADB activities top Android apps."""
   for pattern, activity in _PATTERN_TO_ACTIVITY.items():
@@ -1038,7 +1192,12 @@ def check_airplane_mode(env: env_interface.AndroidEnvInterface) -> bool:
         f' {response.generic.output.decode()}.'
     )
 
-  return response.generic.output.decode().replace('\r', '').strip('\n') == '1'
+  return _parse_airplane_mode(response.generic.output.decode())
+
+
+def _parse_airplane_mode(raw_output: str) -> bool:
+  """Parses the output of `settings get global airplane_mode_on`."""
+  return raw_output.replace('\r', '').strip('\n') == '1'
 
 
 def extract_broadcast_data(raw_output: str) -> Optional[str]:
@@ -1082,29 +1241,66 @@ def _extract_clipper_output(raw_output: str) -> str:
     )
 
 
-def get_clipboard_contents(env: env_interface.AndroidEnvInterface) -> str:
-  """Gets the clipboard content from the Android device.
+# Upper bound on waiting for the clipper app to handle broadcasts after launch.
+_CLIPPER_TIMEOUT_SECS = 5.0
+# Fixed sleep previously used after launching the clipper app.
+_CLIPPER_LAUNCH_SLEEP_SECS = 0.5
+
+
+def _broadcast_to_clipper(
+    action_args: list[str], env: env_interface.AndroidEnvInterface
+) -> adb_pb2.AdbResponse:
+  """Launches the clipper app and broadcasts to it once it is ready.
+
+  The clipper app only handles broadcasts while it is in the foreground, which
+  it answers with result=-1. The broadcast is retried with backoff until then,
+  so there is no fixed wait for the app to start.
 
   Args:
+    action_args: The action followed by its extras, e.g. ['clipper.get'].
     env: The environment.
 
   Returns:
-    The clipboard content as a string.
+    The response to the last broadcast.
 
   Raises:
-    RuntimeError: If the adb command does not successfully execute or if the
-      app is not in the foreground.
+    RuntimeError: If the clipper app could not be launched.
   """
   if launch_app('clipper', env) is None:
     raise RuntimeError(
         'Clipper app must be in the foreground to access clipboard. You may'
         ' need to install clipper app.'
     )
-
-  time.sleep(0.5)
-  res = issue_generic_request(
-      ['shell', 'am', 'broadcast', '-a', 'clipper.get'], env
+  result = wait_utils.wait_until(
+      lambda: issue_generic_request(
+          ['shell', 'am', 'broadcast', '-a'] + action_args, env
+      ),
+      lambda response: (
+          response.status != adb_pb2.AdbResponse.Status.OK
+          or 'result=-1' in response.generic.output.decode('utf-8')
+      ),
+      timeout_sec=_CLIPPER_TIMEOUT_SECS,
+  )
+  wait_utils.report_wait(
+      result, 'clipper to handle broadcasts', _CLIPPER_LAUNCH_SLEEP_SECS
   )
+  return result.value
+
+
+def get_clipboard_contents(env: env_interface.AndroidEnvInterface) -> str:
+  """Gets the clipboard content from the Android device.
+
+  Args:
+    env: The environment.
+
+  Returns:
+    The clipboard content as a string.
+
+  Raises:
+    RuntimeError: If the adb command does not successfully execute or if the
+      app is not in the foreground.
+  """
+  res = _broadcast_to_clipper(['clipper.get'], env)
 
   if res.status != adb_pb2.AdbResponse.Status.OK:
     raise RuntimeError('Failed to get clipboard content.')
@@ -1164,17 +1360,9 @@ def set_clipboard_contents(
     RuntimeError: If the adb command does not successfully execute or if the
     app is not in the foreground.
   """
-  if launch_app('clipper', env) is None:
-    raise RuntimeError(
-        'Clipper app must be in the foreground to access clipboard. You may'
-        ' need to install clipper app.'
-    )
-
-  time.sleep(0.5)
   content = _adb_text_format(content)
-  output_str = issue_generic_request(
-      ['shell', 'am', 'broadcast', '-a', 'clipper.set', '-e', 'text', content],
-      env,
+  output_str = _broadcast_to_clipper(
+      ['clipper.set', '-e', 'text', content], env
   ).generic.output.decode('utf-8')
   _extract_clipper_output(output_str)
   press_back_button(env)
@@ -1242,8 +1430,12 @@ def get_call_state(
   adb_args = ['shell', 'dumpsys', 'telephony.registry']
   response = issue_generic_request(adb_args, env, timeout_sec)
 
-  output = response.generic.output.decode('utf-8')
-  state_match = re.search(r'mCallState=(\d)', output)
+  return _parse_call_state(response.generic.output.decode('utf-8'))
+
+
+def _parse_call_state(raw_output: str) -> str:
+  """Parses the call state from `dumpsys telephony.registry` output."""
+  state_match = re.search(r'mCallState=(\d)', raw_output)
 
   state = 'UNKNOWN'
 
@@ -1280,11 +1472,37 @@ def call_emulator(
   return response
 
 
+# Upper bound on waiting for the call state to change after a call command.
+_CALL_STATE_TIMEOUT_SECS = 5.0
+
+
+def wait_for_call_state(
+    env: env_interface.AndroidEnvInterface,
+    states: Collection[str],
+    timeout_sec: float = _CALL_STATE_TIMEOUT_SECS,
+) -> wait_utils.WaitResult[str]:
+  """Polls the call state with backoff until it is one of `states`.
+
+  Args:
+    env: The Android environment interface.
+    states: The call states to wait for, e.g. ('RINGING',).
+    timeout_sec: Maximum time to wait, in seconds.
+
+  Returns:
+    The last call state and whether it is one of `states`.
+  """
+  return wait_utils.wait_until(
+      lambda: get_call_state(env),
+      lambda state: state in states,
+      timeout_sec=timeout_sec,
+  )
+
+
 def end_call_if_active(
     env: 'env_interface.AndroidEnvInterface',
     timeout_sec: float = _DEFAULT_TIMEOUT_SECS,
 ) -> None:
-  """Ends phone call if on an active call."""
+  """Ends phone call if on an active call and waits for the line to be idle."""
   current_state = get_call_state(env, timeout_sec)
 
   # This check is crucial. Otherwise pressing endcall key results in black
@@ -1292,6 +1510,9 @@ def end_call_if_active(
   if current_state in ('OFFHOOK', 'RINGING'):
     adb_args = ['shell', 'input', 'keyevent', 'KEYCODE_ENDCALL']
     issue_generic_request(adb_args, env, timeout_sec)
+    result = wait_for_call_state(env, ('IDLE',))
+    if not result.satisfied:
+      logging.warning('Call still %s after ending it.', result.value)
 
 
 def clear_android_emulator_call_log(
@@ -1526,6 +1747,63 @@ def get_screen_size(env: env_interface.AndroidEnvInterface) -> tuple[int, int]:
   )
 
 
+def _parse_logical_screen_size(
+    raw_output: str,
+) -> Optional[tuple[int, int]]:
+  """Parses the first non-empty logicalFrame in `dumpsys input` output."""
+  pattern = r'logicalFrame=\[0, 0, (\d+), (\d+)\]'
+  matches = re.findall(pattern, raw_output)
+  for m in matches:
+    if int(m[0]) == 0 and int(m[1]) == 0:
+      continue
+    return (int(m[0]), int(m[1]))
+  return None
+
+
+def _parse_physical_frame(
+    raw_output: str,
+) -> Optional[tuple[int, int, int, int]]:
+  """Parses the first non-empty physicalFrame in `dumpsys input` output.
+
+  Args:
+    raw_output: The output of `dumpsys input`.
+
+  Returns:
+    The frame as reported by the device, i.e. in the current orientation, or
+    None if no frame could be found.
+  """
+  pattern = r'physicalFrame=\[(\d+), (\d+), (\d+), (\d+)\]'
+  matches = re.findall(pattern, raw_output)
+  for m in matches:
+    if (
+        int(m[0]) == 0
+        and int(m[1]) == 0
+        and int(m[2]) == 0
+        and int(m[3]) == 0
+    ):
+      continue
+    return (int(m[0]), int(m[1]), int(m[2]), int(m[3]))
+  return None
+
+
+def _physical_frame_to_portrait(
+    frame: tuple[int, int, int, int], orientation: int
+) -> tuple[int, int, int, int]:
+  """Converts a physical frame to portrait orientation coordinates."""
+  if orientation == 0 or orientation == 2:
+    return frame
+  return (frame[1], frame[0], frame[3], frame[2])
+
+
+def _parse_orientation(raw_output: str) -> Optional[int]:
+  """Parses the orientation from `dumpsys window` output."""
+  pattern = r'mCurrentRotation=ROTATION_(\d+)'
+  matches = re.findall(pattern, raw_output)
+  for m in matches:
+    return int(m) // 90
+  return None
+
+
 def get_logical_screen_size(
     env: env_interface.AndroidEnvInterface,
 ) -> tuple[int, int]:
@@ -1547,13 +1825,9 @@ def get_logical_screen_size(
   )
   if response.status:
     raw_output = response.generic.output.decode('utf-8')
-    pattern = r'logicalFrame=\[0, 0, (\d+), (\d+)\]'
-    matches = re.findall(pattern, raw_output)
-    for m in matches:
-      if int(m[0]) == 0 and int(m[1]) == 0:
-        continue
-      width, height = (int(m[0]), int(m[1]))
-      return (width, height)
+    screen_size = _parse_logical_screen_size(raw_output)
+    if screen_size is not None:
+      return screen_size
   raise ValueError('Failed to get logical screen size.')
 
 
@@ -1562,6 +1836,9 @@ def get_physical_frame_boundary(
 ) -> tuple[int, int, int, int]:
   """Returns the physical frame boundary.
 
+  The frame and the orientation needed to convert it are queried in a single
+  adb call.
+
   Args:
     env: The AndroidEnv interface.
 
@@ -1569,26 +1846,20 @@ def get_physical_frame_boundary(
     First two integers are the coordinates for top left corner, last two are for
     lower right corner. All coordinates are given in portrait orientation.
   """
-  response = issue_generic_request(
-      'shell dumpsys input | grep physicalFrame', env
+  outputs = issue_batched_shell_request(
+      {
+          'input': _SHELL_PROBES['input'],
+          'window': _SHELL_PROBES['window'],
+      },
+      env,
   )
-  if response.status:
-    raw_output = response.generic.output.decode('utf-8')
-    pattern = r'physicalFrame=\[(\d+), (\d+), (\d+), (\d+)\]'
-    matches = re.findall(pattern, raw_output)
-    for m in matches:
-      if (
-          int(m[0]) == 0
-          and int(m[1]) == 0
-          and int(m[2]) == 0
-          and int(m[3]) == 0
-      ):
-        continue
-      orientation = get_orientation(env)
-      if orientation == 0 or orientation == 2:
-        return (int(m[0]), int(m[1]), int(m[2]), int(m[3]))
-      return (int(m[1]), int(m[0]), int(m[3]), int(m[2]))
-  raise ValueError('Failed to get physical frame boundary.')
+  frame = _parse_physical_frame(outputs['input'])
+  if frame is None:
+    raise ValueError('Failed to get physical frame boundary.')
+  orientation = _parse_orientation(outputs['window'])
+  if orientation is None:
+    raise ValueError('Failed to get orientation.')
+  return _physical_frame_to_portrait(frame, orientation)
 
 
 def get_orientation(
@@ -1609,14 +1880,139 @@ def get_orientation(
       'shell dumpsys window | grep mCurrentRotation', env
   )
   if response.status:
-    raw_output = response.generic.output.decode('utf-8')
-    pattern = r'mCurrentRotation=ROTATION_(\d+)'
-    matches = re.findall(pattern, raw_output)
-    for m in matches:
-      return int(m) // 90
+    orientation = _parse_orientation(response.generic.output.decode('utf-8'))
+    if orientation is not None:
+      return orientation
   raise ValueError('Failed to get orientation.')
 
 
+def _parse_visible_activity(raw_output: str) -> Optional[str]:
+  """Parses the visible activity from `am stack list | grep visible=true`."""
+  match = re.search(r'.*\{(.*)\}', raw_output)
+  if match is None:
+    return None
+  return match.group(1)
+
+
+# Shell commands used to probe device state, keyed by probe name. Several
+# device state fields can be parsed from the same probe output.
+_SHELL_PROBES = immutabledict.immutabledict({
+    'window': 'dumpsys window | grep mCurrentRotation',
+    'input': 'dumpsys input | grep -e logicalFrame -e physicalFrame',
+    'airplane_mode': 'settings get global airplane_mode_on',
+    'activity': 'am stack list | grep visible=true',
+    'telephony': 'dumpsys telephony.registry | grep mCallState',
+    'whoami': 'whoami',
+})
+
+# Maps each DeviceState field to the probes needed to compute it.
+_DEVICE_STATE_FIELD_PROBES = immutabledict.immutabledict({
+    'orientation': ('window',),
+    'logical_screen_size': ('input',),
+    'physical_frame_boundary': ('input', 'window'),
+    'airplane_mode': ('airplane_mode',),
+    'current_activity': ('activity',),
+    'call_state': ('telephony',),
+    'is_root': ('whoami',),
+})
+
+
+@dataclasses.dataclass(frozen=True)
+class DeviceState:
+  """A snapshot of commonly queried device state.
+
+  Fields that were not requested, or that could not be parsed from the device
+  output, are None.
+
+  Attributes:
+    orientation: 0 for portrait, 1 for landscape, 2 for reverse portrait, 3 for
+      reverse landscape.
+    logical_screen_size: The logical screen size in (width, height).
+    physical_frame_boundary: The physical frame boundary in portrait
+      orientation; see `get_physical_frame_boundary`.
+    airplane_mode: Whether airplane mode is enabled.
+    current_activity: The full name of the visible activity.
+    call_state: One of IDLE, RINGING, OFFHOOK or UNKNOWN.
+    is_root: Whether adb is running as root.
+  """
+
+  orientation: Optional[int] = None
+  logical_screen_size: Optional[tuple[int, int]] = None
+  physical_frame_boundary: Optional[tuple[int, int, int, int]] = None
+  airplane_mode: Optional[bool] = None
+  current_activity: Optional[str] = None
+  call_state: Optional[str] = None
+  is_root: Optional[bool] = None
+
+
+DEVICE_STATE_FIELDS = tuple(_DEVICE_STATE_FIELD_PROBES.keys())
+
+
+def get_device_state(
+    env: env_interface.AndroidEnvInterface,
+    fields: Collection[str] = DEVICE_STATE_FIELDS,
+    timeout_sec: Optional[float] = _DEFAULT_TIMEOUT_SECS,
+) -> DeviceState:
+  """Queries several pieces of device state using a single adb call.
+
+  This is equivalent to calling `get_orientation`, `get_logical_screen_size`,
+  `get_physical_frame_boundary`, `check_airplane_mode`, `get_current_activity`,
+  `get_call_state` and checking `whoami`, but only costs one round-trip.
+
+  Args:
+    env: The AndroidEnv interface.
+    fields: The DeviceState fields to query. Defaults to all fields.
+    timeout_sec: A timeout to use for this operation.
+
+  Returns:
+    The device state, with only the requested fields populated.
+
+  Raises:
+    ValueError: If an unknown field is requested.
+  """
+  unknown_fields = set(fields) - set(DEVICE_STATE_FIELDS)
+  if unknown_fields:
+    raise ValueError(
+        f'Unknown device state fields: {sorted(unknown_fields)}. Must be in'
+        f' {DEVICE_STATE_FIELDS}.'
+    )
+  probes = {}
+  for field in DEVICE_STATE_FIELDS:
+    if field in fields:
+      for probe in _DEVICE_STATE_FIELD_PROBES[field]:
+        probes[probe] = _SHELL_PROBES[probe]
+  outputs = issue_batched_shell_request(probes, env, timeout_sec)
+
+  values = {}
+  if 'orientation' in fields or 'physical_frame_boundary' in fields:
+    orientation = _parse_orientation(outputs['window'])
+    if 'orientation' in fields:
+      values['orientation'] = orientation
+    if 'physical_frame_boundary' in fields:
+      frame = _parse_physical_frame(outputs['input'])
+      if frame is not None and orientation is not None:
+        values['physical_frame_boundary'] = _physical_frame_to_portrait(
+            frame, orientation
+        )
+  if 'logical_screen_size' in fields:
+    values['logical_screen_size'] = _parse_logical_screen_size(
+        outputs['input']
+    )
+  if 'airplane_mode' in fields and outputs['airplane_mode']:
+    values['airplane_mode'] = _parse_airplane_mode(outputs['airplane_mode'])
+  if 'current_activity' in fields:
+    values['current_activity'] = _parse_visible_activity(outputs['activity'])
+  if 'call_state' in fields:
+    values['call_state'] = _parse_call_state(outputs['telephony'])
+  if 'is_root' in fields and outputs['whoami']:
+    values['is_root'] = outputs['whoami'].strip() == 'root'
+
+  missing_fields = [field for field in fields if values.get(field) is None]
+  if missing_fields:
+    logging.warning('Could not query device state for: %s', missing_fields)
+  return DeviceState(**values)
+
+
 def set_screen_size(
     width: int,
     height: int,
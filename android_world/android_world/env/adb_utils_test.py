@@ -14,12 +14,14 @@
 
 """Tests for adb_utils."""
 
+import time
 from unittest import mock
 
 from absl.testing import absltest
 from android_env import env_interface
 from android_env.proto import adb_pb2
 from android_world.env import adb_utils
+from android_world.utils import fake_adb_responses
 
 
 class AdbTestSetup(absltest.TestCase):
@@ -86,10 +88,24 @@ Phone Id=0
 
   @mock.patch.object(adb_utils, 'get_call_state', autospec=True)
   def test_end_call_if_active(self, mock_get_call_state):
-    mock_get_call_state.return_value = 'OFFHOOK'
+    mock_get_call_state.side_effect = ['OFFHOOK', 'OFFHOOK', 'IDLE']
     adb_utils.end_call_if_active(self.mock_env)
 
     self.mock_issue_generic_request.assert_called()
+    self.assertEqual(mock_get_call_state.call_count, 3)
+
+  @mock.patch.object(time, 'sleep', autospec=True)
+  @mock.patch.object(adb_utils, 'get_call_state', autospec=True)
+  def test_wait_for_call_state(self, mock_get_call_state, unused_mock_sleep):
+    mock_get_call_state.side_effect = ['IDLE', 'IDLE', 'RINGING']
+
+    result = adb_utils.wait_for_call_state(
+        self.mock_env, ('RINGING', 'OFFHOOK')
+    )
+
+    self.assertTrue(result.satisfied)
+    self.assertEqual(result.value, 'RINGING')
+    self.assertEqual(result.num_polls, 3)
 
   def test_clear_android_emulator_call_log(self):
     adb_utils.clear_android_emulator_call_log(self.mock_env)
@@ -117,6 +133,37 @@ Phone Id=0
     self.assertEqual(result.generic.output.decode(), 'Success')
 
 
+class ClipboardTest(AdbTestSetup):
+
+  @mock.patch.object(time, 'sleep', autospec=True)
+  @mock.patch.object(adb_utils, 'press_back_button', autospec=True)
+  @mock.patch.object(adb_utils, 'launch_app', autospec=True)
+  def test_get_clipboard_contents_retries_until_clipper_is_ready(
+      self, mock_launch_app, unused_mock_back, unused_mock_sleep
+  ):
+    mock_launch_app.return_value = 'clipper'
+    self.mock_issue_generic_request.side_effect = [
+        fake_adb_responses.create_successful_generic_response(
+            'Broadcasting: Intent { act=clipper.get flg=0x400000 }\n'
+            'Broadcast completed: result=0'
+        ),
+        fake_adb_responses.create_successful_generic_response(
+            'Broadcasting: Intent { act=clipper.get flg=0x400000 }\n'
+            'Broadcast completed: result=-1, data="Hello"'
+        ),
+    ]
+
+    self.assertEqual(adb_utils.get_clipboard_contents(self.mock_env), 'Hello')
+    self.assertEqual(self.mock_issue_generic_request.call_count, 2)
+
+  @mock.patch.object(adb_utils, 'launch_app', autospec=True)
+  def test_get_clipboard_contents_requires_clipper(self, mock_launch_app):
+    mock_launch_app.return_value = None
+
+    with self.assertRaises(RuntimeError):
+      adb_utils.get_clipboard_contents(self.mock_env)
+
+
 class AdbSettingsTest(AdbTestSetup):
 
   def test_set_default_app(self):
@@ -241,6 +288,86 @@ class AdbTypingTest(AdbTestSetup):
       mock_execute_adb_call.assert_has_calls(expected_calls)
       self.assertLen(expected_calls, mock_execute_adb_call.call_count)
 
+  def test_type_long_text_in_chunks(self):
+    self.mock_env.execute_adb_call.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK
+    )
+    text = ' '.join(['word'] * 30) + '\n' + "it's done"
+
+    adb_utils.type_text(text, self.mock_env)
+
+    calls = self.mock_env.execute_adb_call.call_args_list
+    requests = [c.args[0] for c in calls]
+    self.assertEqual(
+        [r.WhichOneof('command') for r in requests],
+        ['input_text', 'input_text', 'press_button', 'input_text'],
+    )
+    typed = [r.input_text.text for r in requests if r.input_text.text]
+    self.assertEqual(''.join(typed[:2]), '%s'.join(['word'] * 30))
+    self.assertEqual(typed[2], "it\\'s%sdone")
+    for chunk in typed:
+      self.assertLessEqual(len(chunk), adb_utils._BULK_TYPING_CHUNK_LENGTH)
+
+  def test_rejected_chunk_is_retried_word_by_word(self):
+    ok = adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+    failed = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.FAILED_PRECONDITION
+    )
+    self.mock_env.execute_adb_call.side_effect = [failed] + [ok] * 5
+
+    adb_utils.type_text('one two three', self.mock_env, bulk=True)
+
+    typed = [
+        c.args[0].input_text.text
+        for c in self.mock_env.execute_adb_call.call_args_list
+    ]
+    self.assertEqual(
+        typed,
+        ['one%stwo%sthree', 'one', '%s', 'two', '%s', 'three'],
+    )
+
+  def test_timed_out_chunk_is_not_retried(self):
+    ok = adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+    timeout = adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.TIMEOUT)
+    self.mock_env.execute_adb_call.side_effect = [timeout, ok, ok]
+
+    adb_utils.type_text('one two\nthree', self.mock_env, bulk=True)
+
+    requests = [
+        c.args[0] for c in self.mock_env.execute_adb_call.call_args_list
+    ]
+    self.assertEqual(
+        [r.input_text.text for r in requests if r.input_text.text],
+        ['one%stwo', 'three'],
+    )
+
+  def test_type_long_text_word_by_word(self):
+    self.mock_env.execute_adb_call.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK
+    )
+    text = ' '.join(['word'] * 30)
+
+    adb_utils.type_text(text, self.mock_env, bulk=False)
+
+    self.assertEqual(self.mock_env.execute_adb_call.call_count, 59)
+
+  def test_bulk_typing_reduces_adb_calls(self):
+    env = self.mock_env
+    env.execute_adb_call.return_value = (
+        fake_adb_responses.create_successful_generic_response('')
+    )
+    paragraph = ' '.join(f'word{i}' for i in range(100))
+    note = paragraph + '\n' + paragraph
+
+    adb_utils.type_text(note, env, bulk=False)
+    word_by_word_calls = env.execute_adb_call.call_count
+    env.execute_adb_call.reset_mock()
+    adb_utils.type_text(note, env)
+    bulk_calls = env.execute_adb_call.call_count
+
+    self.assertEqual(word_by_word_calls, 399)
+    self.assertLess(bulk_calls, word_by_word_calls // 10)
+
 
 class TestExtractBroadcastData(absltest.TestCase):
 
@@ -282,5 +409,114 @@ class TestScreenUtils(absltest.TestCase):
     )
 
 
+class BatchedShellRequestTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.mock_env = mock.create_autospec(env_interface.AndroidEnvInterface)
+
+  def test_issue_batched_shell_request_splits_outputs(self):
+    self.mock_env.execute_adb_call.return_value = (
+        fake_adb_responses.create_batched_shell_response(
+            {'user': 'root', 'empty': '', 'sdk': '34\r\nextra line'}
+        )
+    )
+
+    outputs = adb_utils.issue_batched_shell_request(
+        {'user': 'whoami', 'empty': 'true', 'sdk': 'getprop sdk'},
+        self.mock_env,
+    )
+
+    self.assertEqual(
+        outputs, {'user': 'root', 'empty': '', 'sdk': '34\nextra line'}
+    )
+    self.mock_env.execute_adb_call.assert_called_once()
+    request = self.mock_env.execute_adb_call.call_args[0][0]
+    self.assertEqual(request.generic.args[0], 'shell')
+    self.assertIn('whoami;', request.generic.args[1])
+    self.assertIn('getprop sdk;', request.generic.args[1])
+
+  def test_issue_batched_shell_request_failure_returns_empty_outputs(self):
+    self.mock_env.execute_adb_call.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.ADB_ERROR
+    )
+
+    outputs = adb_utils.issue_batched_shell_request(
+        {'user': 'whoami'}, self.mock_env
+    )
+
+    self.assertEqual(outputs, {'user': ''})
+
+  def test_issue_batched_shell_request_invalid_key(self):
+    with self.assertRaises(ValueError):
+      adb_utils.issue_batched_shell_request({'bad key': 'ls'}, self.mock_env)
+
+  def test_get_device_state_uses_single_round_trip(self):
+    self.mock_env.execute_adb_call.side_effect = [
+        fake_adb_responses.create_batched_shell_response({
+            'window': 'mCurrentRotation=ROTATION_90',
+            'input': (
+                'logicalFrame=[0, 0, 0, 0]\n'
+                'logicalFrame=[0, 0, 2400, 1080]\n'
+                'physicalFrame=[0, 0, 2400, 1080]'
+            ),
+            'airplane_mode': '0',
+            'activity': (
+                'taskId=12: visible=true'
+                ' topActivity=ComponentInfo{com.android.settings/.Settings}'
+            ),
+            'telephony': '  mCallState=2',
+            'whoami': 'root',
+        })
+    ]
+
+    state = adb_utils.get_device_state(self.mock_env)
+
+    self.assertEqual(self.mock_env.execute_adb_call.call_count, 1)
+    self.assertEqual(
+        state,
+        adb_utils.DeviceState(
+            orientation=1,
+            logical_screen_size=(2400, 1080),
+            physical_frame_boundary=(0, 0, 1080, 2400),
+            airplane_mode=False,
+            current_activity='com.android.settings/.Settings',
+            call_state='OFFHOOK',
+            is_root=True,
+        ),
+    )
+
+  def test_get_device_state_only_queries_requested_fields(self):
+    self.mock_env.execute_adb_call.return_value = (
+        fake_adb_responses.create_batched_shell_response(
+            {'telephony': 'mCallState=0'}
+        )
+    )
+
+    state = adb_utils.get_device_state(self.mock_env, fields=('call_state',))
+
+    self.assertEqual(state, adb_utils.DeviceState(call_state='IDLE'))
+    request = self.mock_env.execute_adb_call.call_args[0][0]
+    self.assertIn('telephony.registry', request.generic.args[1])
+    self.assertNotIn('whoami', request.generic.args[1])
+
+  def test_get_device_state_unknown_field(self):
+    with self.assertRaises(ValueError):
+      adb_utils.get_device_state(self.mock_env, fields=('battery',))
+
+  def test_get_physical_frame_boundary_uses_single_round_trip(self):
+    self.mock_env.execute_adb_call.side_effect = [
+        fake_adb_responses.create_batched_shell_response({
+            'input': 'physicalFrame=[0, 0, 1080, 2400]',
+            'window': 'mCurrentRotation=ROTATION_0',
+        })
+    ]
+
+    boundary = adb_utils.get_physical_frame_boundary(self.mock_env)
+
+    self.assertEqual(boundary, (0, 0, 1080, 2400))
+    self.assertEqual(self.mock_env.execute_adb_call.call_count, 1)
+
+
 if __name__ == '__main__':
   absltest.main()
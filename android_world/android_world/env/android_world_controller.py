@@ -25,10 +25,12 @@ from absl import logging
 from android_env import env_interface
 from android_env import loader
 from android_env.components import config_classes
+from android_env.components import errors
 from android_env.proto.a11y import android_accessibility_forest_pb2
 from android_env.wrappers import a11y_grpc_wrapper
 from android_env.wrappers import base_wrapper
 from android_world.env import adb_utils
+from android_world.env import connection_manager
 from android_world.env import representation_utils
 from android_world.utils import file_utils
 import dm_env
@@ -55,6 +57,25 @@ def _has_wrapper(
     return False
 
 
+def _enable_networking_if_airplane_mode(
+    env: a11y_grpc_wrapper.A11yGrpcWrapper,
+) -> None:
+  """Turns networking back on if airplane mode cut the gRPC connection."""
+  try:
+    airplane_mode = adb_utils.check_airplane_mode(env)
+  except (RuntimeError, errors.AdbControllerError):
+    logging.warning('Could not check airplane mode.', exc_info=True)
+    return
+  if airplane_mode:
+    logging.warning(
+        'Airplane mode is on -- cannot retrieve a11y tree via gRPC. Turning'
+        ' it off...'
+    )
+    logging.info('Enabling networking...')
+    env.attempt_enable_networking()
+    time.sleep(1.0)
+
+
 def get_a11y_tree(
     env: env_interface.AndroidEnvInterface,
     max_retries: int = 5,
@@ -62,6 +83,9 @@ def get_a11y_tree(
 ) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
   """Gets a11y tree.
 
+  Airplane mode is only checked if the first attempt fails, so a healthy
+  connection does not pay for an extra adb call.
+
   Args:
     env: AndroidEnv.
     max_retries: Maximum number of retries to get a11y tree.
@@ -78,29 +102,17 @@ def get_a11y_tree(
         'Must use a11y_grpc_wrapper.A11yGrpcWrapper to get the a11y tree.'
     )
   env = cast(a11y_grpc_wrapper.A11yGrpcWrapper, env)
-  if adb_utils.retry(3)(adb_utils.check_airplane_mode)(env):
-    logging.warning(
-        'Airplane mode is on -- cannot retrieve a11y tree via gRPC. Turning'
-        ' it off...'
-    )
-    logging.info('Enabling networking...')
-    env.attempt_enable_networking()
-    time.sleep(1.0)
 
-  forest: Optional[
-      android_accessibility_forest_pb2.AndroidAccessibilityForest
-  ] = None
-  for _ in range(max_retries):
+  for attempt in range(max_retries):
     try:
-      forest = env.accumulate_new_extras()['accessibility_tree'][-1]  # pytype:disable=attribute-error
-      return forest
+      return env.accumulate_new_extras()['accessibility_tree'][-1]  # pytype:disable=attribute-error
     except KeyError:
       logging.warning('Could not get a11y tree, retrying.')
+    if attempt == 0:
+      _enable_networking_if_airplane_mode(env)
     time.sleep(sleep_duration)
 
-  if forest is None:
-    raise RuntimeError('Could not get a11y tree.')
-  return forest
+  raise RuntimeError('Could not get a11y tree.')
 
 
 _TASK_PATH = file_utils.convert_to_posix_path(
@@ -174,6 +186,9 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     else:
       self._env = env
     self._a11y_method = a11y_method
+    self._connection = connection_manager.ConnectionManager(
+        self._reconnect
+    )
 
   @property
   def device_screen_size(self) -> tuple[int, int]:
@@ -193,11 +208,16 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
   def env(self) -> env_interface.AndroidEnvInterface:
     return self._env
 
-  def refresh_env(self):
+  @property
+  def connection_health(self) -> connection_manager.ConnectionHealth:
+    """Returns health metrics of the connection to the device."""
+    return self._connection.health
+
+  def _reconnect(self) -> env_interface.AndroidEnvInterface:
     # pylint: disable=protected-access
     # pytype: disable=attribute-error
     # Reconnect to emulator and reload a11y wrapper in case we lose connection.
-    self._env = get_controller(
+    return get_controller(
         console_port=self.env._coordinator._simulator._config.emulator_launcher.emulator_console_port,
         adb_path=self.env._coordinator._simulator._config.adb_controller.adb_path,
         grpc_port=self.env._coordinator._simulator._config.emulator_launcher.grpc_port,
@@ -205,6 +225,9 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
     # pylint: enable=protected-access
     # pytype: enable=attribute-error
 
+  def refresh_env(self):
+    self._env = self._connection.reconnect()
+
   def _get_a11y_forest(
       self,
   ) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
@@ -215,14 +238,21 @@ class AndroidWorldController(base_wrapper.BaseWrapper):
   ) -> android_accessibility_forest_pb2.AndroidAccessibilityForest:
     """Returns the most recent a11y forest from the device."""
     try:
-      return self._get_a11y_forest()
+      forest = self._get_a11y_forest()
     except RuntimeError:
+      self._connection.record_failure()
       print(
           'Could not get a11y tree. Reconnecting to Android, reinitializing'
           ' AndroidEnv, and restarting a11y forwarding.'
       )
       self.refresh_env()
-      return self._get_a11y_forest()
+      try:
+        forest = self._get_a11y_forest()
+      except RuntimeError:
+        self._connection.record_failure()
+        raise
+    self._connection.record_success()
+    return forest
 
   def get_ui_elements(self) -> list[representation_utils.UIElement]:
     """Returns the most recent UI elements from the device."""
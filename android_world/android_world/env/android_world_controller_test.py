@@ -14,6 +14,7 @@
 
 import os
 import tempfile
+import time
 from unittest import mock
 
 from absl.testing import absltest
@@ -161,6 +162,99 @@ class AndroidWorldControllerTest(absltest.TestCase):
     self.assertEqual(forest, 'success')
     mock_refresh_env.assert_called_once()
 
+  @mock.patch.object(adb_utils, 'check_airplane_mode')
+  @mock.patch.object(android_world_controller, '_has_wrapper')
+  def test_get_a11y_forest_skips_airplane_check_when_healthy(
+      self, mock_has_wrapper, mock_check_airplane_mode
+  ):
+    del mock_has_wrapper
+    mock_base_env = mock.Mock(spec=env_interface.AndroidEnvInterface)
+    env = android_world_controller.AndroidWorldController(mock_base_env)
+    env._env.accumulate_new_extras.return_value = {
+        'accessibility_tree': ['success']
+    }
+
+    forest = env.get_a11y_forest()
+
+    self.assertEqual(forest, 'success')
+    mock_check_airplane_mode.assert_not_called()
+    self.assertTrue(env.connection_health.healthy)
+    self.assertEqual(env.connection_health.num_successes, 1)
+
+  @mock.patch.object(time, 'sleep')
+  @mock.patch.object(adb_utils, 'check_airplane_mode')
+  @mock.patch.object(android_world_controller, '_has_wrapper')
+  def test_get_a11y_tree_checks_airplane_mode_once_on_failure(
+      self, mock_has_wrapper, mock_check_airplane_mode, mock_sleep
+  ):
+    del mock_has_wrapper, mock_sleep
+    mock_check_airplane_mode.return_value = True
+    mock_env = mock.Mock()
+    mock_env.accumulate_new_extras.side_effect = [
+        {},
+        {},
+        {'accessibility_tree': ['success']},
+    ]
+
+    forest = android_world_controller.get_a11y_tree(mock_env)
+
+    self.assertEqual(forest, 'success')
+    mock_check_airplane_mode.assert_called_once()
+    mock_env.attempt_enable_networking.assert_called_once()
+
+  @mock.patch.object(time, 'sleep')
+  @mock.patch.object(adb_utils, 'check_airplane_mode')
+  @mock.patch.object(android_world_controller, '_has_wrapper')
+  def test_get_a11y_tree_retries_when_airplane_mode_check_fails(
+      self, mock_has_wrapper, mock_check_airplane_mode, mock_sleep
+  ):
+    del mock_has_wrapper, mock_sleep
+    mock_check_airplane_mode.side_effect = RuntimeError('adb failed')
+    mock_env = mock.Mock()
+    mock_env.accumulate_new_extras.side_effect = [
+        {},
+        {},
+        {'accessibility_tree': ['success']},
+    ]
+
+    forest = android_world_controller.get_a11y_tree(mock_env)
+
+    self.assertEqual(forest, 'success')
+    mock_check_airplane_mode.assert_called_once()
+    mock_env.attempt_enable_networking.assert_not_called()
+
+  @mock.patch.object(time, 'sleep')
+  @mock.patch.object(android_world_controller, 'get_controller')
+  @mock.patch.object(adb_utils, 'check_airplane_mode')
+  @mock.patch.object(android_world_controller, '_has_wrapper')
+  def test_refresh_env_records_health(
+      self,
+      mock_has_wrapper,
+      mock_check_airplane_mode,
+      mock_get_controller,
+      mock_sleep,
+  ):
+    del mock_has_wrapper, mock_sleep
+    mock_check_airplane_mode.return_value = False
+    mock_base_env = mock.Mock(spec=env_interface.AndroidEnvInterface)
+    env = android_world_controller.AndroidWorldController(mock_base_env)
+    env._env._coordinator = mock.MagicMock()
+    env._env.accumulate_new_extras.return_value = {}
+    new_env = mock.Mock()
+    new_env.accumulate_new_extras.return_value = {
+        'accessibility_tree': ['success']
+    }
+    mock_get_controller.return_value.env = new_env
+
+    forest = env.get_a11y_forest()
+
+    self.assertEqual(forest, 'success')
+    self.assertIs(env.env, new_env)
+    health = env.connection_health
+    self.assertTrue(health.healthy)
+    self.assertEqual(health.num_failures, 1)
+    self.assertEqual(health.num_reconnects, 1)
+
   def test_pull_file(self):
     file_contents = 'test file contents'
     remote_file_path = create_file_with_contents(file_contents)
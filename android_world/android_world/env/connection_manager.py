@@ -0,0 +1,151 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tracks the health of the connection to the device and reconnects to it."""
+
+import dataclasses
+import random
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+from absl import logging
+
+T = TypeVar('T')
+
+
+@dataclasses.dataclass
+class ConnectionHealth:
+  """Health metrics of a connection.
+
+  Attributes:
+    num_successes: Number of successful requests.
+    num_failures: Number of failed requests.
+    consecutive_failures: Number of failed requests since the last success.
+    num_reconnects: Number of successful reconnections.
+    num_failed_reconnect_attempts: Number of reconnection attempts that raised.
+    last_failure_time: Wall-clock time of the last failed request.
+    last_reconnect_sec: Time taken by the last successful reconnection,
+      including backoff.
+  """
+
+  num_successes: int = 0
+  num_failures: int = 0
+  consecutive_failures: int = 0
+  num_reconnects: int = 0
+  num_failed_reconnect_attempts: int = 0
+  last_failure_time: Optional[float] = None
+  last_reconnect_sec: Optional[float] = None
+
+  @property
+  def healthy(self) -> bool:
+    """Whether the last request succeeded (or none has been made yet)."""
+    return self.consecutive_failures == 0
+
+
+class ConnectionManager(Generic[T]):
+  """Records request outcomes and reconnects with jittered backoff.
+
+  Recording outcomes is bookkeeping only, so callers can report every request
+  on the hot path without issuing any extra calls to the device.
+  """
+
+  def __init__(
+      self,
+      reconnect_fn: Callable[[], T],
+      max_reconnect_attempts: int = 3,
+      initial_backoff_sec: float = 0.5,
+      max_backoff_sec: float = 8.0,
+      backoff_factor: float = 2.0,
+      jitter: float = 0.5,
+      rng: Optional[random.Random] = None,
+  ):
+    """Initializes the connection manager.
+
+    Args:
+      reconnect_fn: Function that re-establishes the connection and returns
+        the new connection object, e.g. a fresh environment.
+      max_reconnect_attempts: Number of times to call `reconnect_fn` before
+        giving up.
+      initial_backoff_sec: Delay before the second reconnection attempt.
+      max_backoff_sec: Upper bound on the delay between two attempts.
+      backoff_factor: Factor by which the delay grows after each attempt.
+      jitter: Fraction of each delay that is randomized, in [0, 1], so that
+        several clients reconnecting at once do not retry in lockstep.
+      rng: Random number generator used for jitter.
+    """
+    if max_reconnect_attempts < 1:
+      raise ValueError('max_reconnect_attempts must be at least 1.')
+    if not 0.0 <= jitter <= 1.0:
+      raise ValueError(f'jitter must be in [0, 1], got {jitter}.')
+    self._reconnect_fn = reconnect_fn
+    self._max_reconnect_attempts = max_reconnect_attempts
+    self._initial_backoff_sec = initial_backoff_sec
+    self._max_backoff_sec = max_backoff_sec
+    self._backoff_factor = backoff_factor
+    self._jitter = jitter
+    self._rng = rng or random.Random()
+    self._health = ConnectionHealth()
+
+  @property
+  def health(self) -> ConnectionHealth:
+    """Returns a copy of the current health metrics."""
+    return dataclasses.replace(self._health)
+
+  def record_success(self) -> None:
+    self._health.num_successes += 1
+    self._health.consecutive_failures = 0
+
+  def record_failure(self) -> None:
+    self._health.num_failures += 1
+    self._health.consecutive_failures += 1
+    self._health.last_failure_time = time.time()
+
+  def _backoff_sec(self, attempt: int) -> float:
+    delay = min(
+        self._initial_backoff_sec * self._backoff_factor**attempt,
+        self._max_backoff_sec,
+    )
+    return delay * (1.0 - self._jitter * self._rng.random())
+
+  def reconnect(self) -> T:
+    """Reconnects, retrying with jittered exponential backoff.
+
+    Returns:
+      The value returned by the first successful call to `reconnect_fn`.
+
+    Raises:
+      Exception: The error raised by the last attempt, if all attempts fail.
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+      try:
+        connection = self._reconnect_fn()
+        break
+      except Exception:  # pylint: disable=broad-exception-caught
+        self._health.num_failed_reconnect_attempts += 1
+        if attempt + 1 >= self._max_reconnect_attempts:
+          raise
+        delay = self._backoff_sec(attempt)
+        logging.warning(
+            'Reconnection attempt %d failed, retrying in %.2fs.',
+            attempt + 1,
+            delay,
+            exc_info=True,
+        )
+        time.sleep(delay)
+        attempt += 1
+    self._health.num_reconnects += 1
+    self._health.last_reconnect_sec = time.monotonic() - start
+    return connection
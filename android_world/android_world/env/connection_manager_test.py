@@ -0,0 +1,119 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for connection_manager."""
+
+import random
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.env import connection_manager
+
+
+class ConnectionManagerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.mock_sleep = self.enter_context(mock.patch.object(time, 'sleep'))
+
+  def test_records_outcomes(self):
+    manager = connection_manager.ConnectionManager(lambda: 'env')
+
+    manager.record_failure()
+    manager.record_failure()
+    self.assertFalse(manager.health.healthy)
+    self.assertEqual(manager.health.consecutive_failures, 2)
+    self.assertIsNotNone(manager.health.last_failure_time)
+
+    manager.record_success()
+    health = manager.health
+    self.assertTrue(health.healthy)
+    self.assertEqual(health.num_successes, 1)
+    self.assertEqual(health.num_failures, 2)
+
+  def test_health_is_a_snapshot(self):
+    manager = connection_manager.ConnectionManager(lambda: 'env')
+    health = manager.health
+
+    manager.record_failure()
+
+    self.assertEqual(health.num_failures, 0)
+
+  def test_reconnect_first_attempt(self):
+    manager = connection_manager.ConnectionManager(lambda: 'env')
+
+    self.assertEqual(manager.reconnect(), 'env')
+    self.assertEqual(manager.health.num_reconnects, 1)
+    self.mock_sleep.assert_not_called()
+
+  def test_reconnect_retries_with_jittered_backoff(self):
+    reconnect_fn = mock.Mock(side_effect=[OSError(), OSError(), 'env'])
+    manager = connection_manager.ConnectionManager(
+        reconnect_fn,
+        max_reconnect_attempts=3,
+        initial_backoff_sec=1.0,
+        jitter=0.5,
+        rng=random.Random(0),
+    )
+
+    self.assertEqual(manager.reconnect(), 'env')
+
+    delays = [call.args[0] for call in self.mock_sleep.call_args_list]
+    self.assertLen(delays, 2)
+    self.assertBetween(delays[0], 0.5, 1.0)
+    self.assertBetween(delays[1], 1.0, 2.0)
+    health = manager.health
+    self.assertEqual(health.num_failed_reconnect_attempts, 2)
+    self.assertEqual(health.num_reconnects, 1)
+
+  def test_backoff_is_capped(self):
+    reconnect_fn = mock.Mock(side_effect=[OSError()] * 4 + ['env'])
+    manager = connection_manager.ConnectionManager(
+        reconnect_fn,
+        max_reconnect_attempts=5,
+        initial_backoff_sec=1.0,
+        max_backoff_sec=2.0,
+        jitter=0.0,
+    )
+
+    manager.reconnect()
+
+    self.assertEqual(
+        [call.args[0] for call in self.mock_sleep.call_args_list],
+        [1.0, 2.0, 2.0, 2.0],
+    )
+
+  def test_reconnect_gives_up(self):
+    reconnect_fn = mock.Mock(side_effect=OSError('unreachable'))
+    manager = connection_manager.ConnectionManager(
+        reconnect_fn, max_reconnect_attempts=2
+    )
+
+    with self.assertRaisesRegex(OSError, 'unreachable'):
+      manager.reconnect()
+    self.assertEqual(reconnect_fn.call_count, 2)
+    self.assertEqual(manager.health.num_reconnects, 0)
+
+  def test_invalid_arguments(self):
+    with self.assertRaises(ValueError):
+      connection_manager.ConnectionManager(
+          lambda: None, max_reconnect_attempts=0
+      )
+    with self.assertRaises(ValueError):
+      connection_manager.ConnectionManager(lambda: None, jitter=1.5)
+
+
+if __name__ == '__main__':
+  absltest.main()
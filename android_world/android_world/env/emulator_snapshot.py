@@ -0,0 +1,360 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Resets the device between tasks by loading a named emulator snapshot.
+
+Loading a quick-boot snapshot through the emulator console resets the whole
+device (app data, storage, SMS, settings) in a single call, whereas the
+default reset restores each app's data file by file through adb. The
+`DeviceResetter` picks whichever of the two is cheaper, based on measured
+costs.
+"""
+
+import abc
+import dataclasses
+import enum
+import os
+import socket
+import time
+from typing import Sequence
+
+from absl import logging
+from android_world.env import adb_utils
+from android_world.env import interface
+from android_world.utils import app_snapshot
+from android_world.utils import wait_utils
+
+DEFAULT_SNAPSHOT_NAME = 'android_world_setup'
+_AUTH_TOKEN_PATH = '~/.emulator_console_auth_token'
+
+# Apps that TaskEval does not restore a snapshot for.
+_STATELESS_APPS = ('clipper',)
+
+
+class ConsoleError(RuntimeError):
+  """Raised when an emulator console command fails."""
+
+
+class Console(abc.ABC):
+  """Sends commands to the emulator console."""
+
+  @abc.abstractmethod
+  def send(self, command: str) -> str:
+    """Sends a command and returns its output.
+
+    Args:
+      command: The console command, e.g. "avd snapshot list".
+
+    Returns:
+      The output of the command, without the final "OK" line.
+
+    Raises:
+      ConsoleError: If the command failed.
+    """
+
+  def close(self) -> None:
+    """Closes the connection to the console."""
+
+
+class EmulatorConsole(Console):
+  """Talks to the emulator console over its telnet port."""
+
+  def __init__(
+      self,
+      port: int = 5554,
+      host: str = 'localhost',
+      auth_token_path: str = _AUTH_TOKEN_PATH,
+      timeout_sec: float = 120.0,
+  ):
+    """Initializes the console.
+
+    Args:
+      port: The console port of the emulator.
+      host: The host the emulator runs on.
+      auth_token_path: File containing the console auth token, used if the
+        console requires authentication.
+      timeout_sec: Socket timeout. Saving and loading snapshots can take tens of
+        seconds.
+    """
+    self._address = (host, port)
+    self._auth_token_path = os.path.expanduser(auth_token_path)
+    self._timeout_sec = timeout_sec
+    self._socket = None
+    self._file = None
+
+  def _read_output(self) -> str:
+    lines = []
+    while True:
+      line = self._file.readline()
+      if not line:
+        raise ConsoleError('Emulator console closed the connection.')
+      line = line.decode(errors='replace').rstrip('\r\n')
+      if line == 'OK':
+        return '\n'.join(lines)
+      if line.startswith('KO'):
+        raise ConsoleError(line)
+      lines.append(line)
+
+  def _write(self, command: str) -> None:
+    self._file.write(command.encode() + b'\n')
+    self._file.flush()
+
+  def _connect(self) -> None:
+    self._socket = socket.create_connection(
+        self._address, timeout=self._timeout_sec
+    )
+    self._file = self._socket.makefile('rwb')
+    banner = self._read_output()
+    if 'Authentication required' in banner:
+      try:
+        with open(self._auth_token_path) as f:
+          token = f.read().strip()
+      except OSError as error:
+        raise ConsoleError(
+            f'Cannot read console auth token from {self._auth_token_path}.'
+        ) from error
+      self._write(f'auth {token}')
+      self._read_output()
+
+  def send(self, command: str) -> str:
+    if self._file is None:
+      self._connect()
+    self._write(command)
+    return self._read_output()
+
+  def close(self) -> None:
+    if self._socket is not None:
+      self._file.close()
+      self._socket.close()
+    self._socket = None
+    self._file = None
+
+
+class FakeConsole(Console):
+  """In-memory stand-in for the emulator console, for tests."""
+
+  def __init__(self, load_latency_sec: float = 0.0):
+    self.snapshots: list[str] = []
+    self.commands: list[str] = []
+    self.load_latency_sec = load_latency_sec
+
+  def send(self, command: str) -> str:
+    self.commands.append(command)
+    args = command.split()
+    if args[:2] != ['avd', 'snapshot']:
+      raise ConsoleError(f'KO: unknown command: {command}')
+    action, names = args[2], args[3:]
+    if action == 'list':
+      return '\n'.join(
+          ['List of snapshots present on all disks:', 'ID  TAG  VM SIZE', '--']
+          + [f'--  {name}  1G' for name in self.snapshots]
+      )
+    if action == 'save':
+      if names[0] not in self.snapshots:
+        self.snapshots.append(names[0])
+      return ''
+    if names[0] not in self.snapshots:
+      raise ConsoleError(f'KO: snapshot {names[0]} not found')
+    if action == 'load':
+      time.sleep(self.load_latency_sec)
+    elif action == 'delete':
+      self.snapshots.remove(names[0])
+    return ''
+
+
+class SnapshotPool:
+  """Named emulator snapshots, managed through the console."""
+
+  def __init__(self, console: Console):
+    self._console = console
+
+  def list(self) -> list[str]:
+    """Returns the names of the snapshots of the running AVD."""
+    output = self._console.send('avd snapshot list')
+    lines = output.splitlines()
+    # The table of snapshots starts after a "--" separator line.
+    for i, line in enumerate(lines):
+      if line.strip() == '--':
+        return [l.split()[1] for l in lines[i + 1 :] if len(l.split()) > 1]
+    return []
+
+  def save(self, name: str) -> None:
+    self._console.send(f'avd snapshot save {name}')
+
+  def load(self, name: str) -> None:
+    self._console.send(f'avd snapshot load {name}')
+
+  def delete(self, name: str) -> None:
+    self._console.send(f'avd snapshot delete {name}')
+
+
+class ResetMode(enum.Enum):
+  """How the device is reset before a task family.
+
+  AUTO: Pick SNAPSHOT or APP, whichever is cheaper.
+  SNAPSHOT: Load the emulator snapshot.
+  APP: Leave it to the per-app snapshot restores in `TaskEval`.
+  """
+
+  AUTO = 'auto'
+  SNAPSHOT = 'snapshot'
+  APP = 'app'
+
+
+@dataclasses.dataclass
+class ResetStats:
+  """Counters for device resets.
+
+  Attributes:
+    num_snapshot_resets: Number of resets done by loading the emulator
+      snapshot.
+    num_app_resets: Number of resets left to per-app restores.
+    snapshot_reset_sec: Total time spent on snapshot resets.
+  """
+
+  num_snapshot_resets: int = 0
+  num_app_resets: int = 0
+  snapshot_reset_sec: float = 0.0
+
+  @property
+  def mean_snapshot_reset_sec(self) -> float | None:
+    if not self.num_snapshot_resets:
+      return None
+    return self.snapshot_reset_sec / self.num_snapshot_resets
+
+
+def _stateful_apps(app_names: Sequence[str]) -> list[str]:
+  return [name for name in app_names if name and name not in _STATELESS_APPS]
+
+
+class DeviceResetter:
+  """Resets the device before each task family.
+
+  In AUTO mode, a family is reset by loading the emulator snapshot if the last
+  measured snapshot reset is faster than restoring each of the family's apps,
+  going by the mean per-app restore time from `app_snapshot`. Costs that have
+  not been measured yet are measured first. After loading the snapshot, the
+  family's apps are marked as restored, so that `TaskEval` skips restoring them.
+  """
+
+  def __init__(
+      self,
+      env: interface.AsyncEnv,
+      pool: SnapshotPool,
+      snapshot_name: str = DEFAULT_SNAPSHOT_NAME,
+      mode: ResetMode = ResetMode.AUTO,
+      boot_timeout_sec: float = 120.0,
+  ):
+    self._env = env
+    self._pool = pool
+    self._snapshot_name = snapshot_name
+    self._mode = mode
+    self._boot_timeout_sec = boot_timeout_sec
+    self.stats = ResetStats()
+
+  def save(self) -> None:
+    """Saves the current device state as the reset snapshot."""
+    logging.info('Saving emulator snapshot %s.', self._snapshot_name)
+    self._pool.save(self._snapshot_name)
+
+  def ensure_saved(self, app_names: Sequence[str]) -> None:
+    """Saves the reset snapshot unless it already exists.
+
+    The apps are first restored from their app snapshots, so that loading the
+    emulator snapshot leaves them in the same state as per-app restores. If an
+    app cannot be restored, no snapshot is saved and snapshot resets are
+    disabled.
+
+    Args:
+      app_names: The apps that snapshot resets are used for.
+    """
+    if self._snapshot_name in self._pool.list():
+      return
+    for app_name in sorted(set(_stateful_apps(app_names))):
+      try:
+        app_snapshot.restore_snapshot(app_name, self._env.controller)
+      except RuntimeError as error:
+        logging.warning(
+            'Not saving emulator snapshot %s, as %s could not be restored: %s',
+            self._snapshot_name,
+            app_name,
+            error,
+        )
+        self._mode = ResetMode.APP
+        return
+    self.save()
+
+  def choose(self, app_names: Sequence[str]) -> ResetMode:
+    """Returns the cheaper reset for a family using the given apps."""
+    if self._mode != ResetMode.AUTO:
+      return self._mode
+    num_apps = len(_stateful_apps(app_names))
+    restore_stats = app_snapshot.get_restore_stats(self._env.controller)
+    if not num_apps or not restore_stats.num_restores:
+      return ResetMode.APP
+    snapshot_sec = self.stats.mean_snapshot_reset_sec
+    if snapshot_sec is None:
+      return ResetMode.SNAPSHOT
+    restore_sec = restore_stats.restore_time_sec / restore_stats.num_restores
+    if snapshot_sec < num_apps * restore_sec:
+      return ResetMode.SNAPSHOT
+    return ResetMode.APP
+
+  def _wait_for_boot(self) -> None:
+    def boot_completed() -> bool:
+      try:
+        response = adb_utils.issue_generic_request(
+            ['shell', 'getprop', 'sys.boot_completed'], self._env.controller
+        )
+      except Exception:  # pylint: disable=broad-exception-caught
+        return False
+      return response.generic.output.decode().strip() == '1'
+
+    result = wait_utils.wait_until(
+        boot_completed, bool, timeout_sec=self._boot_timeout_sec
+    )
+    if not result.satisfied:
+      raise RuntimeError(
+          'Device did not come back after loading emulator snapshot'
+          f' {self._snapshot_name}.'
+      )
+
+  def reset(self, app_names: Sequence[str]) -> ResetMode:
+    """Resets the device before running a task family.
+
+    Args:
+      app_names: The apps used by the task family.
+
+    Returns:
+      The reset that was used. If loading the snapshot fails or the device does
+      not boot in time, falls back to per-app restores.
+    """
+    mode = self.choose(app_names)
+    if mode == ResetMode.SNAPSHOT:
+      start = time.perf_counter()
+      try:
+        self._pool.load(self._snapshot_name)
+        self._wait_for_boot()
+      except (RuntimeError, OSError) as error:
+        # RuntimeError covers ConsoleError and boot timeouts.
+        logging.warning('Falling back to per-app restores: %s', error)
+        mode = ResetMode.APP
+      else:
+        for app_name in _stateful_apps(app_names):
+          app_snapshot.mark_restored(app_name, self._env.controller)
+        self.stats.num_snapshot_resets += 1
+        self.stats.snapshot_reset_sec += time.perf_counter() - start
+    if mode == ResetMode.APP:
+      self.stats.num_app_resets += 1
+    return mode
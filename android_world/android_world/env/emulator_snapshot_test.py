@@ -0,0 +1,265 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import socketserver
+import tempfile
+import threading
+from unittest import mock
+
+from absl.testing import absltest
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+from android_world.env import emulator_snapshot
+from android_world.utils import app_snapshot
+from android_world.utils import test_utils
+
+
+class _ConsoleHandler(socketserver.StreamRequestHandler):
+  """Mimics the emulator console, which requires authentication."""
+
+  def handle(self):
+    self.wfile.write(
+        b'Android Console: Authentication required\r\n'
+        b"Android Console: type 'auth <auth_token>' to authenticate\r\n"
+        b'OK\r\n'
+    )
+    authenticated = False
+    for line in self.rfile:
+      command = line.decode().strip()
+      if command == 'auth secret':
+        authenticated = True
+        self.wfile.write(b'Android Console: type help\r\nOK\r\n')
+      elif not authenticated:
+        self.wfile.write(b'KO: unknown command, try help\r\n')
+      elif command == 'avd snapshot list':
+        self.wfile.write(
+            b'List of snapshots present on all disks:\r\n'
+            b'ID        TAG               VM SIZE\r\n'
+            b'--\r\n'
+            b'--        default_boot      187M\r\n'
+            b'OK\r\n'
+        )
+      else:
+        self.wfile.write(b'KO: bad command\r\n')
+
+
+class EmulatorConsoleTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.server = socketserver.ThreadingTCPServer(
+        ('localhost', 0), _ConsoleHandler
+    )
+    self.server.daemon_threads = True
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    tmp_dir = self.enter_context(tempfile.TemporaryDirectory())
+    self.token_path = os.path.join(tmp_dir, 'token')
+    with open(self.token_path, 'w') as f:
+      f.write('secret\n')
+
+  def _console(self, token_path: str) -> emulator_snapshot.EmulatorConsole:
+    console = emulator_snapshot.EmulatorConsole(
+        port=self.server.server_address[1], auth_token_path=token_path
+    )
+    self.addCleanup(console.close)
+    return console
+
+  def test_authenticates_and_lists_snapshots(self):
+    pool = emulator_snapshot.SnapshotPool(self._console(self.token_path))
+
+    self.assertEqual(pool.list(), ['default_boot'])
+
+  def test_failed_command_raises(self):
+    console = self._console(self.token_path)
+
+    with self.assertRaisesRegex(emulator_snapshot.ConsoleError, 'KO'):
+      console.send('avd snapshot load missing')
+
+  def test_missing_token_raises(self):
+    console = self._console(self.token_path + '.missing')
+
+    with self.assertRaisesRegex(emulator_snapshot.ConsoleError, 'auth token'):
+      console.send('avd snapshot list')
+
+
+class SnapshotPoolTest(absltest.TestCase):
+
+  def test_save_load_delete(self):
+    console = emulator_snapshot.FakeConsole()
+    pool = emulator_snapshot.SnapshotPool(console)
+
+    pool.save('a')
+    pool.save('b')
+    pool.load('a')
+    pool.delete('b')
+
+    self.assertEqual(pool.list(), ['a'])
+    with self.assertRaises(emulator_snapshot.ConsoleError):
+      pool.load('b')
+
+
+class DeviceResetterTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.env = test_utils.FakeAsyncEnv()
+    self.console = emulator_snapshot.FakeConsole()
+    self.pool = emulator_snapshot.SnapshotPool(self.console)
+    self.enter_context(
+        mock.patch.object(
+            adb_utils,
+            'issue_generic_request',
+            return_value=adb_pb2.AdbResponse(
+                status=adb_pb2.AdbResponse.Status.OK,
+                generic=adb_pb2.AdbResponse.GenericResponse(output=b'1\n'),
+            ),
+        )
+    )
+    self.mock_mark_restored = self.enter_context(
+        mock.patch.object(app_snapshot, 'mark_restored')
+    )
+    self.mock_restore_snapshot = self.enter_context(
+        mock.patch.object(app_snapshot, 'restore_snapshot')
+    )
+    self.restore_stats = app_snapshot.get_restore_stats(self.env.controller)
+
+  def _resetter(
+      self,
+      mode: emulator_snapshot.ResetMode = emulator_snapshot.ResetMode.AUTO,
+  ) -> emulator_snapshot.DeviceResetter:
+    resetter = emulator_snapshot.DeviceResetter(self.env, self.pool, mode=mode)
+    resetter.ensure_saved(['contacts'])
+    return resetter
+
+  def test_ensure_saved_saves_once(self):
+    self._resetter()
+    self._resetter()
+
+    self.assertEqual(
+        self.console.commands.count('avd snapshot save android_world_setup'), 1
+    )
+
+  def test_ensure_saved_restores_apps_first(self):
+    mock_save = self.enter_context(
+        mock.patch.object(self.pool, 'save', wraps=self.pool.save)
+    )
+    manager = mock.Mock()
+    manager.attach_mock(self.mock_restore_snapshot, 'restore_snapshot')
+    manager.attach_mock(mock_save, 'save')
+    resetter = emulator_snapshot.DeviceResetter(self.env, self.pool)
+
+    resetter.ensure_saved(['markor', 'clipper', 'contacts', 'markor'])
+
+    self.assertEqual(
+        manager.mock_calls,
+        [
+            mock.call.restore_snapshot('contacts', self.env.controller),
+            mock.call.restore_snapshot('markor', self.env.controller),
+            mock.call.save('android_world_setup'),
+        ],
+    )
+
+  def test_ensure_saved_skips_save_if_restore_fails(self):
+    self.mock_restore_snapshot.side_effect = RuntimeError('no snapshot')
+    resetter = self._resetter(emulator_snapshot.ResetMode.SNAPSHOT)
+
+    self.assertEmpty(self.pool.list())
+    self.assertEqual(
+        resetter.reset(['contacts']), emulator_snapshot.ResetMode.APP
+    )
+    self.mock_mark_restored.assert_not_called()
+
+  def test_auto_measures_restore_cost_first(self):
+    resetter = self._resetter()
+
+    self.assertEqual(
+        resetter.reset(['contacts']), emulator_snapshot.ResetMode.APP
+    )
+    self.assertEqual(resetter.stats.num_app_resets, 1)
+
+  def test_auto_picks_cheaper_reset(self):
+    resetter = self._resetter()
+    self.restore_stats.num_restores = 2
+    self.restore_stats.restore_time_sec = 2.0
+
+    # The snapshot reset has not been measured yet, so it is tried.
+    self.assertEqual(
+        resetter.reset(['contacts', 'clipper']),
+        emulator_snapshot.ResetMode.SNAPSHOT,
+    )
+    self.mock_mark_restored.assert_called_once_with(
+        'contacts', self.env.controller
+    )
+    resetter.stats.snapshot_reset_sec = 1.5
+
+    self.assertEqual(
+        resetter.choose(['contacts']), emulator_snapshot.ResetMode.APP
+    )
+    self.assertEqual(
+        resetter.choose(['contacts', 'markor']),
+        emulator_snapshot.ResetMode.SNAPSHOT,
+    )
+    self.assertEqual(resetter.choose([]), emulator_snapshot.ResetMode.APP)
+
+  def test_fixed_mode(self):
+    resetter = self._resetter(emulator_snapshot.ResetMode.SNAPSHOT)
+
+    self.assertEqual(resetter.reset([]), emulator_snapshot.ResetMode.SNAPSHOT)
+    self.assertIn(
+        'avd snapshot load android_world_setup', self.console.commands
+    )
+    self.assertEqual(resetter.stats.num_snapshot_resets, 1)
+
+  def test_falls_back_to_app_reset(self):
+    resetter = emulator_snapshot.DeviceResetter(
+        self.env, self.pool, mode=emulator_snapshot.ResetMode.SNAPSHOT
+    )
+
+    self.assertEqual(
+        resetter.reset(['contacts']), emulator_snapshot.ResetMode.APP
+    )
+    self.assertEqual(resetter.stats.num_snapshot_resets, 0)
+    self.assertEqual(resetter.stats.num_app_resets, 1)
+
+  def test_boot_timeout_falls_back_to_app_reset(self):
+    self.enter_context(
+        mock.patch.object(
+            adb_utils,
+            'issue_generic_request',
+            return_value=adb_pb2.AdbResponse(
+                status=adb_pb2.AdbResponse.Status.OK,
+                generic=adb_pb2.AdbResponse.GenericResponse(output=b'0\n'),
+            ),
+        )
+    )
+    resetter = emulator_snapshot.DeviceResetter(
+        self.env,
+        self.pool,
+        mode=emulator_snapshot.ResetMode.SNAPSHOT,
+        boot_timeout_sec=0.0,
+    )
+    resetter.ensure_saved(['contacts'])
+
+    self.assertEqual(
+        resetter.reset(['contacts']), emulator_snapshot.ResetMode.APP
+    )
+    self.mock_mark_restored.assert_not_called()
+    self.assertEqual(resetter.stats.num_snapshot_resets, 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -195,6 +195,21 @@ class AsyncEnv(abc.ABC):
     orientation.
     """
 
+  def get_screen_geometry(self) -> adb_utils.DeviceState:
+    """Returns the logical screen size, orientation and frame boundary.
+
+    Subclasses may override this to query all three at once instead of reading
+    each property separately.
+
+    Returns: A device state with `logical_screen_size`, `orientation` and
+    `physical_frame_boundary` populated.
+    """
+    return adb_utils.DeviceState(
+        orientation=self.orientation,
+        logical_screen_size=self.logical_screen_size,
+        physical_frame_boundary=self.physical_frame_boundary,
+    )
+
 
 def _process_timestep(timestep: dm_env.TimeStep) -> State:
   """Parses timestep observation and returns State."""
@@ -359,3 +374,28 @@ class AsyncAndroidEnv(AsyncEnv):
   @property
   def physical_frame_boundary(self) -> tuple[int, int, int, int]:
     return adb_utils.get_physical_frame_boundary(self.controller)
+
+  def get_screen_geometry(self) -> adb_utils.DeviceState:
+    state = adb_utils.get_device_state(
+        self.controller,
+        fields=(
+            'orientation',
+            'logical_screen_size',
+            'physical_frame_boundary',
+        ),
+    )
+    # Fall back to the individual queries for anything that failed to parse.
+    return dataclasses.replace(
+        state,
+        orientation=(
+            self.orientation
+            if state.orientation is None
+            else state.orientation
+        ),
+        logical_screen_size=(
+            state.logical_screen_size or self.logical_screen_size
+        ),
+        physical_frame_boundary=(
+            state.physical_frame_boundary or self.physical_frame_boundary
+        ),
+    )
@@ -15,6 +15,7 @@
 from unittest import mock
 
 from absl.testing import absltest
+from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.env import representation_utils
 import numpy as np
@@ -86,6 +87,41 @@ class InterfaceTest(absltest.TestCase):
         states[5],
     )
 
+  @mock.patch.object(adb_utils, "get_orientation", autospec=True)
+  @mock.patch.object(adb_utils, "get_device_state", autospec=True)
+  def test_get_screen_geometry_uses_one_query(
+      self, mock_get_device_state, mock_get_orientation
+  ):
+    mock_get_device_state.return_value = adb_utils.DeviceState(
+        orientation=1,
+        logical_screen_size=(200, 100),
+        physical_frame_boundary=(0, 0, 100, 200),
+    )
+    env = interface.AsyncAndroidEnv(mock.MagicMock())
+
+    geometry = env.get_screen_geometry()
+
+    self.assertEqual(geometry.orientation, 1)
+    self.assertEqual(geometry.logical_screen_size, (200, 100))
+    self.assertEqual(geometry.physical_frame_boundary, (0, 0, 100, 200))
+    mock_get_device_state.assert_called_once()
+    mock_get_orientation.assert_not_called()
+
+  @mock.patch.object(adb_utils, "get_orientation", autospec=True)
+  @mock.patch.object(adb_utils, "get_device_state", autospec=True)
+  def test_get_screen_geometry_falls_back_for_missing_fields(
+      self, mock_get_device_state, mock_get_orientation
+  ):
+    mock_get_device_state.return_value = adb_utils.DeviceState(
+        logical_screen_size=(100, 200),
+        physical_frame_boundary=(0, 0, 100, 200),
+    )
+    mock_get_orientation.return_value = 0
+    env = interface.AsyncAndroidEnv(mock.MagicMock())
+
+    self.assertEqual(env.get_screen_geometry().orientation, 0)
+    mock_get_orientation.assert_called_once()
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -89,6 +89,32 @@ class EpisodeRunnerTest(absltest.TestCase):
 
     mock_agent.env.reset.assert_called_with(go_home=True)
 
+  def test_step_data_completed_on_flush(self):
+
+    class DeferredDataAgent(FakeEnvironmentInteractingAgent):
+      """Fills in the data of its steps when flushed."""
+
+      def __init__(self, env):
+        super().__init__(env, 'deferred_agent')
+        self.pending = []
+
+      def step(self, goal: str) -> base_agent.AgentInteractionResult:
+        data = {'summary': None}
+        self.pending.append(data)
+        return base_agent.AgentInteractionResult(done=False, data=data)
+
+      def flush(self) -> None:
+        for data in self.pending:
+          data['summary'] = 'done'
+        self.pending = []
+
+    agent = DeferredDataAgent(self.env)
+
+    result = episode_runner.run_episode('test_goal', agent, max_n_steps=2)
+
+    self.assertEqual(result.step_data['summary'], ['done', 'done'])
+    self.assertEqual(result.step_data[constants.STEP_NUMBER], [0, 1])
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -30,9 +30,12 @@ from android_world import constants
 from android_world import episode_runner
 from android_world.agents import base_agent
 from android_world.env import adb_utils
+from android_world.env import emulator_snapshot
 from android_world.env import interface
 from android_world.task_evals import task_eval
 from android_world.task_evals.miniwob import miniwob_base
+from android_world.utils import app_snapshot
+from android_world.utils import file_utils
 from fuzzywuzzy import process
 import numpy as np
 import pandas as pd
@@ -245,7 +248,10 @@ def _run_task(
     task.initialize_task(env)
     _log_and_print('Running task %s with goal "%s"', task.name, task.goal)
     interaction_results = run_episode(task)
-    task_successful = task.is_successful(env)
+    # Validators often probe the same directories repeatedly; serve those
+    # probes from one scan per directory.
+    with file_utils.cached_file_system(env.controller):
+      task_successful = task.is_successful(env)
   except Exception as e:  # pylint: disable=broad-exception-caught
     _log_and_print('%s\nSKIPPING %s.', '~' * 80, task.name)
     logging.exception(
@@ -326,6 +332,7 @@ def _run_task_suite(
     return_full_episode_data: bool = False,
     process_episodes_fn=None,
     check_episode_fn: Callable[[dict[str, Any]], bool] | None = None,
+    device_resetter: emulator_snapshot.DeviceResetter | None = None,
 ) -> list[dict[str, Any]]:
   """Runs e2e system on suite.
 
@@ -341,6 +348,8 @@ def _run_task_suite(
     process_episodes_fn: The function to process episode data. Usually to
       compute metrics. Deafaults to process_episodes from this file.
     check_episode_fn: The function to check episode data.
+    device_resetter: If set, resets the device before the first instance of
+      each task that is run.
 
   Returns:
     Metadata for each episode, including the scripted reward.
@@ -368,9 +377,13 @@ def _run_task_suite(
   episodes_metadata: list[dict[str, Any]] = []
   full_episode_data = []
   correct, total = 0, 0
+  restore_stats = app_snapshot.get_restore_stats(env.controller)
+  num_restores = restore_stats.num_restores
+  num_restores_skipped = restore_stats.num_restores_skipped
   for name, instances in suite.items():
     msg = 'Running task: ' + name
     _log_and_print(msg + '\n' + '=' * len(msg))
+    needs_reset = device_resetter is not None
 
     for i, instance in enumerate(instances):
       instance_name = (
@@ -391,6 +404,10 @@ def _run_task_suite(
         _log_and_print('Skipping already processed task %s', instance_name)
         continue
 
+      if needs_reset:
+        mode = device_resetter.reset(instance.app_names)
+        _log_and_print('Reset device using %s reset.', mode.value)
+        needs_reset = False
       episode = _run_task(instance, run_episode, env, demo_mode=demo_mode)
       if (
           episode.get(constants.EpisodeConstants.EXCEPTION_INFO) is None
@@ -417,6 +434,17 @@ def _run_task_suite(
         _update_scoreboard(correct, total, env.controller)
     print()
 
+  _log_and_print(
+      'App snapshot restores: %d performed, %d skipped as unchanged.',
+      restore_stats.num_restores - num_restores,
+      restore_stats.num_restores_skipped - num_restores_skipped,
+  )
+  if device_resetter is not None:
+    _log_and_print(
+        'Device resets: %d from emulator snapshot, %d per-app.',
+        device_resetter.stats.num_snapshot_resets,
+        device_resetter.stats.num_app_resets,
+    )
   return full_episode_data if return_full_episode_data else episodes_metadata
 
 
@@ -428,6 +456,7 @@ def run(
     return_full_episode_data: bool = False,
     process_episodes_fn=None,
     check_episode_fn: Callable[[dict[str, Any]], bool] | None = None,
+    device_resetter: emulator_snapshot.DeviceResetter | None = None,
 ) -> list[dict[str, Any]]:
   """Create suite and runs eval suite.
 
@@ -445,6 +474,8 @@ def run(
     process_episodes_fn: The function to process episode data. Usually to
       compute metrics. Deafaults to process_episodes from this file.
     check_episode_fn: The function to check episode data.
+    device_resetter: If set, resets the device before the first instance of
+      each task that is run, e.g. by loading an emulator snapshot.
 
   Returns:
     Step-by-step data from each episode.
@@ -483,6 +514,7 @@ def run(
       return_full_episode_data=return_full_episode_data,
       process_episodes_fn=process_episodes_fn,
       check_episode_fn=check_episode_fn,
+      device_resetter=device_resetter,
   )
 
   return results
@@ -27,6 +27,7 @@ from android_world import registry
 from android_world import suite_utils
 from android_world.agents import base_agent
 from android_world.env import adb_utils
+from android_world.env import emulator_snapshot
 from android_world.env import interface
 from android_world.utils import test_utils
 import dm_env
@@ -445,6 +446,38 @@ class RunTaskSuiteTest(absltest.TestCase):
 
     self.assertTaskResults(result)
 
+  @mock.patch.object(interface, 'AsyncAndroidEnv')
+  def test_run_task_suite_resets_device_once_per_task(self, mock_env):
+    mock_run_e2e = mock.MagicMock(
+        return_value=episode_runner.EpisodeResult(True, {'step_number': [0]})
+    )
+    resetter = mock.MagicMock()
+    resetter.reset.return_value = emulator_snapshot.ResetMode.APP
+    resetter.stats = emulator_snapshot.ResetStats(num_app_resets=2)
+    suite = suite_utils.Suite(
+        Task1=[
+            test_utils.FakeCurrentStateEval(
+                test_utils.FakeCurrentStateEval.generate_random_params()
+            ),
+            test_utils.FakeCurrentStateEval(
+                test_utils.FakeCurrentStateEval.generate_random_params()
+            ),
+        ],
+        Task2=[
+            test_utils.FakeAdbEval(
+                test_utils.FakeAdbEval.generate_random_params()
+            )
+        ],
+    )
+    suite.suite_family = 'android'
+
+    suite_utils._run_task_suite(
+        suite, mock_run_e2e, mock_env, device_resetter=resetter
+    )
+
+    self.assertEqual(resetter.reset.call_count, 2)
+    self.assertEqual(mock_run_e2e.call_count, 3)
+
   @mock.patch.object(time, 'sleep', autospec=True)
   @mock.patch.object(interface, 'AsyncAndroidEnv')
   @mock.patch.object(adb_utils, 'send_android_intent')
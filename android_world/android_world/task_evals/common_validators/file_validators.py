@@ -16,12 +16,10 @@
 
 from typing import Any
 from absl import logging
-from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.task_evals import task_eval
 from android_world.task_evals.utils import user_data_generation
 from android_world.utils import file_utils
-from android_world.utils import fuzzy_match_lib
 
 
 class MoveFile(task_eval.TaskEval):
@@ -209,18 +207,11 @@ class CreateFile(task_eval.TaskEval):
       return 0.0
 
     # Check the contents of the new file
-    res = adb_utils.issue_generic_request(
-        [
-            "shell",
-            "cat",
-            file_utils.convert_to_posix_path(self.data_directory, file_name),
-        ],
+    if not file_utils.check_file_content(
+        file_utils.convert_to_posix_path(self.data_directory, file_name),
+        self.params["text"],
         env.controller,
-    )
-    file_contents = res.generic.output.decode().replace("\r", "").strip()
-    match = fuzzy_match_lib.fuzzy_match(file_contents, self.params["text"])
-    if not match:
-      logging.info("%s does not match %s", file_contents, self.params["text"])
+    ):
       return 0.0
 
     return 1.0
@@ -24,6 +24,7 @@ from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.env import representation_utils
 from android_world.task_evals import task_eval
+from android_world.utils import wait_utils
 
 
 def check_if_dialer_with_phone_number(
@@ -54,6 +55,16 @@ def check_if_dialer_with_phone_number(
   return False
 
 
+# Fixed sleep previously used to let a call start before acting on it.
+_CALL_START_SLEEP_SECS = 5.0
+
+
+def wait_for_call_to_start(env: env_interface.AndroidEnvInterface) -> None:
+  """Waits until an incoming or placed call is ringing or connected."""
+  result = adb_utils.wait_for_call_state(env, ("RINGING", "OFFHOOK"))
+  wait_utils.report_wait(result, "call to start", _CALL_START_SLEEP_SECS)
+
+
 def clear_phone_state(env: env_interface.AndroidEnvInterface) -> None:
   """Clears phone log and ends any active call."""
   adb_utils.end_call_if_active(env)
@@ -86,9 +97,10 @@ class MakeCall(task_eval.TaskEval):
     super().__init__(params)
     self.phone_number = params["phone_number"]
 
-  def _called_correct_number(self, env: interface.AsyncEnv) -> bool:
+  def _called_correct_number(
+      self, env: interface.AsyncEnv, current_activity: str
+  ) -> bool:
     ui_elements = env.get_state().ui_elements
-    current_activity = adb_utils.get_current_activity(env.controller)[0]
     return check_if_dialer_with_phone_number(
         expected_number=self.phone_number,
         ui_elements=ui_elements,
@@ -102,11 +114,15 @@ class MakeCall(task_eval.TaskEval):
 
   def is_successful(self, env: interface.AsyncEnv) -> float:
     super().is_successful(env)
-    call_state = adb_utils.get_call_state(env.controller)
-    if call_state != "OFFHOOK":
-      logging.info("Not dialed. Call state: %s", call_state)
+    device_state = adb_utils.get_device_state(
+        env.controller, fields=("call_state", "current_activity")
+    )
+    if device_state.call_state != "OFFHOOK":
+      logging.info("Not dialed. Call state: %s", device_state.call_state)
       return 0.0
-    if not self._called_correct_number(env):
+    if not self._called_correct_number(
+        env, device_state.current_activity or ""
+    ):
       logging.info("Dialed a number, but not correct number")
       return 0.0
     return 1.0
@@ -14,6 +14,7 @@
 
 from unittest import mock
 from absl.testing import absltest
+from android_world.env import adb_utils
 from android_world.task_evals.common_validators import phone_validators
 from android_world.utils import test_utils
 
@@ -21,7 +22,9 @@ from android_world.utils import test_utils
 class TestMakePhoneCall(test_utils.AdbEvalTestBase):
 
   def test_is_successful_offhook(self):
-    self.mock_get_call_state.return_value = 'OFFHOOK'
+    self.mock_get_device_state.return_value = adb_utils.DeviceState(
+        call_state='OFFHOOK'
+    )
     self.mock_dialer_with_phone_number.return_value = True
 
     env = mock.MagicMock()
@@ -31,7 +34,9 @@ class TestMakePhoneCall(test_utils.AdbEvalTestBase):
     self.assertEqual(test_utils.perform_task(task, env), 1)
 
   def test_is_successful_not_offhook(self):
-    self.mock_get_call_state.return_value = 'IDLE'
+    self.mock_get_device_state.return_value = adb_utils.DeviceState(
+        call_state='IDLE'
+    )
     self.mock_dialer_with_phone_number.return_value = True
 
     env = mock.MagicMock()
@@ -41,7 +46,9 @@ class TestMakePhoneCall(test_utils.AdbEvalTestBase):
     self.assertEqual(test_utils.perform_task(task, env), 0)
 
   def test_is_successful_wrong_number(self):
-    self.mock_get_call_state.return_value = 'OFFHOOK'
+    self.mock_get_device_state.return_value = adb_utils.DeviceState(
+        call_state='OFFHOOK'
+    )
     self.mock_dialer_with_phone_number.return_value = False
 
     env = mock.MagicMock()
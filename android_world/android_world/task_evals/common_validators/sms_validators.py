@@ -14,8 +14,10 @@
 
 """Logic for validating an SMS has been sent."""
 
+from collections.abc import Iterable, Iterator, Sequence
 import random
-import time
+import shlex
+from typing import Optional
 
 from absl import logging
 from android_env import env_interface
@@ -25,6 +27,7 @@ from android_world.env import interface
 from android_world.task_evals import task_eval
 from android_world.task_evals.utils import user_data_generation
 from android_world.utils import fuzzy_match_lib
+from android_world.utils import wait_utils
 
 
 def parse_message(row: str) -> dict[str, str]:
@@ -75,23 +78,165 @@ def parse_message(row: str) -> dict[str, str]:
   return parsed_dict
 
 
+def _iter_messages_from_response(
+    response: adb_pb2.AdbResponse,
+) -> Iterator[str]:
+  """Lazily splits the ADB response of a content query into message rows."""
+  output = response.generic.output.decode()
+  if output.replace("\r", "").startswith("No result found."):
+    return
+  start = 0
+  while True:
+    end = output.find("\nRow:", start)
+    if end == -1:
+      yield output[start:]
+      return
+    yield output[start:end]
+    start = end + 1
+
+
 def _decode_messages_from_response(response: adb_pb2.AdbResponse) -> list[str]:
   """Decodes the ADB response into a list of messages."""
-  if (
-      response.generic.output.decode()
-      .replace("\r", "")
-      .startswith("No result found.")
-  ):
-    return []
-  messages = response.generic.output.split(b"\nRow:")
-  for i, m in enumerate(messages):
-    if i > 0:
-      messages[i] = b"Row:" + m
-  return [m.decode() for m in messages]
+  return list(_iter_messages_from_response(response))
+
+
+# Columns needed to validate a message. `body` goes last since it is the only
+# field that may contain ", ".
+_MESSAGE_PROJECTION = ("address", "date", "body")
+
+
+def build_message_query(
+    box: str,
+    phone_number: Optional[str] = None,
+    since_ms: Optional[int] = None,
+    projection: Optional[Sequence[str]] = _MESSAGE_PROJECTION,
+) -> list[str]:
+  """Builds the adb arguments of an SMS content provider query.
+
+  The filters are evaluated by the provider, so only the matching rows and
+  columns are sent back over adb.
+
+  Args:
+    box: The SMS box to query, e.g. "sent" or "inbox", or "" for all boxes.
+    phone_number: If set, only messages to or from this number are returned.
+      Dashes and spaces in the stored address are ignored, as in `was_sent`,
+      so the provider may return a few extra rows that callers still need to
+      filter out.
+    since_ms: If set, only messages dated at or after this time are returned.
+    projection: The columns to return, or None for all of them.
+
+  Returns:
+    The arguments for `adb_utils.issue_generic_request`.
+  """
+  uri = f"content://sms/{box}" if box else "content://sms"
+  args = ["shell", "content", "query", "--uri", uri]
+  if projection:
+    args += ["--projection", ":".join(projection)]
+  predicates = []
+  if phone_number is not None:
+    digits = [c for c in phone_number if c not in "- "]
+    # LIKE, unlike replace(), is accepted by the provider's strict SQL grammar.
+    pattern = "%".join(digits).replace("'", "''")
+    predicates.append(f"address LIKE '{pattern}'")
+  if since_ms is not None:
+    predicates.append(f"date >= {int(since_ms)}")
+  if predicates:
+    args += ["--where", shlex.quote(" AND ".join(predicates))]
+  return args
+
+
+class MessageRows(Iterable[dict[str, str]]):
+  """Rows of an SMS content query, parsed lazily.
+
+  Rows are only parsed when iterated over, so a caller that stops at the first
+  matching row never parses the rest. Parsed rows are kept, so iterating again
+  during the same validation does not parse or query anything again.
+  """
+
+  def __init__(self, response: adb_pb2.AdbResponse):
+    self._raw_rows = _iter_messages_from_response(response)
+    self._parsed_rows: list[dict[str, str]] = []
+    self.num_parsed = 0
+
+  def __repr__(self) -> str:
+    return f"MessageRows(parsed={self._parsed_rows!r})"
+
+  def __iter__(self) -> Iterator[dict[str, str]]:
+    i = 0
+    while True:
+      if i == len(self._parsed_rows):
+        raw_row = next(self._raw_rows, None)
+        if raw_row is None:
+          return
+        self._parsed_rows.append(parse_message(raw_row))
+        self.num_parsed += 1
+      yield self._parsed_rows[i]
+      i += 1
+
+
+def query_messages(
+    env: env_interface.AndroidEnvInterface,
+    box: str = "sent",
+    phone_number: Optional[str] = None,
+    since_ms: Optional[int] = None,
+) -> MessageRows:
+  """Queries SMS messages, filtering them on the device.
+
+  Args:
+    env: The Android environment interface.
+    box: The SMS box to query, e.g. "sent" or "inbox".
+    phone_number: See `build_message_query`.
+    since_ms: See `build_message_query`.
+
+  Returns:
+    The matching messages, parsed lazily.
+  """
+  response = adb_utils.issue_generic_request(
+      build_message_query(box, phone_number, since_ms), env
+  )
+  return MessageRows(response)
+
+
+# Upper bound on waiting for the messaging state to settle. This is also the
+# fixed sleep that was previously used instead.
+_SETTLE_TIMEOUT_SEC = 5.0
+
+
+def _count_messages(env: env_interface.AndroidEnvInterface, box: str) -> int:
+  response = adb_utils.issue_generic_request(
+      build_message_query(box, projection=("_id",)), env
+  )
+  return sum(1 for _ in _iter_messages_from_response(response))
+
+
+def wait_for_no_messages(
+    env: env_interface.AndroidEnvInterface,
+    box: str,
+    timeout_sec: float = _SETTLE_TIMEOUT_SEC,
+) -> wait_utils.WaitResult[int]:
+  """Polls the SMS provider with backoff until a box is empty.
+
+  Args:
+    env: The Android environment interface.
+    box: The SMS box, e.g. "outbox", or "" for all boxes.
+    timeout_sec: Maximum time to wait, in seconds.
+
+  Returns:
+    The last number of messages in the box and whether it reached zero.
+  """
+  result = wait_utils.wait_until(
+      lambda: _count_messages(env, box),
+      lambda num_messages: num_messages == 0,
+      timeout_sec=timeout_sec,
+  )
+  wait_utils.report_wait(
+      result, f"SMS box '{box or 'all'}' to empty", _SETTLE_TIMEOUT_SEC
+  )
+  return result
 
 
 def was_sent(
-    messages: list[str],
+    messages: Iterable[str | dict[str, str]],
     phone_number: str,
     body: str,
     current_time_ms: int,
@@ -110,8 +255,8 @@ def was_sent(
     current time is within 5 minutes of `date=1693421073675`
 
   Args:
-    messages: A list of message records returned by ADB shell content query,
-      each as a string.
+    messages: Message records returned by ADB shell content query, each as a
+      string or already parsed, e.g. from `query_messages`.
     phone_number: The target phone number or address to check the message
       against.
     body: The message body text to check for.
@@ -124,7 +269,7 @@ def was_sent(
   n_minutes_ms = time_mins * 60 * 1000
   for message in messages:
     # Extract the relevant fields from the ADB query result
-    fields = parse_message(message)
+    fields = message if isinstance(message, dict) else parse_message(message)
     try:
       # Number can contain spaces and dashes, remove before comparing.
       msg_number = fields["address"].replace("-", "").replace(" ", "")
@@ -136,15 +281,13 @@ def was_sent(
           f" {message}"
       ) from key_error
 
-    if (
-        msg_number == phone_number
-        and fuzzy_match_lib.fuzzy_match(msg_body, body)
-        and (current_time_ms - msg_date <= n_minutes_ms)
-    ):
-      return True
-    elif msg_number == phone_number and fuzzy_match_lib.fuzzy_match(
+    if msg_number != phone_number or not fuzzy_match_lib.fuzzy_match(
         msg_body, body
     ):
+      continue
+    if current_time_ms - msg_date <= n_minutes_ms:
+      return True
+    else:
       logging.info(
           "The message was sent, but was sent over %i ago.", n_minutes_ms
       )
@@ -173,6 +316,10 @@ def sms_are_equal(message1: str, message2: str) -> bool:
   )
 
 
+# How recently a message must have been sent to count, in minutes.
+_SENT_WINDOW_MINS = 5
+
+
 def clear_sms_and_threads(env: env_interface.AndroidEnvInterface) -> None:
   """Removes all messages from UI by clearing the sms and threads tables."""
   db_path = "/data/data/com.android.providers.telephony/databases/mmssms.db"
@@ -209,8 +356,24 @@ class SimpleSMSSendSms(task_eval.TaskEval):
   messages = user_data_generation.RANDOM_SENTENCES
 
   def get_sent_messages(
-      self, env: env_interface.AndroidEnvInterface
-  ) -> list[str]:
+      self,
+      env: env_interface.AndroidEnvInterface,
+      phone_number: Optional[str] = None,
+      since_ms: Optional[int] = None,
+  ) -> list[str] | MessageRows:
+    """Returns the sent messages.
+
+    Args:
+      env: The Android environment interface.
+      phone_number: If set, only messages to this number are queried.
+      since_ms: If set, only messages sent at or after this time are queried.
+
+    Returns:
+      All sent messages as strings if no filter is given. Otherwise the
+      messages matching the filters on the device, parsed lazily.
+    """
+    if phone_number is not None or since_ms is not None:
+      return query_messages(env, "sent", phone_number, since_ms)
     response = adb_utils.issue_generic_request(
         "shell content query --uri content://sms/sent".split(), env
     )
@@ -237,14 +400,17 @@ class SimpleSMSSendSms(task_eval.TaskEval):
     clear_sms_and_threads(env.controller)
     android_time = self.get_android_time(env.controller)
 
-    messages = self.get_sent_messages(env.controller)
-    time.sleep(5)
-    logging.info("During initialize_task, messages: %s", messages)
+    messages = self.get_sent_messages(
+        env.controller,
+        phone_number=self.params["number"],
+        since_ms=android_time - _SENT_WINDOW_MINS * 60 * 1000,
+    )
     if was_sent(
         messages,
         phone_number=self.params["number"],
         body=self.params["message"],
         current_time_ms=android_time,
+        time_mins=_SENT_WINDOW_MINS,
     ):
       raise ValueError(
           "Message has already been sent, evaluator is not currently able to"
@@ -254,15 +420,22 @@ class SimpleSMSSendSms(task_eval.TaskEval):
 
   def is_successful(self, env: interface.AsyncEnv) -> float:
     super().is_successful(env)
-    messages = self.get_sent_messages(env.controller)
-    time.sleep(5)
-    logging.info("During is_successful, messages: %s", messages)
+    android_time = self.get_android_time(env.controller)
+    # Let messages that are still being sent reach the sent box.
+    wait_for_no_messages(env.controller, "outbox")
+    messages = self.get_sent_messages(
+        env.controller,
+        phone_number=self.params["number"],
+        since_ms=android_time - _SENT_WINDOW_MINS * 60 * 1000,
+    )
     sms_was_sent = was_sent(
         messages,
         phone_number=self.params["number"],
         body=self.params["message"],
-        current_time_ms=self.get_android_time(env.controller),
+        current_time_ms=android_time,
+        time_mins=_SENT_WINDOW_MINS,
     )
+    logging.info("During is_successful, messages: %s", messages)
     in_correct_app = (
         adb_utils.extract_package_name(
             adb_utils.get_current_activity(env.controller)[0]
@@ -286,10 +459,18 @@ class SimpleSMSSendSms(task_eval.TaskEval):
     }
 
 
-def _check_if_stuck_at_sending(env: interface.AsyncEnv) -> bool:
-  """Checks if the app is stuck at the sending screen."""
-  state = env.get_state()
+def _is_sending(state: interface.State) -> bool:
   for element in state.ui_elements:
     if element.text is not None and element.text.startswith("Sending"):
       return True
   return False
+
+
+def _check_if_stuck_at_sending(env: interface.AsyncEnv) -> bool:
+  """Checks if the app is stuck at the sending screen."""
+  result = wait_utils.wait_until(
+      env.get_state,
+      lambda state: not _is_sending(state),
+      timeout_sec=_SETTLE_TIMEOUT_SEC,
+  )
+  return not result.satisfied
@@ -104,6 +104,112 @@ class TestMessageWasSent(absltest.TestCase):
     )
 
 
+def _recorded_sent_messages(
+    num_messages: int, current_time_ms: int
+) -> adb_pb2.AdbResponse:
+  """Returns `content query` output for many sent messages, newest first."""
+  rows = []
+  for i in range(num_messages):
+    rows.append(
+        f'Row: {i} _id={num_messages - i}, thread_id={i % 40},'
+        f' address=+1 555-01{i % 100:02d}, person=NULL,'
+        f' date={current_time_ms - i * 60 * 1000}, date_sent=0,'
+        ' protocol=NULL, read=1, status=-1, type=2, reply_path_present=NULL,'
+        f' subject=NULL, body=Message number {i}, with a comma,'
+        ' service_center=NULL, locked=0, sub_id=1, error_code=-1,'
+        ' creator=com.simplemobiletools.smsmessenger, seen=1'
+    )
+  return adb_pb2.AdbResponse(
+      status=adb_pb2.AdbResponse.Status.OK,
+      generic=adb_pb2.AdbResponse.GenericResponse(
+          output='\n'.join(rows).encode()
+      ),
+  )
+
+
+class TestQueryMessages(absltest.TestCase):
+
+  def test_build_message_query(self):
+    self.assertEqual(
+        sms_validators.build_message_query('inbox', projection=None),
+        ['shell', 'content', 'query', '--uri', 'content://sms/inbox'],
+    )
+    self.assertEqual(
+        sms_validators.build_message_query(
+            'sent', phone_number='+1 555-0123', since_ms=1000
+        ),
+        [
+            'shell',
+            'content',
+            'query',
+            '--uri',
+            'content://sms/sent',
+            '--projection',
+            'address:date:body',
+            '--where',
+            "'address LIKE '\"'\"'+%1%5%5%5%0%1%2%3'\"'\"' AND date >= 1000'",
+        ],
+    )
+
+  def test_rows_are_parsed_lazily_and_cached(self):
+    current_time = int(time.time() * 1000)
+    rows = sms_validators.MessageRows(
+        _recorded_sent_messages(5000, current_time)
+    )
+
+    self.assertTrue(
+        sms_validators.was_sent(
+            rows, '+15550100', 'Message number 0, with a comma', current_time
+        )
+    )
+    self.assertEqual(rows.num_parsed, 1)
+    self.assertLen(list(rows), 5000)
+    self.assertLen(list(rows), 5000)
+    self.assertEqual(rows.num_parsed, 5000)
+
+  def test_matches_unfiltered_validation(self):
+    current_time = int(time.time() * 1000)
+    response = _recorded_sent_messages(5000, current_time)
+    messages = sms_validators._decode_messages_from_response(response)
+    rows = sms_validators.MessageRows(response)
+
+    for number, body in [
+        ('+15550103', 'Message number 3, with a comma'),
+        ('+15550103', 'Message number 4, with a comma'),
+        ('+15550199', 'Message number 4999, with a comma'),
+        ('+15550107', 'Message number 7, with a comma'),
+    ]:
+      self.assertEqual(
+          sms_validators.was_sent(rows, number, body, current_time),
+          sms_validators.was_sent(messages, number, body, current_time),
+      )
+
+  def test_no_result(self):
+    response = adb_pb2.AdbResponse()
+    response.generic.output = b'No result found.\r\n'
+
+    self.assertEmpty(list(sms_validators.MessageRows(response)))
+
+
+class TestWaitForNoMessages(absltest.TestCase):
+
+  @mock.patch.object(time, 'sleep', autospec=True)
+  @mock.patch.object(adb_utils, 'issue_generic_request', autospec=True)
+  def test_polls_until_box_is_empty(self, mock_issue_request, unused_sleep):
+    pending = adb_pb2.AdbResponse()
+    pending.generic.output = b'Row: 0 _id=1\r\n'
+    empty = adb_pb2.AdbResponse()
+    empty.generic.output = b'No result found.\r\n'
+    mock_issue_request.side_effect = [pending, pending, empty]
+
+    result = sms_validators.wait_for_no_messages(mock.MagicMock(), 'outbox')
+
+    self.assertTrue(result.satisfied)
+    self.assertEqual(result.value, 0)
+    self.assertEqual(result.num_polls, 3)
+    self.assertIn('content://sms/outbox', mock_issue_request.call_args.args[0])
+
+
 class TestMessagesSendTextMessage(test_utils.AdbEvalTestBase):
 
   def setUp(self):
@@ -122,6 +228,10 @@ class TestMessagesSendTextMessage(test_utils.AdbEvalTestBase):
         str(int(time.time()))
     ).encode()
 
+    # From content query on an empty box.
+    mock_response_empty = adb_pb2.AdbResponse()
+    mock_response_empty.generic.output = b'No result found.'
+
     # Make stale message.
     one_day_s = 24 * 60 * 60
     mock_response_sms0 = adb_pb2.AdbResponse()
@@ -146,8 +256,9 @@ class TestMessagesSendTextMessage(test_utils.AdbEvalTestBase):
     self.mock_issue_generic_request.side_effect = [
         mock_response_time,
         mock_response_sms0,
-        mock_response_sms1,
         mock_response_time,
+        mock_response_empty,
+        mock_response_sms1,
     ]
     test_utils.log_mock_calls(self.mock_issue_generic_request)
 
@@ -178,20 +289,9 @@ class TestMessagesSendTextMessage(test_utils.AdbEvalTestBase):
         ).encode()
     )
 
-    # Successful message.
-    mock_response_sms1 = adb_pb2.AdbResponse()
-    date1_ms = str(int(time.time() * 1000))
-    mock_response_sms1.generic.output = (
-        'Row: 0, address=1234567890, body=Hello World, service_center=NULL,'
-        ' date={}'.format(
-            date1_ms
-        ).encode()
-    )
-
     self.mock_issue_generic_request.side_effect = [
         mock_response_time,
         mock_response_sms0,
-        mock_response_sms1,
     ]
 
     env = mock.MagicMock()
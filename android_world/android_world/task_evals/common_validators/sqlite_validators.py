@@ -22,6 +22,7 @@ from typing import Type
 from absl import logging
 from android_world.env import interface
 from android_world.task_evals import task_eval
+from android_world.task_evals.utils import row_diff
 from android_world.task_evals.utils import sqlite_schema_utils
 from android_world.task_evals.utils import sqlite_utils
 from android_world.utils import fuzzy_match_lib
@@ -42,13 +43,12 @@ def verify_playlist(
   Returns:
     True if the actual playlist matches the expected criteria, False otherwise.
   """
-  total = sum(
-      1
-      for actual_item in device_playlist_rows
-      if fuzzy_match_lib.fuzzy_match(
-          actual_item.playlist_name, candidate_playlist_name, ignore_case=True
-      )
+  name_matches = fuzzy_match_lib.fuzzy_match_many(
+      [actual_item.playlist_name for actual_item in device_playlist_rows],
+      candidate_playlist_name,
+      ignore_case=True,
   )
+  total = sum(name_matches)
 
   if total != len(candidate_files):
     return False
@@ -56,12 +56,10 @@ def verify_playlist(
   matched_files = 0
   for index, expected_file in enumerate(candidate_files):
     if any(
-        fuzzy_match_lib.fuzzy_match(
-            actual_item.playlist_name, candidate_playlist_name, ignore_case=True
-        )
+        name_match
         and actual_item.media_file_name == expected_file
         and (actual_item.order_in_playlist == index)
-        for actual_item in device_playlist_rows
+        for actual_item, name_match in zip(device_playlist_rows, name_matches)
     ):
       matched_files += 1
     else:
@@ -93,25 +91,38 @@ def validate_rows_removal_integrity(
     maintained; False if any specified rows are not removed, if any
     non-specified rows are missing, or if new rows have been added.
   """
+  before_ids = {getattr(row, id_name) for row in before}
   for row_id in ids:
-    if not any(row for row in before if getattr(row, id_name) == row_id):
+    if row_id not in before_ids:
       raise ValueError(f"row ID {row_id} not present in before.")
 
-  # Validate the removal and intactness of other rows
-  for row in before:
-    # If the row ID is in the list of removed row IDs
-    if getattr(row, id_name) in ids:
-      if row in after:
+  removed_ids = set(ids)
+  before_index = row_diff.RowIndex(before)
+  after_index = row_diff.RowIndex(after)
+
+  def is_valid() -> bool:
+    # Validate the removal and intactness of other rows
+    for row in before:
+      # If the row ID is in the list of removed row IDs
+      if getattr(row, id_name) in removed_ids:
+        if row in after_index:
+          return False
+      elif row not in after_index:
+        # Make sure we didn't remove other rows.
         return False
-    elif row not in after:
-      # Make sure we didn't remove other rows.
-      return False
 
-  # Check that no new unexpected rows have been added
-  for row in after:
-    if row not in before:
-      return False
+    # Check that no new unexpected rows have been added
+    for row in after:
+      if row not in before_index:
+        return False
+    return True
 
+  if not is_valid():
+    logging.warning(
+        "Rows were not removed as expected:\n%s",
+        row_diff.diff_rows(before, after, id_name),
+    )
+    return False
   return True
 
 
@@ -162,9 +173,19 @@ def validate_rows_addition_integrity(
           return False
     return True
 
+  # Rows can only match a reference row if their exact fields are equal, so
+  # only rows sharing the reference row's exact fields are fuzzy matched.
+  exact_fields = [
+      field for field in compare_fields if field not in free_form_fields
+  ]
+  after_by_exact_fields = row_diff.RowIndex(after, exact_fields)
+
   # Check if the added rows are present in the 'after' state
   for reference_row in reference_rows:
-    if not any(db_row_matches_reference(reference_row, row) for row in after):
+    if not any(
+        db_row_matches_reference(reference_row, row)
+        for row in after_by_exact_fields.candidates(reference_row)
+    ):
       logging.warning(
           "Expected row %s not found in the 'after' state.", reference_row
       )
@@ -181,8 +202,9 @@ def validate_rows_addition_integrity(
     return False
 
   # Validate that no other rows were altered or removed during the addition
+  after_index = row_diff.RowIndex(after)
   for row in before:
-    if row not in after:
+    if row not in after_index:
       logging.warning(
           "row %s from 'before' state missing or altered in the 'after' state.",
           row,
@@ -206,6 +228,10 @@ class SQLiteApp(task_eval.TaskEval, abc.ABC):
   table_name: str
   row_type: Type[sqlite_schema_utils.SQLiteRow]
 
+  # Session on the app's database while the task is being initialized. Reads
+  # and writes go to it, and it is pushed to the device once at the end.
+  _db: Optional[sqlite_utils.RemoteDatabase] = None
+
   def list_rows(
       self,
       env: interface.AsyncEnv,
@@ -221,6 +247,8 @@ class SQLiteApp(task_eval.TaskEval, abc.ABC):
         A list of row objects, each representing a row from the specified table
         in the database.
     """
+    if self._db is not None:
+      return self._db.query(self.table_name, self.row_type)
     return sqlite_utils.get_rows_from_remote_device(
         self.table_name, self.db_path, self.row_type, env, timeout_sec
     )
@@ -231,6 +259,9 @@ class SQLiteApp(task_eval.TaskEval, abc.ABC):
       env: interface.AsyncEnv,
       timeout_sec: Optional[float] = None,
   ) -> None:
+    if self._db is not None:
+      self._db.insert_rows(rows, self.db_key, self.table_name)
+      return
     sqlite_utils.insert_rows_to_remote_db(
         rows,
         self.db_key,
@@ -243,6 +274,16 @@ class SQLiteApp(task_eval.TaskEval, abc.ABC):
 
   def _clear_db(self, env: interface.AsyncEnv) -> None:
     """Clears the app's SQLite database."""
+    if self._db is not None:
+      if not self._db.ensure_tables_exist(
+          [self.table_name], self.app_name_with_db
+      ):
+        raise RuntimeError(
+            "After clearing the old SQLite database, a new empty database was"
+            " not created."
+        )
+      self._db.delete_all_rows(self.table_name)
+      return
     sqlite_utils.delete_all_rows_from_table(
         self.table_name, self.db_path, env, self.app_name_with_db
     )
@@ -254,14 +295,24 @@ class SQLiteApp(task_eval.TaskEval, abc.ABC):
           " not created."
       ) from e
 
-  def initialize_task(self, env: interface.AsyncEnv) -> None:
-    """Initializes the task environment."""
-    self._clear_db(env)  # In case the previous run crashed.
-    super().initialize_task(env)
+  def _initialize_rows(self, env: interface.AsyncEnv) -> None:
+    """Clears the database and seeds it with the task's rows."""
     self._clear_db(env)
     if NOISE_ROW_OBJECTS in self.params:
       self.add_rows(self.params[NOISE_ROW_OBJECTS], env)
 
+  def initialize_task(self, env: interface.AsyncEnv) -> None:
+    """Initializes the task environment."""
+    super().initialize_task(env)
+    # Seed the database with a single pull and push.
+    with sqlite_utils.RemoteDatabase(self.db_path, env) as db:
+      self._db = db
+      try:
+        self._initialize_rows(env)
+        db.commit(self.app_name_with_db)
+      finally:
+        self._db = None
+
   def tear_down(self, env: interface.AsyncEnv):
     """Cleans up after task completion."""
     super().tear_down(env)
@@ -277,9 +328,8 @@ class AddMultipleRows(SQLiteApp, abc.ABC):
     super().__init__(params)
     self.before = []
 
-  def initialize_task(self, env: interface.AsyncEnv) -> None:
-    """Initial setup for the task, if necessary."""
-    super().initialize_task(env)
+  def _initialize_rows(self, env: interface.AsyncEnv) -> None:
+    super()._initialize_rows(env)
     self.before = self.list_rows(env)
 
   @abc.abstractmethod
@@ -345,9 +395,8 @@ class DeleteMultipleRows(SQLiteApp, abc.ABC):
           f" expected {self.n_rows + self.n_rows_noise}."
       )
 
-  def initialize_task(self, env: interface.AsyncEnv) -> None:
-    """Initial setup for the task, if necessary."""
-    super().initialize_task(env)
+  def _initialize_rows(self, env: interface.AsyncEnv) -> None:
+    super()._initialize_rows(env)
     n_rows = 0
     if ROW_OBJECTS in self.params:
       self.add_rows(self.params[ROW_OBJECTS], env)
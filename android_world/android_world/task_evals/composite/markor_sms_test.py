@@ -37,6 +37,10 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
     ).start()
 
   def test_MarkorCreateNoteAndSms_is_successful(self):
+    # Create mock adb response for 'cat' command
+    mock_response_cat = adb_pb2.AdbResponse()
+    mock_response_cat.generic.output = b'Hello World'
+
     # From shell date +%s
     mock_response_time = adb_pb2.AdbResponse()
     mock_response_time.generic.output = '{}'.format(
@@ -53,6 +57,10 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
         str(int(time.time()))
     ).encode()
 
+    # From content query on an empty box.
+    mock_response_empty = adb_pb2.AdbResponse()
+    mock_response_empty.generic.output = b'No result found.'
+
     # Make stale message.
     one_day_s = 24 * 60 * 60
     mock_response_sms0 = adb_pb2.AdbResponse()
@@ -78,8 +86,9 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
         mock_response_time,
         mock_response_sms0,
         mock_response_cat,
-        mock_response_sms1,
         mock_response_time,
+        mock_response_empty,
+        mock_response_sms1,
     ]
     test_utils.log_mock_calls(self.mock_issue_generic_request)
 
@@ -97,6 +106,10 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
     self.assertEqual(self.mock_execute_sql_command.call_count, 2)
 
   def test_MarkorCreateNoteAndSms_partial_success(self):
+    # Create mock adb response for 'cat' command
+    mock_response_cat = adb_pb2.AdbResponse()
+    mock_response_cat.generic.output = b'Hello World'
+
     # From shell date +%s
     mock_response_time = adb_pb2.AdbResponse()
     mock_response_time.generic.output = '{}'.format(
@@ -113,6 +126,10 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
         str(int(time.time()))
     ).encode()
 
+    # From content query on an empty box.
+    mock_response_empty = adb_pb2.AdbResponse()
+    mock_response_empty.generic.output = b'No result found.'
+
     # Make stale message.
     one_day_s = 24 * 60 * 60
     mock_response_sms0 = adb_pb2.AdbResponse()
@@ -134,8 +151,9 @@ class TestMarkorCreateNoteAndSms(test_utils.AdbEvalTestBase):
         mock_response_time,
         mock_response_sms0,
         mock_response_cat,
-        mock_response_sms1,
         mock_response_time,
+        mock_response_empty,
+        mock_response_sms1,
     ]
     test_utils.log_mock_calls(self.mock_issue_generic_request)
 
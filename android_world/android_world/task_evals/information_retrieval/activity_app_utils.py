@@ -44,13 +44,19 @@ def setup_task_state(
     exclusion_conditions: list[task_pb2.ExclusionCondition],
     env: interface.AsyncEnv,
 ) -> None:
-  clear_db(env)
   activities = []
   for activity in relevant_state.sports_activities:
     activities.append(_create_activity_from_proto(activity))
   activities += _generate_random_activities(20, exclusion_conditions)
   random.shuffle(activities)
-  _add_activities(activities, env)
+  sqlite_utils.replace_rows_in_remote_db(
+      activities,
+      _PRIMARY_KEY,
+      _TABLE,
+      _DB_PATH,
+      _APP_NAME,
+      env,
+  )
 
 
 def _distance_rounding_error_conversion(value: float) -> float:
@@ -116,20 +122,6 @@ def clear_db(env: interface.AsyncEnv) -> None:
   adb_utils.close_app(_APP_NAME, env.controller)  # Register changes.
 
 
-def _add_activities(
-    rows: list[sqlite_schema_utils.SportsActivity],
-    env: interface.AsyncEnv,
-) -> None:
-  sqlite_utils.insert_rows_to_remote_db(
-      rows,
-      _PRIMARY_KEY,
-      _TABLE,
-      _DB_PATH,
-      _APP_NAME,
-      env,
-  )
-
-
 def list_rows(
     env: interface.AsyncEnv,
 ) -> list[sqlite_schema_utils.SportsActivity]:
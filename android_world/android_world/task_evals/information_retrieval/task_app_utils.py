@@ -43,13 +43,19 @@ def setup_task_state(
     exclusion_conditions: list[task_pb2.ExclusionCondition],
     env: interface.AsyncEnv,
 ) -> None:
-  clear_task_db(env)
   tasks = []
   for task in relevant_state.tasks_app_tasks:
     tasks.append(create_task_from_proto(task))
   tasks += generate_random_tasks(20, exclusion_conditions)
   random.shuffle(tasks)
-  add_tasks(tasks, env)
+  sqlite_utils.replace_rows_in_remote_db(
+      tasks,
+      _PRIMARY_KEY,
+      _TASK_TABLE,
+      _DB_PATH,
+      _APP_NAME,
+      env,
+  )
 
 
 def create_task_from_proto(
@@ -75,6 +75,32 @@ def add_events(
   )
 
 
+def replace_events(
+    events: list[sqlite_schema_utils.CalendarEvent],
+    env: interface.AsyncEnv,
+    timeout_sec: Optional[float] = None,
+) -> None:
+  """Replaces all events in the Android calendar database using ADB.
+
+  Unlike `clear_calendar_db()` followed by `add_events()`, the database is
+  copied from and sent back to the device only once.
+
+  Args:
+      events: The events the calendar should hold.
+      env: The Android environment interface.
+      timeout_sec: A timeout for the ADB operations.
+  """
+  sqlite_utils.replace_rows_in_remote_db(
+      events,
+      DB_KEY,
+      EVENTS_TABLE,
+      DB_PATH,
+      'simple calendar pro',
+      env,
+      timeout_sec,
+  )
+
+
 def add_random_events(env: interface.AsyncEnv, n: int = 75) -> None:
   """Adds random events to calendar to increase task complexity."""
   events = [
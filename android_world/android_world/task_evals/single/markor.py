@@ -30,7 +30,6 @@ from android_world.task_evals.utils import receipt_generator
 from android_world.task_evals.utils import user_data_generation
 from android_world.utils import datetime_utils
 from android_world.utils import file_utils
-from android_world.utils import fuzzy_match_lib
 
 
 @dataclasses.dataclass(frozen=True)
@@ -223,19 +222,6 @@ class MarkorEditNote(Markor):
 
   def is_successful(self, env: interface.AsyncEnv) -> float:
     super().is_successful(env)
-    res = adb_utils.issue_generic_request(
-        [
-            "shell",
-            "cat",
-            file_utils.convert_to_posix_path(
-                device_constants.MARKOR_DATA, self.params["file_name"]
-            ),
-        ],
-        env.controller,
-    )
-    file_contents = res.generic.output.decode().replace("\r", "").strip()
-    logging.info("Retrieved file contents: %s", file_contents)
-
     if self.params["edit_type"] == "header":
       expected_content = self.params["header"] + "\n" + self.original_content
     elif self.params["edit_type"] == "footer":
@@ -243,13 +229,14 @@ class MarkorEditNote(Markor):
     else:
       expected_content = self.params["replace_text"]
 
-    is_match = fuzzy_match_lib.fuzzy_match(file_contents, expected_content)
-    logging.info(
-        "Is content match: %s.\nFound: %s\nExpected: %s",
-        is_match,
-        file_contents,
+    is_match = file_utils.check_file_content(
+        file_utils.convert_to_posix_path(
+            device_constants.MARKOR_DATA, self.params["file_name"]
+        ),
         expected_content,
+        env.controller,
     )
+    logging.info("Is content match: %s.", is_match)
 
     return 1.0 if is_match else 0.0
 
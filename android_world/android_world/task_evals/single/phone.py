@@ -15,7 +15,6 @@
 """Tasks for making and receiving phone calls."""
 
 import random
-import time
 from typing import Any
 from android_world.env import adb_utils
 from android_world.env import device_constants
@@ -96,7 +95,7 @@ class PhoneReturnMissedCall(phone_validators.MakeCall):
   def initialize_task(self, env: interface.AsyncEnv):
     super().initialize_task(env)
     adb_utils.call_emulator(env.controller, self.phone_number)
-    time.sleep(5)
+    phone_validators.wait_for_call_to_start(env.controller)
     adb_utils.end_call_if_active(env.controller)
 
 
@@ -115,7 +114,7 @@ class PhoneRedialNumber(phone_validators.MakeCall):
   def initialize_task(self, env: interface.AsyncEnv):
     super().initialize_task(env)
     adb_utils.call_phone_number(env.controller, self.phone_number)
-    time.sleep(5)
+    phone_validators.wait_for_call_to_start(env.controller)
     adb_utils.end_call_if_active(env.controller)
 
 
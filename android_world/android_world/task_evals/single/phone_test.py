@@ -15,6 +15,7 @@
 import random
 from unittest import mock
 from absl.testing import absltest
+from android_world.env import adb_utils
 from android_world.task_evals.single import phone
 from android_world.task_evals.utils import user_data_generation
 from android_world.utils import test_utils
@@ -38,7 +39,9 @@ class MarkorPhoneTest(test_utils.AdbEvalTestBase):
     self.assertEqual(result, expected_result)
 
   def test_markor_phone_successful(self):
-    self.mock_get_call_state.return_value = "OFFHOOK"
+    self.mock_get_device_state.return_value = adb_utils.DeviceState(
+        call_state="OFFHOOK"
+    )
     self.mock_dialer_with_phone_number.return_value = True
     params = {"name": "apt1", "phone_number": "123"}
     task = phone.MarkorCallApartment(params)
@@ -99,11 +99,8 @@ def _get_playing_queue(env: interface.AsyncEnv) -> list[str]:
 
 def _clear_playlist_dbs(env: interface.AsyncEnv) -> None:
   """Clears all DBs related to playlists."""
-  sqlite_utils.delete_all_rows_from_table(
-      'PlaylistEntity', _PLAYLIST_DB_PATH, env, _APP_NAME
-  )
-  sqlite_utils.delete_all_rows_from_table(
-      'SongEntity', _PLAYLIST_DB_PATH, env, _APP_NAME
+  sqlite_utils.delete_all_rows_from_tables(
+      ['PlaylistEntity', 'SongEntity'], _PLAYLIST_DB_PATH, env, _APP_NAME
   )
 
 
@@ -50,7 +50,7 @@ class SimpleSmsSendAfterCall(sms_validators.SimpleSMSSendSms):
     super().initialize_task(env)
     phone_validators.clear_phone_state(env.controller)
     adb_utils.call_emulator(env.controller, self.params["number"])
-    time.sleep(5.0)
+    phone_validators.wait_for_call_to_start(env.controller)
     adb_utils.end_call_if_active(env.controller)
 
 
@@ -26,6 +26,7 @@ from android_world.task_evals.common_validators import sms_validators
 from android_world.task_evals.single import sms
 from android_world.task_evals.utils import user_data_generation
 from android_world.utils import contacts_utils
+from android_world.utils import fake_adb_responses
 from android_world.utils import test_utils
 
 
@@ -184,7 +185,13 @@ class TestSimpleSmsReplyMostRecent(test_utils.AdbEvalTestBase):
             self.most_recent_number, new_message, date_ms
         ).encode()
     )
-    self.mock_issue_generic_request.side_effect = [mock_sent_message]
+    self.mock_issue_generic_request.side_effect = [
+        # The outbox is empty.
+        fake_adb_responses.create_successful_generic_response(
+            'No result found.'
+        ),
+        mock_sent_message,
+    ]
     self.mock_get_received_messages.return_value = self.initial_state_messages
     test_utils.log_mock_calls(self.mock_issue_generic_request)
     env = mock.MagicMock()
@@ -286,7 +293,13 @@ class TestSimpleSmsReply(test_utils.AdbEvalTestBase):
             self.relevant_number, new_message, date_ms
         ).encode()
     )
-    self.mock_issue_generic_request.side_effect = [mock_sent_message]
+    self.mock_issue_generic_request.side_effect = [
+        # The outbox is empty.
+        fake_adb_responses.create_successful_generic_response(
+            'No result found.'
+        ),
+        mock_sent_message,
+    ]
 
     test_utils.log_mock_calls(self.mock_issue_generic_request)
 
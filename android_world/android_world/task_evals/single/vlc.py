@@ -49,10 +49,8 @@ def _get_playlist_info_query() -> str:
 
 def _clear_playlist_dbs(env: interface.AsyncEnv) -> None:
   """Clears all DBs related to playlists."""
-  sqlite_utils.delete_all_rows_from_table('Playlist', _DB_PATH, env, _APP_NAME)
-  sqlite_utils.delete_all_rows_from_table('Media', _DB_PATH, env, _APP_NAME)
-  sqlite_utils.delete_all_rows_from_table(
-      'PlaylistMediaRelation', _DB_PATH, env, _APP_NAME
+  sqlite_utils.delete_all_rows_from_tables(
+      ['Playlist', 'Media', 'PlaylistMediaRelation'], _DB_PATH, env, _APP_NAME
   )
 
 
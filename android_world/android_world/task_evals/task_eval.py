@@ -118,7 +118,9 @@ class TaskEval(abc.ABC):
       # any state.
       if app_name and app_name != "clipper":
         try:
-          app_snapshot.restore_snapshot(app_name, env.controller)
+          app_snapshot.restore_snapshot(
+              app_name, env.controller, skip_if_unchanged=True
+          )
         except RuntimeError as error:
           logging.warning("Skipping app snapshot loading : %s", error)
 
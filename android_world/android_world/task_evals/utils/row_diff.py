@@ -0,0 +1,140 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Hash-indexed comparison of database rows.
+
+Rows are frozen dataclasses, so they can be indexed by hash instead of being
+compared pairwise. Rows holding unhashable values are kept aside and compared
+linearly, so results are the same as comparing with `==`.
+"""
+
+import collections
+import dataclasses
+from typing import Any, Generic, Hashable, Iterable, Optional, Sequence
+from android_world.task_evals.utils import sqlite_schema_utils
+
+RowType = sqlite_schema_utils.RowType
+
+
+class RowIndex(Generic[RowType]):
+  """Index of rows, keyed by whole row or by a subset of their fields."""
+
+  def __init__(
+      self,
+      rows: Iterable[RowType],
+      key_fields: Optional[Sequence[str]] = None,
+  ):
+    """Builds the index.
+
+    Args:
+      rows: The rows to index.
+      key_fields: Fields rows are keyed by. Defaults to the whole row.
+    """
+    self._key_fields = key_fields
+    self._buckets: dict[Hashable, list[RowType]] = collections.defaultdict(
+        list
+    )
+    self._unhashable: list[RowType] = []
+    for row in rows:
+      try:
+        self._buckets[self._key(row)].append(row)
+      except TypeError:
+        self._unhashable.append(row)
+
+  def _key(self, row: RowType) -> Hashable:
+    if self._key_fields is None:
+      key = row
+    else:
+      key = tuple(getattr(row, field) for field in self._key_fields)
+    hash(key)
+    return key
+
+  def candidates(self, row: RowType) -> list[RowType]:
+    """Returns the indexed rows that may have the same key as `row`.
+
+    All rows with the same key are returned, along with rows whose key could
+    not be hashed, which callers must compare themselves.
+
+    Args:
+      row: The row to look up.
+    """
+    try:
+      key = self._key(row)
+    except TypeError:
+      return [r for bucket in self._buckets.values() for r in bucket] + (
+          self._unhashable
+      )
+    return self._buckets.get(key, []) + self._unhashable
+
+  def __contains__(self, row: RowType) -> bool:
+    """Returns whether a row equal to `row` is indexed."""
+    return any(candidate == row for candidate in self.candidates(row))
+
+
+@dataclasses.dataclass(frozen=True)
+class RowDiff(Generic[RowType]):
+  """Differences between two states of a table.
+
+  Attributes:
+    added: Rows only present after.
+    removed: Rows only present before.
+    modified: (before, after) pairs of rows with the same ID but different
+      values. These rows are not listed in `added` or `removed`.
+  """
+
+  added: list[RowType]
+  removed: list[RowType]
+  modified: list[tuple[RowType, RowType]]
+
+  @property
+  def is_empty(self) -> bool:
+    return not (self.added or self.removed or self.modified)
+
+  def __str__(self) -> str:
+    lines = [f'added: {row}' for row in self.added]
+    lines += [f'removed: {row}' for row in self.removed]
+    lines += [f'modified: {old} -> {new}' for old, new in self.modified]
+    return '\n'.join(lines) if lines else 'no differences'
+
+
+def diff_rows(
+    before: Sequence[RowType],
+    after: Sequence[RowType],
+    id_name: Optional[str] = None,
+) -> RowDiff[RowType]:
+  """Returns the rows added, removed and modified between two table states.
+
+  Args:
+    before: State of the rows before.
+    after: State of the rows after.
+    id_name: The name of the ID column. If set, a removed and an added row with
+      the same ID are reported as a modification.
+  """
+  before_index = RowIndex(before)
+  after_index = RowIndex(after)
+  removed = [row for row in before if row not in after_index]
+  added = [row for row in after if row not in before_index]
+  modified = []
+  if id_name is not None:
+    added_by_id: dict[Any, RowType] = {}
+    for row in added:
+      added_by_id.setdefault(getattr(row, id_name), row)
+    for row in removed:
+      new_row = added_by_id.pop(getattr(row, id_name), None)
+      if new_row is not None:
+        modified.append((row, new_row))
+    paired = {id(row) for pair in modified for row in pair}
+    added = [row for row in added if id(row) not in paired]
+    removed = [row for row in removed if id(row) not in paired]
+  return RowDiff(added=added, removed=removed, modified=modified)
@@ -0,0 +1,80 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dataclasses
+
+from absl.testing import absltest
+from android_world.task_evals.utils import row_diff
+from android_world.task_evals.utils import sqlite_schema_utils
+
+
+@dataclasses.dataclass(frozen=True)
+class _Row(sqlite_schema_utils.SQLiteRow):
+  id: int
+  title: str
+  tags: tuple[str, ...] | list[str] = ()
+
+
+class RowIndexTest(absltest.TestCase):
+
+  def test_contains(self):
+    index = row_diff.RowIndex([_Row(1, 'a'), _Row(2, 'b')])
+
+    self.assertIn(_Row(1, 'a'), index)
+    self.assertNotIn(_Row(1, 'b'), index)
+
+  def test_unhashable_rows_are_compared_linearly(self):
+    index = row_diff.RowIndex([_Row(1, 'a', ['x']), _Row(2, 'b')])
+
+    self.assertIn(_Row(1, 'a', ['x']), index)
+    self.assertIn(_Row(2, 'b'), index)
+    self.assertNotIn(_Row(1, 'a', ['y']), index)
+
+  def test_candidates_by_key_fields(self):
+    rows = [_Row(1, 'a'), _Row(2, 'a'), _Row(3, 'b')]
+    index = row_diff.RowIndex(rows, ['title'])
+
+    self.assertEqual(index.candidates(_Row(9, 'a')), rows[:2])
+    self.assertEmpty(index.candidates(_Row(9, 'c')))
+
+
+class DiffRowsTest(absltest.TestCase):
+
+  def test_diff_rows(self):
+    before = [_Row(1, 'a'), _Row(2, 'b'), _Row(3, 'c')]
+    after = [_Row(1, 'a'), _Row(2, 'B'), _Row(4, 'd')]
+
+    diff = row_diff.diff_rows(before, after, 'id')
+
+    self.assertEqual(diff.added, [_Row(4, 'd')])
+    self.assertEqual(diff.removed, [_Row(3, 'c')])
+    self.assertEqual(diff.modified, [(_Row(2, 'b'), _Row(2, 'B'))])
+    self.assertFalse(diff.is_empty)
+
+  def test_diff_rows_without_ids(self):
+    diff = row_diff.diff_rows([_Row(1, 'a')], [_Row(1, 'b')])
+
+    self.assertEqual(diff.added, [_Row(1, 'b')])
+    self.assertEqual(diff.removed, [_Row(1, 'a')])
+    self.assertEmpty(diff.modified)
+
+  def test_no_differences(self):
+    diff = row_diff.diff_rows([_Row(1, 'a')], [_Row(1, 'a')], 'id')
+
+    self.assertTrue(diff.is_empty)
+    self.assertEqual(str(diff), 'no differences')
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -16,8 +16,9 @@
 
 import dataclasses
 import datetime
+import itertools
 import textwrap
-from typing import Any, Callable, ClassVar, Optional, TypeVar
+from typing import Any, Callable, ClassVar, Optional, Sequence, TypeVar
 import uuid
 from android_world.env import device_constants
 from android_world.utils import datetime_utils
@@ -468,6 +469,42 @@ def insert_into_db(
   return insert_command, values
 
 
+def insert_many_into_db(
+    data_objects: Sequence[SQLiteRow],
+    table_name: str,
+    exclude_key: str | None = None,
+) -> list[tuple[str, list[tuple[Any, ...]]]]:
+  """Generates SQL INSERT commands to add many rows to the specified table.
+
+  Consecutive rows of the same type share a single command, meant to be run
+  with `executemany`, so rows keep their order in the table.
+
+  Args:
+      data_objects: Objects representing the data to be added.
+      table_name: Name of the table to insert data into.
+      exclude_key: Typically, the ID key which is auto-incrementing, so we do
+        not add it; the db will create it.
+
+  Returns:
+      A list of (SQL INSERT command, values of each row) tuples.
+  """
+  batches = []
+  for _, group in itertools.groupby(data_objects, key=type):
+    group = list(group)
+    insert_command, _ = insert_into_db(group[0], table_name, exclude_key)
+    field_names = [
+        field.name
+        for field in dataclasses.fields(group[0])
+        if exclude_key is None or field.name != exclude_key
+    ]
+    values = [
+        tuple(getattr(data_object, name) for name in field_names)
+        for data_object in group
+    ]
+    batches.append((insert_command, values))
+  return batches
+
+
 def _is_candidate_equal_to_any_result(
     candidate: Any, result: list[Any]
 ) -> bool:
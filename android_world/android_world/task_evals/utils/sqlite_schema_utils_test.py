@@ -75,5 +75,25 @@ class SchemaUtilsTest(absltest.TestCase):
     generate_item_fn.assert_called()
 
 
+  def test_insert_many_into_db(self):
+    recipes = [self.generate_mock_item('A'), self.generate_mock_item('B')]
+    folder = sqlite_schema_utils.JoplinFolder('Folder')
+
+    batches = sqlite_schema_utils.insert_many_into_db(
+        recipes + [folder], 'table', 'recipeId'
+    )
+
+    self.assertLen(batches, 2)
+    for rows, (insert_command, values) in zip(
+        [recipes, [folder]], batches, strict=True
+    ):
+      self.assertEqual(
+          [
+              sqlite_schema_utils.insert_into_db(row, 'table', 'recipeId')
+              for row in rows
+          ],
+          [(insert_command, row_values) for row_values in values],
+      )
+
 if __name__ == '__main__':
   absltest.main()
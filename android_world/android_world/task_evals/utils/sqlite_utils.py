@@ -14,18 +14,43 @@
 
 """Utility functions for interacting with SQLite database on an Android device."""
 
+import contextlib
 import os
 import sqlite3
 import time
-from typing import Optional, Type
+from typing import Any, Iterator, Optional, Sequence, Type
+from android_env.proto import adb_pb2
 from android_world.env import adb_utils
 from android_world.env import interface
 from android_world.task_evals.utils import sqlite_schema_utils
 from android_world.utils import file_utils
 
 
+def _select_query(
+    table_name: str,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+) -> str:
+  query = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+  if where:
+    query += f" WHERE {where}"
+  return query + ";"
+
+
+def _rows_from_cursor(
+    cursor: sqlite3.Cursor, row_type: Type[sqlite_schema_utils.RowType]
+) -> Iterator[sqlite_schema_utils.RowType]:
+  names = [column[0] for column in cursor.description]
+  for values in cursor:
+    row = row_type(**dict(zip(names, values)))
+    yield row  # pytype: disable=bad-return-type
+
+
 def execute_query(
-    query: str, db_path: str, row_type: Type[sqlite_schema_utils.RowType]
+    query: str,
+    db_path: str,
+    row_type: Type[sqlite_schema_utils.RowType],
+    params: Sequence[Any] = (),
 ) -> list[sqlite_schema_utils.RowType]:
   """Retrieves all rows from the given SQLite database path.
 
@@ -33,21 +58,236 @@ def execute_query(
     query: The query to issue.
     db_path: The path to the SQLite database file.
     row_type: The object type that will be created for each retrieved row.
+    params: Values for the placeholders in the query.
 
   Returns:
       A list of tuples, each representing an row from the database.
   """
-  conn = sqlite3.connect(db_path)
-  conn.row_factory = sqlite3.Row
-  cursor = conn.cursor()
-  raw_rows = cursor.execute(query).fetchall()
-  conn.close()
+  with contextlib.closing(sqlite3.connect(db_path)) as conn:
+    return list(_rows_from_cursor(conn.execute(query, params), row_type))
+
+
+class RemoteDatabase:
+  """A session on a SQLite database on the device.
+
+  The size, inode and modification time of the remote database files are
+  recorded right before the database is pulled, and later reads reuse the local
+  copy as long as they stay the same. Writes go to the local copy and are pushed
+  back to the device in a single transfer by `commit()`.
+
+  Example:
+
+    with sqlite_utils.RemoteDatabase(db_path, env) as db:
+      if db.table_exists('events'):
+        db.delete_all_rows('events')
+      db.commit(app_name)
+  """
+
+  def __init__(
+      self,
+      remote_db_file_path: str,
+      env: interface.AsyncEnv,
+      timeout_sec: Optional[float] = None,
+  ):
+    self._remote_db_file_path = remote_db_file_path
+    self._env = env
+    self._timeout_sec = timeout_sec
+    self._exit_stack = contextlib.ExitStack()
+    self._local_db_path = None
+    self._conn = None
+    self._remote_version = None
+    self._has_pending_writes = False
+    self.num_pulls = 0
+    self.num_pushes = 0
+
+  def __enter__(self) -> "RemoteDatabase":
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  def _get_remote_version(self) -> Optional[str]:
+    """Returns the size, inode and mtime of the remote database files."""
+    response = adb_utils.issue_generic_request(
+        [
+            "shell",
+            f"stat -c '%n %s %i %y' {self._remote_db_file_path}*",
+        ],
+        self._env.controller,
+    )
+    if response.status != adb_pb2.AdbResponse.Status.OK:
+      return None
+    return response.generic.output.decode()
+
+  def _release(self) -> None:
+    if self._conn is not None:
+      self._conn.close()
+      self._conn = None
+    self._exit_stack.close()
+    self._local_db_path = None
+
+  def local_path(self) -> str:
+    """Returns the path to an up to date local copy of the database.
+
+    Raises:
+      FileNotFoundError: If the database does not exist on the device.
+    """
+    if self._has_pending_writes:
+      return self._local_db_path
+    if self._local_db_path is not None:
+      version = self._get_remote_version()
+      if version is not None and version == self._remote_version:
+        return self._local_db_path
+    self._release()
+    # Stat before pulling: a write in between makes the local copy newer than
+    # the recorded version, which only costs an extra pull on the next read.
+    self._remote_version = self._get_remote_version()
+    local_db_directory = self._exit_stack.enter_context(
+        self._env.controller.pull_file(
+            self._remote_db_file_path, self._timeout_sec
+        )
+    )
+    self._local_db_path = file_utils.convert_to_posix_path(
+        local_db_directory, os.path.split(self._remote_db_file_path)[1]
+    )
+    self.num_pulls += 1
+    return self._local_db_path
+
+  def _connection(self) -> sqlite3.Connection:
+    local_db_path = self.local_path()
+    if self._conn is None:
+      self._conn = sqlite3.connect(local_db_path)
+    return self._conn
+
+  def iter_rows(
+      self,
+      table_name: str,
+      row_type: Type[sqlite_schema_utils.RowType],
+      columns: Optional[Sequence[str]] = None,
+      where: Optional[str] = None,
+      params: Sequence[Any] = (),
+  ) -> Iterator[sqlite_schema_utils.RowType]:
+    """Yields rows from a table, one at a time.
+
+    Args:
+      table_name: The table to read.
+      row_type: The object type that will be created for each retrieved row.
+        If `columns` is set, it must accept rows with only those columns, e.g.
+        `sqlite_schema_utils.GenericRow`.
+      columns: The columns to read. Defaults to all of them.
+      where: An SQL condition rows must satisfy, e.g. "title = ?".
+      params: Values for the placeholders in `where`.
+
+    Yields:
+      The rows of the table that satisfy `where`.
+    """
+    cursor = self._connection().execute(
+        _select_query(table_name, columns, where), params
+    )
+    yield from _rows_from_cursor(cursor, row_type)
+
+  def query(
+      self,
+      table_name: str,
+      row_type: Type[sqlite_schema_utils.RowType],
+      columns: Optional[Sequence[str]] = None,
+      where: Optional[str] = None,
+      params: Sequence[Any] = (),
+  ) -> list[sqlite_schema_utils.RowType]:
+    """Returns the rows from a table. See `iter_rows()` for the arguments."""
+    return list(self.iter_rows(table_name, row_type, columns, where, params))
+
+  def table_exists(self, table_name: str) -> bool:
+    """Returns whether the database exists and has the given table."""
+    try:
+      cursor = self._connection().execute(
+          "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;",
+          (table_name,),
+      )
+    except (FileNotFoundError, sqlite3.DatabaseError):
+      return False
+    return cursor.fetchone() is not None
+
+  def ensure_tables_exist(
+      self, table_names: Sequence[str], app_name: str
+  ) -> bool:
+    """Launches the app if any of the tables is missing, to create them.
+
+    Args:
+      table_names: The tables that should exist.
+      app_name: The name of the app that owns the database.
+
+    Returns:
+      Whether all the tables exist.
+    """
+    if self._has_tables(table_names):
+      return True
+    # If the database was never created, opening the app may create it.
+    adb_utils.launch_app(app_name, self._env.controller)
+    time.sleep(7.0)
+    # The app changed the database, so it must be pulled again.
+    self._release()
+    return self._has_tables(table_names)
+
+  def _has_tables(self, table_names: Sequence[str]) -> bool:
+    """Returns whether the database exists and has all the given tables."""
+    try:
+      cursor = self._connection().execute(
+          "SELECT name FROM sqlite_master WHERE type = 'table';"
+      )
+    except (FileNotFoundError, sqlite3.DatabaseError):
+      return False
+    return set(table_names) <= {name for name, in cursor}
+
+  def delete_all_rows(self, table_name: str) -> None:
+    """Deletes all rows from a table in the local copy."""
+    self._connection().execute(f"DELETE FROM {table_name}")
+    self._has_pending_writes = True
+
+  def insert_rows(
+      self,
+      rows: Sequence[sqlite_schema_utils.RowType],
+      exclude_key: str | None,
+      table_name: str,
+  ) -> None:
+    """Inserts rows into a table in the local copy.
+
+    Args:
+      rows: The rows to insert.
+      exclude_key: Name of field to exclude adding to database. Typically an
+        auto incrementing key.
+      table_name: The name of the table to insert rows into.
+    """
+    conn = self._connection()
+    for insert_command, values in sqlite_schema_utils.insert_many_into_db(
+        rows, table_name, exclude_key
+    ):
+      conn.executemany(insert_command, values)
+    self._has_pending_writes = True
+
+  def commit(self, app_name: str) -> None:
+    """Pushes the pending writes to the device.
+
+    Args:
+      app_name: The name of the app that owns the database. It is closed
+        afterwards, to register the changes.
+    """
+    if not self._has_pending_writes:
+      return
+    self._conn.commit()
+    self._env.controller.push_file(
+        self._local_db_path, self._remote_db_file_path, self._timeout_sec
+    )
+    self.num_pushes += 1
+    self._has_pending_writes = False
+    # The push rewrote the remote files, so the next read pulls them again.
+    self._release()
+    adb_utils.close_app(app_name, self._env.controller)
 
-  rows = []
-  for row in raw_rows:
-    row = dict(row)
-    rows.append(row_type(**row))  # pytype: disable=bad-return-type
-  return rows
+  def close(self) -> None:
+    """Deletes the local copy, dropping any writes that were not committed."""
+    self._has_pending_writes = False
+    self._release()
 
 
 def get_rows_from_remote_device(
@@ -57,6 +297,9 @@ def get_rows_from_remote_device(
     env: interface.AsyncEnv,
     timeout_sec: Optional[float] = None,
     n_retries: int = 3,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params: Sequence[Any] = (),
 ) -> list[sqlite_schema_utils.RowType]:
   """Retrieves rows from a table in a SQLite database located on a remote Android device.
 
@@ -74,25 +317,25 @@ def get_rows_from_remote_device(
     n_retries: The number of times to try. This is relevant in cases where a
       database has not been created/being created when an app is launched for
       the first time after clearing the database.
+    columns: The columns to retrieve. Defaults to all of them.
+    where: An SQL condition rows must satisfy, e.g. "title = ?".
+    params: Values for the placeholders in `where`.
 
   Returns:
-    All rows from the table.
+    All rows from the table that satisfy `where`.
 
   Raises:
     ValueError: If cannot query table.
   """
-  with env.controller.pull_file(
-      remote_db_file_path, timeout_sec
-  ) as local_db_directory:
-    local_db_path = file_utils.convert_to_posix_path(
-        local_db_directory, os.path.split(remote_db_file_path)[1]
-    )
+  with RemoteDatabase(remote_db_file_path, env, timeout_sec) as db:
+    local_db_path = db.local_path()
     for _ in range(n_retries):
       try:
         return execute_query(
-            f"SELECT * FROM {table_name};",
+            _select_query(table_name, columns, where),
             local_db_path,
             row_type,
+            params,
         )
       except sqlite3.OperationalError:
         time.sleep(1.0)
@@ -118,16 +361,33 @@ def table_exists(
   Returns:
     True if the table exists in the database.
   """
-  try:
-    get_rows_from_remote_device(
-        table_name,
-        remote_db_file_path,
-        sqlite_schema_utils.GenericRow,
-        env,
-    )
-    return True
-  except (FileNotFoundError, ValueError):
-    return False
+  with RemoteDatabase(remote_db_file_path, env) as db:
+    return db.table_exists(table_name)
+
+
+def delete_all_rows_from_tables(
+    table_names: Sequence[str],
+    remote_db_file_path: str,
+    env: interface.AsyncEnv,
+    app_name: str,
+    timeout_sec: Optional[float] = None,
+) -> None:
+  """Deletes all rows from tables in a SQLite database on an Android device.
+
+  The database is pulled and pushed once, whatever the number of tables.
+
+  Args:
+    table_names: Deletes all rows from these tables.
+    remote_db_file_path: The path to the sqlite database on the device.
+    env: The environment.
+    app_name: The name of the app that owns the database.
+    timeout_sec: Timeout in seconds.
+  """
+  with RemoteDatabase(remote_db_file_path, env, timeout_sec) as db:
+    db.ensure_tables_exist(table_names, app_name)
+    for table_name in table_names:
+      db.delete_all_rows(table_name)
+    db.commit(app_name)
 
 
 def delete_all_rows_from_table(
@@ -146,28 +406,9 @@ def delete_all_rows_from_table(
     app_name: The name of the app that owns the database.
     timeout_sec: Timeout in seconds.
   """
-  if not table_exists(table_name, remote_db_file_path, env):
-    # If the database was never created, opening the app may create it.
-    adb_utils.launch_app(app_name, env.controller)
-    time.sleep(7.0)
-
-  with env.controller.pull_file(
-      remote_db_file_path, timeout_sec
-  ) as local_db_directory:
-    local_db_path = file_utils.convert_to_posix_path(
-        local_db_directory, os.path.split(remote_db_file_path)[1]
-    )
-
-    conn = sqlite3.connect(local_db_path)
-    cursor = conn.cursor()
-    delete_command = f"DELETE FROM {table_name}"
-    cursor.execute(delete_command)
-    conn.commit()
-    conn.close()
-    env.controller.push_file(local_db_path, remote_db_file_path, timeout_sec)
-    adb_utils.close_app(
-        app_name, env.controller
-    )  # Close app to register the changes.
+  delete_all_rows_from_tables(
+      [table_name], remote_db_file_path, env, app_name, timeout_sec
+  )
 
 
 def insert_rows_to_remote_db(
@@ -191,22 +432,37 @@ def insert_rows_to_remote_db(
     env: The environment.
     timeout_sec: Optional timeout in seconds for the database copy operation.
   """
-  with env.controller.pull_file(
-      remote_db_file_path, timeout_sec
-  ) as local_db_directory:
-    local_db_path = file_utils.convert_to_posix_path(
-        local_db_directory, os.path.split(remote_db_file_path)[1]
-    )
+  with RemoteDatabase(remote_db_file_path, env, timeout_sec) as db:
+    db.insert_rows(rows, exclude_key, table_name)
+    db.commit(app_name)
 
-    conn = sqlite3.connect(local_db_path)
-    cursor = conn.cursor()
-    for row in rows:
-      insert_command, values = sqlite_schema_utils.insert_into_db(
-          row, table_name, exclude_key
-      )
-      cursor.execute(insert_command, values)
-    conn.commit()
-    conn.close()
 
-    env.controller.push_file(local_db_path, remote_db_file_path, timeout_sec)
-    adb_utils.close_app(app_name, env.controller)
+def replace_rows_in_remote_db(
+    rows: list[sqlite_schema_utils.RowType],
+    exclude_key: str | None,
+    table_name: str,
+    remote_db_file_path: str,
+    app_name: str,
+    env: interface.AsyncEnv,
+    timeout_sec: Optional[float] = None,
+) -> None:
+  """Replaces all rows of a table in a SQLite database on an Android device.
+
+  The database is pulled and pushed once, and the rows are inserted in a single
+  transaction.
+
+  Args:
+    rows: The rows the table should hold.
+    exclude_key: Name of field to exclude adding to database. Typically an auto
+      incrementing key.
+    table_name: The name of the table to replace rows of.
+    remote_db_file_path: Location of the SQLite database.
+    app_name: The name of the app that owns the database.
+    env: The environment.
+    timeout_sec: Optional timeout in seconds for the database copy operation.
+  """
+  with RemoteDatabase(remote_db_file_path, env, timeout_sec) as db:
+    db.ensure_tables_exist([table_name], app_name)
+    db.delete_all_rows(table_name)
+    db.insert_rows(rows, exclude_key, table_name)
+    db.commit(app_name)
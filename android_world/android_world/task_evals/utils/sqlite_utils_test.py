@@ -18,6 +18,7 @@ from unittest import mock
 
 from absl.testing import absltest
 from android_env import env_interface
+from android_env.proto import adb_pb2
 from android_env.wrappers import a11y_grpc_wrapper
 from android_world.env import adb_utils
 from android_world.env import android_world_controller
@@ -139,6 +140,166 @@ class SqliteUtilsTest(absltest.TestCase):
     original_rows = sqlite_test_utils.get_db_rows()
     self.assertEqual(retrieved, original_rows + [new_row])
 
+  def _mock_remote_version(self, version: str) -> mock.MagicMock:
+    return self.enter_context(
+        mock.patch.object(
+            adb_utils,
+            'issue_generic_request',
+            return_value=adb_pb2.AdbResponse(
+                status=adb_pb2.AdbResponse.Status.OK,
+                generic=adb_pb2.AdbResponse.GenericResponse(
+                    output=version.encode()
+                ),
+            ),
+        )
+    )
+
+  def test_remote_database_reuses_local_copy(self):
+    mock_stat = self._mock_remote_version('events.db 4096 12 2023-10-15')
+
+    with sqlite_utils.RemoteDatabase(
+        self.remote_db_path, self.async_env_mock
+    ) as db:
+      self.assertTrue(db.table_exists(self.table_name))
+      rows = db.query(self.table_name, self.row_type)
+      self.assertEqual(db.num_pulls, 1)
+
+      mock_stat.return_value.generic.output = b'events.db 8192 12 2023-10-16'
+      db.query(self.table_name, self.row_type)
+      self.assertEqual(db.num_pulls, 2)
+
+    self.assertEqual(rows, sqlite_test_utils.get_db_rows())
+    # One stat before each pull and one for each read of the local copy.
+    self.assertEqual(mock_stat.call_count, 4)
+
+  def test_single_read_costs_one_pull(self):
+    mock_stat = self._mock_remote_version('events.db 4096 12 2023-10-15')
+
+    self.assertTrue(
+        sqlite_utils.table_exists(
+            self.table_name, self.remote_db_path, self.async_env_mock
+        )
+    )
+
+    self.mock_copy_db.assert_called_once()
+    mock_stat.assert_called_once()
+
+  def test_write_right_after_pull_is_not_missed(self):
+    mock_stat = self._mock_remote_version('events.db 4096 12 2023-10-15')
+
+    with sqlite_utils.RemoteDatabase(
+        self.remote_db_path, self.async_env_mock
+    ) as db:
+      db.query(self.table_name, self.row_type)
+      # The app writes to the database before the next read.
+      mock_stat.return_value.generic.output = b'events.db 8192 12 2023-10-16'
+      db.query(self.table_name, self.row_type)
+
+      self.assertEqual(db.num_pulls, 2)
+
+  def test_remote_database_projection_and_where(self):
+    self._mock_remote_version('events.db 4096 12 2023-10-15')
+
+    with sqlite_utils.RemoteDatabase(
+        self.remote_db_path, self.async_env_mock
+    ) as db:
+      rows = db.query(
+          self.table_name,
+          sqlite_schema_utils.GenericRow,
+          columns=['id', 'title'],
+          where='title = ?',
+          params=('Pottery Class',),
+      )
+
+    self.assertEqual(
+        [(row.id, row.title) for row in rows],
+        [(3, 'Pottery Class'), (4, 'Pottery Class')],
+    )
+    self.assertEqual(set(rows[0]), {'id', 'title'})
+
+  def test_get_rows_from_remote_device_with_where(self):
+    result = sqlite_utils.get_rows_from_remote_device(
+        self.table_name,
+        self.remote_db_path,
+        self.row_type,
+        self.async_env_mock,
+        where='id > ?',
+        params=(4,),
+    )
+
+    self.assertEqual([row.id for row in result], [5])
+
+  def test_table_exists(self):
+    self.assertTrue(
+        sqlite_utils.table_exists(
+            self.table_name, self.remote_db_path, self.async_env_mock
+        )
+    )
+    self.assertFalse(
+        sqlite_utils.table_exists(
+            'missing', self.remote_db_path, self.async_env_mock
+        )
+    )
+    self.assertFalse(
+        sqlite_utils.table_exists(
+            self.table_name, '/missing/events.db', self.async_env_mock
+        )
+    )
+
+  @mock.patch.object(adb_utils, 'close_app', autospec=True)
+  def test_delete_all_rows_from_tables_pushes_once(self, mock_close_app):
+    mock_stat = self._mock_remote_version('events.db 4096 12 2023-10-15')
+
+    sqlite_utils.delete_all_rows_from_tables(
+        [self.table_name, 'sqlite_sequence'],
+        self.remote_db_path,
+        self.async_env_mock,
+        'TestApp',
+    )
+
+    self.mock_copy_db.assert_called_once()
+    self.mock_copy_data_to_device.assert_called_once()
+    mock_close_app.assert_called_once_with('TestApp', self.controller)
+    # One stat before the pull, which checks both tables. The first delete
+    # revalidates the local copy.
+    self.assertEqual(mock_stat.call_count, 2)
+    self.assertEmpty(
+        sqlite_utils.get_rows_from_remote_device(
+            self.table_name,
+            self.remote_db_path,
+            self.row_type,
+            self.async_env_mock,
+        )
+    )
+
+  @mock.patch.object(adb_utils, 'close_app', autospec=True)
+  def test_replace_rows_in_remote_db(self, mock_close_app):
+    self._mock_remote_version('events.db 4096 12 2023-10-15')
+    new_rows = [
+        sqlite_schema_utils.CalendarEvent(
+            start_ts=1672707600 + i, end_ts=1672714800, title=f'Row {i}', id=i
+        )
+        for i in range(1, 101)
+    ]
+
+    sqlite_utils.replace_rows_in_remote_db(
+        new_rows,
+        'id',
+        self.table_name,
+        self.remote_db_path,
+        'TestApp',
+        self.async_env_mock,
+    )
+
+    self.mock_copy_db.assert_called_once()
+    self.mock_copy_data_to_device.assert_called_once()
+    mock_close_app.assert_called_once_with('TestApp', self.controller)
+    retrieved = sqlite_utils.get_rows_from_remote_device(
+        self.table_name, self.remote_db_path, self.row_type, self.async_env_mock
+    )
+    self.assertEqual(
+        [row.title for row in retrieved], [row.title for row in new_rows]
+    )
 
 if __name__ == '__main__':
   absltest.main()
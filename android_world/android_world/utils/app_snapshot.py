@@ -14,8 +14,14 @@
 
 """Utils for handling snapshots for apps."""
 
+import dataclasses
+import hashlib
+import time
+import weakref
+
 from absl import logging
 from android_env import env_interface
+from android_env.proto import adb_pb2
 from android_world.env import adb_utils
 from android_world.env import device_constants
 from android_world.utils import file_utils
@@ -37,6 +43,66 @@ def _snapshot_path(app_name: str) -> str:
   )
 
 
+@dataclasses.dataclass
+class RestoreStats:
+  """Snapshot restore counters for a single device.
+
+  Attributes:
+    num_restores: Number of snapshots copied back onto the device.
+    num_restores_skipped: Number of restores skipped because the app data was
+      unchanged since it was last restored.
+    restore_time_sec: Total time spent on restores that were not skipped.
+    fingerprints: Fingerprint of each app's data directory right after its
+      last restore, keyed by app name.
+  """
+
+  num_restores: int = 0
+  num_restores_skipped: int = 0
+  restore_time_sec: float = 0.0
+  fingerprints: dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+# Restore state is tracked per device, so that separate environments never
+# share fingerprints.
+_RESTORE_STATS: weakref.WeakKeyDictionary[
+    env_interface.AndroidEnvInterface, RestoreStats
+] = weakref.WeakKeyDictionary()
+
+
+def get_restore_stats(env: env_interface.AndroidEnvInterface) -> RestoreStats:
+  """Returns the snapshot restore counters for the device."""
+  if env not in _RESTORE_STATS:
+    _RESTORE_STATS[env] = RestoreStats()
+  return _RESTORE_STATS[env]
+
+
+def fingerprint_directory(
+    directory_path: str, env: env_interface.AndroidEnvInterface
+) -> str | None:
+  """Fingerprints the contents of a directory on the device.
+
+  The listing of every entry's name, size, permissions and ownership, plus the
+  checksum of every regular file, is produced by a single adb call and hashed
+  on the host.
+
+  Args:
+    directory_path: Directory to fingerprint.
+    env: Android environment.
+
+  Returns:
+    The fingerprint, or None if the directory could not be listed.
+  """
+  command = (
+      f"cd {directory_path}"
+      " && find . -exec stat -c '%n %s %a %u %g %F' {} + | sort"
+      " && find . -type f -exec md5sum {} + | sort"
+  )
+  response = adb_utils.issue_generic_request(["shell", command], env)
+  if response.status != adb_pb2.AdbResponse.Status.OK:
+    return None
+  return hashlib.sha256(response.generic.output).hexdigest()
+
+
 def clear_snapshot(
     app_name: str,
     env: env_interface.AndroidEnvInterface,
@@ -47,6 +113,7 @@ def clear_snapshot(
     app_name: Package name for the application snapshot to remove.
     env: Android environment.
   """
+  get_restore_stats(env).fingerprints.pop(app_name, None)
   snapshot_path = _snapshot_path(app_name)
   file_utils.clear_directory(snapshot_path, env)
 
@@ -64,6 +131,7 @@ def save_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
   Raises:
     RuntimeError: on failed or incomplete snapshot.
   """
+  get_restore_stats(env).fingerprints.pop(app_name, None)
   snapshot_path = _snapshot_path(app_name)
   try:
     file_utils.clear_directory(snapshot_path, env)
@@ -76,20 +144,39 @@ def save_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
   file_utils.copy_dir(_app_data_path(app_name), snapshot_path, env)
 
 
-def restore_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
+def restore_snapshot(
+    app_name: str,
+    env: env_interface.AndroidEnvInterface,
+    skip_if_unchanged: bool = False,
+):
   """Loads a snapshot of application data.
 
   Args:
     app_name: App package that will have its data overwritten with the stored
       snapshot.
     env: Android environment.
+    skip_if_unchanged: If True, the app data is fingerprinted after restoring,
+      and the next restore is skipped if the app data still has the same
+      fingerprint.
 
   Raises:
     RuntimeError: when there is no available snapshot or a failure occurs while
       loading the snapshot.
   """
+  start = time.perf_counter()
   adb_utils.close_app(app_name, env)
 
+  stats = get_restore_stats(env)
+  fingerprint = stats.fingerprints.pop(app_name, None)
+  if skip_if_unchanged and fingerprint is not None:
+    if fingerprint == fingerprint_directory(_app_data_path(app_name), env):
+      stats.fingerprints[app_name] = fingerprint
+      stats.num_restores_skipped += 1
+      logging.info(
+          "Skipping %s snapshot restore; app data unchanged.", app_name
+      )
+      return
+
   snapshot_path = _snapshot_path(app_name)
   if not file_utils.check_directory_exists(snapshot_path, env):
     raise RuntimeError(f"Snapshot not found in {snapshot_path}.")
@@ -121,3 +208,29 @@ def restore_snapshot(app_name: str, env: env_interface.AndroidEnvInterface):
       ),
       "Failed to set app data permissions.",
   )
+
+  if skip_if_unchanged:
+    fingerprint = fingerprint_directory(app_data_path, env)
+    if fingerprint is not None:
+      stats.fingerprints[app_name] = fingerprint
+  stats.num_restores += 1
+  stats.restore_time_sec += time.perf_counter() - start
+
+
+def mark_restored(app_name: str, env: env_interface.AndroidEnvInterface):
+  """Records the current app data as freshly restored.
+
+  Use this after the app data was reset by other means than
+  `restore_snapshot()`, e.g. by loading an emulator snapshot, so that the next
+  `restore_snapshot(..., skip_if_unchanged=True)` is skipped.
+
+  Args:
+    app_name: App package whose data was reset.
+    env: Android environment.
+  """
+  stats = get_restore_stats(env)
+  fingerprint = fingerprint_directory(_app_data_path(app_name), env)
+  if fingerprint is None:
+    stats.fingerprints.pop(app_name, None)
+  else:
+    stats.fingerprints[app_name] = fingerprint
@@ -0,0 +1,142 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+from absl.testing import absltest
+from android_env.proto import adb_pb2
+from android_world.env import adb_utils
+from android_world.utils import app_snapshot
+from android_world.utils import file_utils
+
+
+def _response(output: str = '') -> adb_pb2.AdbResponse:
+  return adb_pb2.AdbResponse(
+      status=adb_pb2.AdbResponse.Status.OK,
+      generic=adb_pb2.AdbResponse.GenericResponse(output=output.encode()),
+  )
+
+
+class AppSnapshotTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.env = mock.MagicMock()
+    self.app_data = {'contacts': 'a.db 4096 777'}
+    self.mock_issue_generic_request = self.enter_context(
+        mock.patch.object(
+            adb_utils,
+            'issue_generic_request',
+            side_effect=lambda args, env: _response(
+                self.app_data['contacts'] if 'find' in args[-1] else ''
+            ),
+        )
+    )
+    self.enter_context(mock.patch.object(adb_utils, 'close_app'))
+    self.enter_context(
+        mock.patch.object(
+            app_snapshot,
+            '_app_data_path',
+            return_value='/data/data/com.android.contacts',
+        )
+    )
+    self.enter_context(
+        mock.patch.object(
+            app_snapshot, '_snapshot_path', return_value='/sdcard/snapshot'
+        )
+    )
+    self.enter_context(
+        mock.patch.object(
+            file_utils, 'check_directory_exists', return_value=True
+        )
+    )
+    self.enter_context(mock.patch.object(file_utils, 'clear_directory'))
+    self.mock_copy_dir = self.enter_context(
+        mock.patch.object(file_utils, 'copy_dir')
+    )
+
+  def test_fingerprint_directory(self):
+    fingerprint = app_snapshot.fingerprint_directory('/data/data/x', self.env)
+
+    self.app_data['contacts'] = 'a.db 8192 777'
+    self.assertNotEqual(
+        app_snapshot.fingerprint_directory('/data/data/x', self.env),
+        fingerprint,
+    )
+    self.assertEqual(self.mock_issue_generic_request.call_count, 2)
+
+  def test_fingerprint_directory_failure(self):
+    self.mock_issue_generic_request.side_effect = None
+    self.mock_issue_generic_request.return_value = adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.ADB_ERROR
+    )
+
+    self.assertIsNone(
+        app_snapshot.fingerprint_directory('/data/data/x', self.env)
+    )
+
+  def test_restore_skipped_when_unchanged(self):
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+
+    stats = app_snapshot.get_restore_stats(self.env)
+    self.assertEqual(stats.num_restores, 1)
+    self.assertEqual(stats.num_restores_skipped, 1)
+    self.mock_copy_dir.assert_called_once()
+
+  def test_restore_when_changed(self):
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+    self.app_data['contacts'] = 'a.db 8192 777'
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+
+    stats = app_snapshot.get_restore_stats(self.env)
+    self.assertEqual(stats.num_restores, 2)
+    self.assertEqual(stats.num_restores_skipped, 0)
+
+  def test_restore_without_skipping(self):
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+    app_snapshot.restore_snapshot('contacts', self.env)
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+
+    self.assertEqual(app_snapshot.get_restore_stats(self.env).num_restores, 3)
+
+  def test_save_snapshot_invalidates_fingerprint(self):
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+    app_snapshot.save_snapshot('contacts', self.env)
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+
+    stats = app_snapshot.get_restore_stats(self.env)
+    self.assertEqual(stats.num_restores, 2)
+    self.assertEqual(stats.num_restores_skipped, 0)
+
+  def test_mark_restored(self):
+    app_snapshot.mark_restored('contacts', self.env)
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+
+    stats = app_snapshot.get_restore_stats(self.env)
+    self.assertEqual(stats.num_restores, 0)
+    self.assertEqual(stats.num_restores_skipped, 1)
+    self.mock_copy_dir.assert_not_called()
+
+  def test_stats_are_per_device(self):
+    app_snapshot.restore_snapshot('contacts', self.env, skip_if_unchanged=True)
+    other_env = mock.MagicMock()
+    app_snapshot.restore_snapshot('contacts', other_env, skip_if_unchanged=True)
+
+    self.assertEqual(app_snapshot.get_restore_stats(self.env).num_restores, 1)
+    self.assertEqual(app_snapshot.get_restore_stats(other_env).num_restores, 1)
+
+
+if __name__ == '__main__':
+  absltest.main()
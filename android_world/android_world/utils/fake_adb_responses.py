@@ -19,7 +19,12 @@ on the mock returning a response to an adb call. This module provides functions
 to construct these for common use cases.
 """
 
+from collections.abc import Mapping, Sequence
+import hashlib
+from typing import Optional
+
 from android_env.proto import adb_pb2
+from android_world.env import adb_utils
 from android_world.utils import file_utils
 
 
@@ -32,6 +37,43 @@ def create_successful_generic_response(output: str) -> adb_pb2.AdbResponse:
   )
 
 
+def create_batched_shell_response(
+    outputs: Mapping[str, str],
+) -> adb_pb2.AdbResponse:
+  """Returns an AdbResponse for `adb_utils.issue_batched_shell_request`.
+
+  Args:
+    outputs: Mapping from each batched command key to its output.
+  """
+  delimiter = (
+      adb_utils._SHELL_BATCH_DELIMITER  # pylint: disable=protected-access
+  )
+  return create_successful_generic_response(
+      "".join(
+          f"{delimiter}{key}\n{output}\n" for key, output in outputs.items()
+      )
+  )
+
+
+def create_file_digests_response(
+    contents: Sequence[Optional[bytes]],
+) -> adb_pb2.AdbResponse:
+  """Returns an AdbResponse for the digests computed by `check_file_contents`.
+
+  Args:
+    contents: The content of each checked file, in order, or None if the file
+      does not exist.
+  """
+  return create_batched_shell_response({
+      f"file{i}": (
+          f"{hashlib.sha256(content).hexdigest()}  -"
+          if content is not None
+          else ""
+      )
+      for i, content in enumerate(contents)
+  })
+
+
 def create_get_wifi_enabled_response(is_enabled: bool) -> adb_pb2.AdbResponse:
   """Returns an AdbResponse for whether wifi is turned on.
 
@@ -14,17 +14,26 @@
 
 """Utils for file operations using adb."""
 
+from concurrent import futures
 import contextlib
 import dataclasses
 import datetime
+import hashlib
+import io
 import os
 import pathlib
+import posixpath
 import random
+import shlex
 import shutil
+import stat
 import string
+import tarfile
 import tempfile
 from typing import Iterator
+from typing import Mapping
 from typing import Optional
+import weakref
 
 from absl import logging
 from android_env import env_interface
@@ -80,6 +89,259 @@ class FileWithMetadata:
   change_time: datetime.datetime
 
 
+@dataclasses.dataclass(frozen=True)
+class RemoteFileEntry:
+  """Metadata of a file or directory on the device.
+
+  Attributes:
+    path: Normalized full path.
+    mode: File type and permission bits, as returned by `stat`.
+    size: Size in bytes.
+    access_time: Last access time, as shown by `ls -u`.
+  """
+
+  path: str
+  mode: int
+  size: int
+  access_time: datetime.datetime
+
+  @property
+  def is_file(self) -> bool:
+    return stat.S_ISREG(self.mode)
+
+  @property
+  def is_directory(self) -> bool:
+    return stat.S_ISDIR(self.mode)
+
+  @property
+  def is_symlink(self) -> bool:
+    return stat.S_ISLNK(self.mode)
+
+
+# Printed instead of the tree when the scanned directory does not exist.
+_MISSING_DIRECTORY_MARKER = "__ANDROID_WORLD_MISSING_DIRECTORY__"
+
+
+def _normalize_remote_path(path: str) -> str:
+  return posixpath.normpath(path)
+
+
+def _is_same_or_under(path: str, directory: str) -> bool:
+  return path == directory or path.startswith(directory.rstrip("/") + "/")
+
+
+@dataclasses.dataclass(frozen=True)
+class _ScannedTree:
+  """Entries captured by one scan of a directory.
+
+  Attributes:
+    recursive: Whether the whole tree was scanned, or only the directory and
+      its direct children.
+    entries: Entries by path, or None if the directory does not exist.
+  """
+
+  recursive: bool
+  entries: Optional[dict[str, RemoteFileEntry]]
+
+  def covers(
+      self, directory: str, path: str, max_depth: Optional[int]
+  ) -> bool:
+    """Whether the tree has all entries up to `max_depth` below `path`."""
+    if not _is_same_or_under(path, directory):
+      return False
+    if self.entries is None or self.recursive:
+      return True
+    depth = (
+        0
+        if path == directory
+        else len(posixpath.relpath(path, directory).split("/"))
+    )
+    return max_depth is not None and depth + max_depth <= 1
+
+
+class RemoteFileSystemView:
+  """Cached view of the metadata of directories on the device.
+
+  A directory is captured with a single `find`/`stat` call the first time a
+  path inside it is queried; later existence, listing and size queries under
+  it are answered locally. Writes done through this module invalidate the
+  affected directories, but changes made in any other way (e.g. by an app or
+  the agent) are not seen, so a view should only live for a short, read-only
+  phase such as one call to `is_successful`. See `cached_file_system`.
+  """
+
+  def __init__(
+      self,
+      env: env_interface.AndroidEnvInterface,
+      timeout_sec: Optional[float] = None,
+  ):
+    self._env = env
+    self._timeout_sec = timeout_sec
+    self._trees: dict[str, _ScannedTree] = {}
+    self.num_scans = 0
+
+  def _scan(self, directory: str, recursive: bool) -> _ScannedTree:
+    """Captures the metadata of the entries under a directory."""
+    self.num_scans += 1
+    quoted = shlex.quote(directory)
+    max_depth = "" if recursive else " -maxdepth 1"
+    response = adb_utils.issue_generic_request(
+        [
+            "shell",
+            f"if [ -d {quoted} ]; then cd {quoted} && find .{max_depth} -exec"
+            f" stat -c '%f %s %x %n' {{}} +; else echo"
+            f" {_MISSING_DIRECTORY_MARKER}; fi",
+        ],
+        self._env,
+        self._timeout_sec,
+    )
+    adb_utils.check_ok(response, f"Failed to scan directory {directory}.")
+    output = response.generic.output.decode("utf-8").replace("\r", "")
+    if output.strip() == _MISSING_DIRECTORY_MARKER:
+      return _ScannedTree(recursive, None)
+    entries = {}
+    for line in output.splitlines():
+      if not line:
+        continue
+      # E.g. 81b0 20 2023-11-28 23:17:43.176000000 +0000 ./notes/1.txt
+      parts = line.split(" ", 5)
+      if len(parts) < 6:
+        raise RuntimeError(f"Failed to parse file details: {line}")
+      path = _normalize_remote_path(posixpath.join(directory, parts[5]))
+      entries[path] = RemoteFileEntry(
+          path=path,
+          mode=int(parts[0], 16),
+          size=int(parts[1]),
+          access_time=datetime.datetime.fromisoformat(
+              " ".join(parts[2:4])[:-3]
+          ),
+      )
+    return _ScannedTree(recursive, entries)
+
+  def _entries(
+      self,
+      path: str,
+      max_depth: Optional[int],
+      scan_directory: str,
+      recursive: bool,
+  ) -> Optional[dict[str, RemoteFileEntry]]:
+    """Returns entries up to `max_depth` below `path`, scanning if needed."""
+    for directory, tree in self._trees.items():
+      if tree.covers(directory, path, max_depth):
+        return tree.entries
+    tree = self._scan(scan_directory, recursive)
+    self._trees[scan_directory] = tree
+    return tree.entries
+
+  def stat(self, path: str) -> Optional[RemoteFileEntry]:
+    """Returns the metadata of a path, or None if it does not exist."""
+    path = _normalize_remote_path(path)
+    entries = self._entries(
+        path, 0, scan_directory=posixpath.dirname(path), recursive=False
+    )
+    return entries.get(path) if entries is not None else None
+
+  def list_directory(
+      self, directory: str, recursive: bool = False
+  ) -> list[RemoteFileEntry]:
+    """Lists the entries of a directory.
+
+    Args:
+      directory: The directory to list.
+      recursive: Whether to also list the entries of subdirectories.
+
+    Returns:
+      The entries under the directory, excluding the directory itself.
+
+    Raises:
+      FileNotFoundError: If the directory does not exist.
+    """
+    directory = _normalize_remote_path(directory)
+    entries = self._entries(
+        directory,
+        None if recursive else 1,
+        scan_directory=directory,
+        recursive=recursive,
+    )
+    if (
+        entries is None
+        or directory not in entries
+        or not entries[directory].is_directory
+    ):
+      raise FileNotFoundError(f"{directory} is not a directory.")
+    return [
+        entry
+        for path, entry in entries.items()
+        if path != directory
+        and _is_same_or_under(path, directory)
+        and (recursive or posixpath.dirname(path) == directory)
+    ]
+
+  def invalidate(self, path: Optional[str] = None) -> None:
+    """Drops the cached directories that overlap `path`, or all of them."""
+    if path is None:
+      self._trees.clear()
+      return
+    path = _normalize_remote_path(path)
+    for directory in list(self._trees):
+      if _is_same_or_under(path, directory) or _is_same_or_under(
+          directory, path
+      ):
+        del self._trees[directory]
+
+
+_ACTIVE_VIEWS: weakref.WeakKeyDictionary[
+    env_interface.AndroidEnvInterface, RemoteFileSystemView
+] = weakref.WeakKeyDictionary()
+
+
+@contextlib.contextmanager
+def cached_file_system(
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = None,
+) -> Iterator[RemoteFileSystemView]:
+  """Answers file queries in this module from a `RemoteFileSystemView`.
+
+  While active, `check_file_exists`, `check_directory_exists`,
+  `check_file_or_folder_exists` and `get_file_list_with_metadata` are served
+  from the view for `env`. Nested calls reuse the outer view.
+
+  Args:
+    env: The Android environment interface.
+    timeout_sec: A timeout for the scans.
+
+  Yields:
+    The active view.
+  """
+  if env in _ACTIVE_VIEWS:
+    yield _ACTIVE_VIEWS[env]
+    return
+  view = RemoteFileSystemView(env, timeout_sec)
+  _ACTIVE_VIEWS[env] = view
+  try:
+    yield view
+  finally:
+    del _ACTIVE_VIEWS[env]
+
+
+def _active_view(
+    env: env_interface.AndroidEnvInterface,
+) -> Optional[RemoteFileSystemView]:
+  try:
+    return _ACTIVE_VIEWS.get(env)
+  except TypeError:  # Unhashable or not weakly referenceable env.
+    return None
+
+
+def _invalidate_cached_file_system(
+    path: str, env: env_interface.AndroidEnvInterface
+) -> None:
+  """Invalidates the cached metadata under `path` after a write."""
+  view = _active_view(env)
+  if view is not None:
+    view.invalidate(path)
+
+
 def remove_single_file(
     target: str,
     base_path: str,
@@ -99,6 +361,9 @@ def remove_single_file(
           ["shell", "rm", "-r", convert_to_posix_path(base_path, target)],
           env,
       )
+      _invalidate_cached_file_system(
+          convert_to_posix_path(base_path, target), env
+      )
   else:
     logging.warn(
         "Base path %s does not exist, ignoring remove_single_file.", base_path
@@ -135,6 +400,7 @@ def clear_directory(
         ),
         f"Failed to clear directory {directory_path}.",
     )
+    _invalidate_cached_file_system(directory_path, env)
 
 
 def create_file(
@@ -172,6 +438,7 @@ def create_file(
       ],
       env,
   )
+  _invalidate_cached_file_system(f"{directory_path}/{file_name}", env)
   return content
 
 
@@ -197,6 +464,7 @@ def mkdir(directory_path: str, env: env_interface.AndroidEnvInterface) -> None:
       ),
       f"Failed to create directory {directory_path}.",
   )
+  _invalidate_cached_file_system(directory_path, env)
 
 
 def copy_dir(
@@ -229,6 +497,7 @@ def copy_dir(
       ),
       f"Failure copying {source_path} directory to {dest_path}.",
   )
+  _invalidate_cached_file_system(dest_path, env)
 
 
 def check_file_or_folder_exists(
@@ -247,6 +516,21 @@ def check_file_or_folder_exists(
   Raises:
     RuntimeError: When ADB does not correctly execute.
   """
+  view = _active_view(env)
+  if view is not None:
+    full_target_path = _normalize_remote_path(
+        convert_to_posix_path(base_path, target)
+    )
+    try:
+      entries = view.list_directory(base_path, recursive=True)
+    except FileNotFoundError:
+      return False
+    return any(
+        entry.path == full_target_path
+        and (entry.is_file or entry.is_directory)
+        for entry in entries
+    )
+
   if not check_directory_exists(base_path, env):
     return False
 
@@ -280,6 +564,19 @@ def check_file_exists(
   Returns:
     Whether the file exists.
   """
+  view = _active_view(env)
+  if view is not None and bash_file_test in ("-e", "-f", "-d"):
+    entry = view.stat(path)
+    if entry is None:
+      return False
+    # `test` follows symlinks, so leave those to the shell.
+    if not entry.is_symlink:
+      if bash_file_test == "-f":
+        return entry.is_file
+      if bash_file_test == "-d":
+        return entry.is_directory
+      return True
+
   bash_script = f"""
   if [ {bash_file_test} "{path}" ]; then
       echo "Exists"
@@ -311,18 +608,166 @@ def check_directory_exists(
   return check_file_exists(path, env, bash_file_test="-d")
 
 
+# Number of files pulled concurrently when the directory cannot be transferred
+# as a tar archive.
+_MAX_CONCURRENT_PULLS = 4
+
+# Archives the regular files directly inside the current directory to stdout.
+# adb merges stderr into stdout, so warnings are discarded to keep them out of
+# the archive.
+_TAR_REGULAR_FILES_COMMAND = (
+    "find . -maxdepth 1 -type f 2>/dev/null | tar -c -f - -T - 2>/dev/null"
+)
+
+
+def _extract_regular_files(archive: bytes, local_directory: str) -> int:
+  """Streams the regular files of a tar archive into a local directory.
+
+  Members are written chunk by chunk as the archive is read, so no extracted
+  file is ever held in memory on its own. Only regular files directly inside
+  the archived directory are extracted, matching the per-file pull.
+
+  Args:
+    archive: The raw tar archive.
+    local_directory: The directory to write the files to.
+
+  Returns:
+    The number of extracted files.
+
+  Raises:
+    tarfile.TarError: If the archive is malformed.
+  """
+  num_files = 0
+  with tarfile.open(fileobj=io.BytesIO(archive), mode="r|") as tar:
+    for member in tar:
+      file_name = os.path.normpath(member.name)
+      if not member.isfile() or os.path.dirname(file_name):
+        continue
+      source = tar.extractfile(member)
+      with source, open(
+          convert_to_posix_path(local_directory, file_name), "wb"
+      ) as f:
+        shutil.copyfileobj(source, f)
+      num_files += 1
+  return num_files
+
+
+def _pull_directory_as_tar(
+    device_path: str,
+    local_directory: str,
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = None,
+) -> bool:
+  """Copies a directory from the device with a single `tar` adb call.
+
+  Args:
+    device_path: The path of the directory on the Android device.
+    local_directory: The local directory to write the files to.
+    env: The Android environment interface.
+    timeout_sec: A timeout for the ADB operation.
+
+  Returns:
+    Whether the directory was copied. If not, the caller should fall back to
+    pulling the files one by one.
+  """
+  # exec-out keeps the binary archive intact, unlike `shell` which may
+  # translate line endings.
+  response = adb_utils.issue_generic_request(
+      [
+          "exec-out",
+          f"cd {shlex.quote(device_path)} && {_TAR_REGULAR_FILES_COMMAND}",
+      ],
+      env,
+      timeout_sec,
+  )
+  if response.status != adb_pb2.AdbResponse.OK:
+    return False
+  try:
+    num_files = _extract_regular_files(
+        response.generic.output, local_directory
+    )
+  except tarfile.TarError as e:
+    logging.warning("Failed to extract tar archive of %s: %s", device_path, e)
+    return False
+  logging.info("Copied %d files from %s as tar.", num_files, device_path)
+  return True
+
+
+def _pull_file(
+    device_file: str,
+    local_file: str,
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = None,
+) -> None:
+  """Copies a single file from the device to a local file."""
+  pull_response = env.execute_adb_call(
+      adb_pb2.AdbRequest(
+          pull=adb_pb2.AdbRequest.Pull(path=device_file),
+          timeout_sec=timeout_sec,
+      )
+  )
+  adb_utils.check_ok(pull_response)
+  with open(local_file, "wb") as f:
+    f.write(pull_response.pull.content)
+
+
+def _pull_directory_per_file(
+    device_path: str,
+    local_directory: str,
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = None,
+    max_concurrent_pulls: int = _MAX_CONCURRENT_PULLS,
+) -> None:
+  """Copies the regular files of a directory with one adb pull per file.
+
+  At most `max_concurrent_pulls` files are in flight, which also bounds how
+  many file contents are held in memory at once.
+
+  Args:
+    device_path: The path of the directory on the Android device.
+    local_directory: The local directory to write the files to.
+    env: The Android environment interface.
+    timeout_sec: A timeout for the ADB operations.
+    max_concurrent_pulls: Maximum number of concurrent pulls.
+
+  Raises:
+    RuntimeError: If there is an adb communication error.
+  """
+  files = get_file_list_with_metadata(device_path, env, timeout_sec)
+  with futures.ThreadPoolExecutor(max_workers=max_concurrent_pulls) as pool:
+    pulls = [
+        pool.submit(
+            _pull_file,
+            file.full_path,
+            convert_to_posix_path(local_directory, file.file_name),
+            env,
+            timeout_sec,
+        )
+        for file in files
+    ]
+    for pull in pulls:
+      pull.result()
+
+
 @contextlib.contextmanager
 def tmp_directory_from_device(
     device_path: str,
     env: env_interface.AndroidEnvInterface,
     timeout_sec: Optional[float] = None,
+    max_concurrent_pulls: int = _MAX_CONCURRENT_PULLS,
 ):
   """Copy a directory from the device to a local temporary directory using ADB.
 
+  The regular files of the directory are transferred as a single tar archive
+  that is extracted incrementally. If that fails, e.g. because the device has
+  no `tar`, the files are pulled one by one with bounded concurrency.
+
   Args:
     device_path: The path of the directory on the Android device.
     env: The Android environment interface.
     timeout_sec: A timeout for the ADB operations.
+    max_concurrent_pulls: Maximum number of concurrent pulls when falling back
+      to pulling the files one by one.
 
   Yields:
     A temporary folder that contains files copied from the device that is
@@ -344,19 +789,13 @@ def tmp_directory_from_device(
     raise FileNotFoundError(f"{device_path} does not exist.")
   try:
     os.makedirs(tmp_directory, exist_ok=True)
-    files = get_file_list_with_metadata(device_path, env, timeout_sec)
-    for file in files:
-      pull_response = env.execute_adb_call(
-          adb_pb2.AdbRequest(
-              pull=adb_pb2.AdbRequest.Pull(path=file.full_path),
-              timeout_sec=timeout_sec,
-          )
+    if not _pull_directory_as_tar(device_path, tmp_directory, env, timeout_sec):
+      logging.warning(
+          "Falling back to pulling the files of %s one by one.", device_path
+      )
+      _pull_directory_per_file(
+          device_path, tmp_directory, env, timeout_sec, max_concurrent_pulls
       )
-      adb_utils.check_ok(pull_response)
-      with open(
-          convert_to_posix_path(tmp_directory, file.file_name), "wb"
-      ) as f:
-        f.write(pull_response.pull.content)
 
     yield tmp_directory
 
@@ -434,6 +873,7 @@ def copy_file_to_device(
         timeout_sec=timeout_sec,
     )
   push_response = env.execute_adb_call(push_request)
+  _invalidate_cached_file_system(remote_file_path, env)
 
   # ' and whitespace are special characters in adb commands that need to be
   # escaped.
@@ -512,6 +952,25 @@ def get_file_list_with_metadata(
   Raises:
     RuntimeError: If the input directory path is not valid or shell ls fails.
   """
+  view = _active_view(env)
+  if view is not None:
+    try:
+      entries = view.list_directory(directory_path)
+    except FileNotFoundError as e:
+      raise RuntimeError(f"{directory_path} is not a valid directory.") from e
+    return [
+        FileWithMetadata(
+            file_name=posixpath.basename(entry.path),
+            full_path=convert_to_posix_path(
+                directory_path, posixpath.basename(entry.path)
+            ),
+            file_size=entry.size,
+            change_time=entry.access_time,
+        )
+        for entry in sorted(entries, key=lambda entry: entry.path)
+        if entry.is_file
+    ]
+
   if not check_directory_exists(directory_path, env):
     raise RuntimeError(f"{directory_path} is not a valid directory.")
   # Run [adb shell ls] to list all files in the given directory.
@@ -552,6 +1011,121 @@ def get_file_list_with_metadata(
     raise RuntimeError("Failed to list files in directory.") from e
 
 
+def _content_matches(
+    file_content: str, content: str, exact_match: bool
+) -> bool:
+  file_content = file_content.replace("\r", "")
+  if exact_match:
+    return file_content == content
+  return fuzzy_match_lib.fuzzy_match(file_content.strip(), content)
+
+
+def _get_sha256_digests(
+    file_full_paths: list[str],
+    env: env_interface.AndroidEnvInterface,
+    timeout_sec: Optional[float] = None,
+) -> list[Optional[str]]:
+  """Computes the SHA-256 digest of several remote files in one adb call.
+
+  Args:
+    file_full_paths: Full paths to the files.
+    env: The Android environment interface.
+    timeout_sec: A timeout for the ADB operation.
+
+  Returns:
+    The hex digest of each file, in order, or None if it could not be read.
+  """
+  # Hashing stdin keeps file names out of the output, so no parsing of
+  # escaped names is needed.
+  if not file_full_paths:
+    return []
+  try:
+    outputs = adb_utils.issue_batched_shell_request(
+        {
+            f"file{i}": f"sha256sum < {shlex.quote(path)} 2>/dev/null"
+            for i, path in enumerate(file_full_paths)
+        },
+        env,
+        timeout_sec,
+    )
+  except errors.AdbControllerError as e:
+    logging.warning("Failed to compute file digests: %s", e)
+    return [None] * len(file_full_paths)
+  digests = []
+  for i in range(len(file_full_paths)):
+    digest = outputs.get(f"file{i}", "").strip()[:64]
+    digests.append(digest if len(digest) == 64 else None)
+  return digests
+
+
+def check_file_contents(
+    expected_contents: Mapping[str, str],
+    env: env_interface.AndroidEnvInterface,
+    exact_match: bool = False,
+    timeout_sec: Optional[float] = None,
+) -> dict[str, bool]:
+  """Checks the content of several files, transferring as little as possible.
+
+  The digests of all files are first computed on the device in a single adb
+  call. A file whose digest equals the digest of its expected content is
+  matched without transferring it; only the other files are read back and
+  compared as in `check_file_content`, so the results are the same.
+
+  The digests cost one extra adb call, which pays off for exact matches, where
+  files usually match byte for byte, or when checking several files at once.
+
+  Args:
+    expected_contents: Mapping from the full path of each file to its expected
+      content.
+    env: The Android environment interface.
+    exact_match: A boolean indicates whether we use exact match or fuzzy match.
+    timeout_sec: A timeout for the ADB operations.
+
+  Returns:
+    Mapping from the full path of each file to whether it has the expected
+    content. Files that do not exist do not match.
+  """
+  paths = list(expected_contents)
+  digests = _get_sha256_digests(paths, env, timeout_sec)
+  results = {}
+  for path, digest in zip(paths, digests, strict=True):
+    content = expected_contents[path]
+    if digest == hashlib.sha256(content.encode()).hexdigest():
+      results[path] = _content_matches(content, content, exact_match)
+    else:
+      results[path] = _read_and_check_file_content(
+          path, content, env, exact_match, timeout_sec
+      )
+  return results
+
+
+def _read_and_check_file_content(
+    file_full_path: str,
+    content: str,
+    env: env_interface.AndroidEnvInterface,
+    exact_match: bool,
+    timeout_sec: Optional[float],
+) -> bool:
+  """Reads a remote file and compares it to the expected content."""
+  try:
+    res = adb_utils.issue_generic_request(
+        ["shell", "cat", file_full_path], env, timeout_sec
+    )
+    file_content = res.generic.output.decode()
+  except errors.AdbControllerError as e:
+    print(e)
+    return False
+  is_match = _content_matches(file_content, content, exact_match)
+  if not is_match:
+    logging.info(
+        "Content of %s does not match.\nFound: %s\nExpected: %s",
+        file_full_path,
+        file_content,
+        content,
+    )
+  return is_match
+
+
 def check_file_content(
     file_full_path: str,
     content: str,
@@ -561,6 +1135,11 @@ def check_file_content(
 ) -> bool:
   """Check if a file content equals a given string.
 
+  For an exact match, the file is only transferred if its on-device digest
+  differs from the digest of `content`; see `check_file_contents`. Fuzzy
+  matches read the file directly, as text typed by an agent rarely matches
+  byte for byte.
+
   Args:
     file_full_path: Full path to the file, will return False if file does not
       exist.
@@ -573,15 +1152,10 @@ def check_file_content(
     If the given file has the given content, will return False in the case of
     incorrect file path/file does not exist.
   """
-
-  try:
-    res = adb_utils.issue_generic_request(
-        ["shell", "cat", file_full_path], env, timeout_sec
-    )
-    res_content = res.generic.output.decode().replace("\r", "")
-    if exact_match:
-      return res_content == content
-    return fuzzy_match_lib.fuzzy_match(res_content.strip(), content)
-  except errors.AdbControllerError as e:
-    print(e)
-    return False
+  if exact_match:
+    return check_file_contents(
+        {file_full_path: content}, env, exact_match, timeout_sec
+    )[file_full_path]
+  return _read_and_check_file_content(
+      file_full_path, content, env, exact_match, timeout_sec
+  )
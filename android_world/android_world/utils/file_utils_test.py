@@ -13,8 +13,11 @@
 # limitations under the License.
 
 import datetime
+import io
 import os
 import shutil
+import subprocess
+import tarfile
 import tempfile
 from unittest import mock
 
@@ -30,6 +33,342 @@ def create_file_with_contents(file_name: str, contents: bytes) -> str:
     f.write(contents)
 
 
+class FakeDirectoryEnv:
+  """Fake environment serving a local directory as a device directory."""
+
+  def __init__(self, directory: str, supports_tar: bool = True):
+    self._directory = directory
+    self._supports_tar = supports_tar
+    self.num_pulls = 0
+    self.num_tars = 0
+
+  def _generic_response(self, output: bytes) -> adb_pb2.AdbResponse:
+    return adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK,
+        generic=adb_pb2.AdbResponse.GenericResponse(output=output),
+    )
+
+  def _tar(self) -> bytes:
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w') as tar:
+      for file_name in sorted(os.listdir(self._directory)):
+        tar.add(os.path.join(self._directory, file_name), f'./{file_name}')
+    return archive.getvalue()
+
+  def _ls(self) -> bytes:
+    lines = []
+    for file_name in sorted(os.listdir(self._directory)):
+      path = os.path.join(self._directory, file_name)
+      kind = 'd' if os.path.isdir(path) else '-'
+      lines.append(
+          f'{kind}rw-rw---- 1 u0_a158 media_rw {os.path.getsize(path)}'
+          f' 2023-11-28 23:17:43.176000000 +0000 {file_name}'
+      )
+    return '\n'.join(lines).encode()
+
+  def execute_adb_call(self, request: adb_pb2.AdbRequest):
+    if request.HasField('pull'):
+      self.num_pulls += 1
+      with open(
+          os.path.join(self._directory, os.path.basename(request.pull.path)),
+          'rb',
+      ) as f:
+        return adb_pb2.AdbResponse(
+            status=adb_pb2.AdbResponse.Status.OK,
+            pull=adb_pb2.AdbResponse.PullResponse(content=f.read()),
+        )
+    args = list(request.generic.args)
+    if args[0] == 'exec-out':
+      self.num_tars += 1
+      if not self._supports_tar:
+        return self._generic_response(b'/system/bin/sh: tar: not found')
+      return self._generic_response(self._tar())
+    if args[0] == 'shell' and args[1] == 'whoami':
+      return self._generic_response(b'root')
+    if args[0] == 'shell' and 'ls' in args[1].split():
+      return self._generic_response(self._ls())
+    return self._generic_response(b'Exists')
+
+
+class TmpDirectoryFromDeviceTest(parameterized.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.device_directory = self.enter_context(tempfile.TemporaryDirectory())
+    self.contents = {}
+    for i in range(500):
+      self.contents[f'file {i}.txt'] = os.urandom(i * 10)
+      create_file_with_contents(
+          os.path.join(self.device_directory, f'file {i}.txt'),
+          self.contents[f'file {i}.txt'],
+      )
+    os.mkdir(os.path.join(self.device_directory, 'subdir'))
+    create_file_with_contents(
+        os.path.join(self.device_directory, 'subdir', 'nested.txt'), b'nested'
+    )
+
+  def _read_directory(self, directory: str) -> dict[str, bytes]:
+    contents = {}
+    for file_name in os.listdir(directory):
+      with open(os.path.join(directory, file_name), 'rb') as f:
+        contents[file_name] = f.read()
+    return contents
+
+  @parameterized.named_parameters(
+      ('tar', True, 1, 0),
+      ('per_file_fallback', False, 1, 500),
+  )
+  def test_copies_regular_files(self, supports_tar, num_tars, num_pulls):
+    env = FakeDirectoryEnv(self.device_directory, supports_tar)
+
+    with file_utils.tmp_directory_from_device(
+        self.device_directory, env
+    ) as tmp_directory:
+      self.assertEqual(self._read_directory(tmp_directory), self.contents)
+
+    self.assertFalse(os.path.exists(tmp_directory))
+    self.assertEqual(env.num_tars, num_tars)
+    self.assertEqual(env.num_pulls, num_pulls)
+
+  def test_tar_command_keeps_warnings_out_of_the_archive(self):
+    # A `find` that warns on stderr, as for unreadable entries on the device.
+    bin_directory = self.enter_context(tempfile.TemporaryDirectory())
+    fake_find = os.path.join(bin_directory, 'find')
+    with open(fake_find, 'w') as f:
+      f.write(
+          '#!/bin/sh\n'
+          'echo "find: ./private: Permission denied" >&2\n'
+          f'exec {shutil.which("find")} "$@"\n'
+      )
+    os.chmod(fake_find, 0o755)
+
+    # adb merges stderr into stdout.
+    archive = subprocess.run(
+        ['sh', '-c', file_utils._TAR_REGULAR_FILES_COMMAND],
+        cwd=self.device_directory,
+        env={'PATH': f'{bin_directory}:{os.environ["PATH"]}'},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=True,
+    ).stdout
+    local_directory = self.enter_context(tempfile.TemporaryDirectory())
+
+    file_utils._extract_regular_files(archive, local_directory)
+
+    self.assertEqual(self._read_directory(local_directory), self.contents)
+
+  def test_tar_skips_nested_and_unsafe_members(self):
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w') as tar:
+      for name, content in [
+          ('./ok.txt', b'ok'),
+          ('./subdir/nested.txt', b'nested'),
+          ('../escape.txt', b'escape'),
+      ]:
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        tar.addfile(info, io.BytesIO(content))
+    local_directory = self.enter_context(tempfile.TemporaryDirectory())
+
+    num_files = file_utils._extract_regular_files(
+        archive.getvalue(), local_directory
+    )
+
+    self.assertEqual(num_files, 1)
+    self.assertEqual(
+        self._read_directory(local_directory), {'ok.txt': b'ok'}
+    )
+
+
+class LocalShellEnv:
+  """Fake environment running adb shell commands on the host."""
+
+  def __init__(self):
+    self.shell_commands = []
+
+  def execute_adb_call(self, request: adb_pb2.AdbRequest):
+    args = list(request.generic.args)
+    if args[0] != 'shell':
+      return adb_pb2.AdbResponse(status=adb_pb2.AdbResponse.Status.OK)
+    command = ' '.join(args[1:])
+    self.shell_commands.append(command)
+    result = subprocess.run(
+        ['sh', '-c', command], capture_output=True, check=False
+    )
+    return adb_pb2.AdbResponse(
+        status=adb_pb2.AdbResponse.Status.OK,
+        generic=adb_pb2.AdbResponse.GenericResponse(output=result.stdout),
+    )
+
+
+class CachedFileSystemTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.root = self.enter_context(tempfile.TemporaryDirectory())
+    self.documents = os.path.join(self.root, 'Documents')
+    os.makedirs(os.path.join(self.documents, 'nested'))
+    for file_name in ['a.txt', 'b c.txt']:
+      create_file_with_contents(
+          os.path.join(self.documents, file_name), b'12345'
+      )
+    create_file_with_contents(
+        os.path.join(self.documents, 'nested', 'd.txt'), b''
+    )
+    self.env = LocalShellEnv()
+
+  def _query_documents(self):
+    return (
+        file_utils.check_directory_exists(self.documents, self.env),
+        file_utils.check_file_exists(
+            os.path.join(self.documents, 'a.txt'), self.env
+        ),
+        file_utils.check_file_exists(
+            os.path.join(self.documents, 'missing.txt'), self.env
+        ),
+        file_utils.check_file_or_folder_exists(
+            'nested/d.txt', self.documents, self.env
+        ),
+        file_utils.check_file_or_folder_exists(
+            'missing.txt', self.documents, self.env
+        ),
+    )
+
+  def test_answers_repeated_queries_from_one_scan(self):
+    uncached = self._query_documents()
+    num_uncached_commands = len(self.env.shell_commands)
+    self.env.shell_commands.clear()
+
+    with file_utils.cached_file_system(self.env) as view:
+      for _ in range(3):
+        self.assertEqual(self._query_documents(), uncached)
+      files = file_utils.get_file_list_with_metadata(self.documents, self.env)
+
+    self.assertEqual(uncached, (True, True, False, True, False))
+    self.assertEqual(num_uncached_commands, 7)
+    # Shallow scans of the root and Documents, then a full scan of Documents.
+    self.assertEqual(view.num_scans, 3)
+    self.assertLen(self.env.shell_commands, 3)
+    self.assertEqual(
+        [(file.file_name, file.file_size) for file in files],
+        [('a.txt', 5), ('b c.txt', 5)],
+    )
+    self.assertEqual(
+        files[0].full_path, os.path.join(self.documents, 'a.txt')
+    )
+
+  def test_missing_directory(self):
+    missing = os.path.join(self.root, 'missing')
+
+    with file_utils.cached_file_system(self.env) as view:
+      self.assertFalse(file_utils.check_directory_exists(missing, self.env))
+      self.assertFalse(
+          file_utils.check_file_or_folder_exists('a.txt', missing, self.env)
+      )
+      self.assertFalse(
+          file_utils.check_file_exists(
+              os.path.join(missing, 'a.txt'), self.env
+          )
+      )
+      with self.assertRaises(RuntimeError):
+        file_utils.get_file_list_with_metadata(missing, self.env)
+
+    self.assertEqual(view.num_scans, 2)
+
+  def test_writes_invalidate_view(self):
+    new_file = os.path.join(self.documents, 'new.txt')
+
+    with file_utils.cached_file_system(self.env) as view:
+      self.assertFalse(file_utils.check_file_exists(new_file, self.env))
+      file_utils.create_file('new.txt', self.documents, self.env)
+      self.assertTrue(file_utils.check_file_exists(new_file, self.env))
+      file_utils.remove_single_file('new.txt', self.documents, self.env)
+      self.assertFalse(file_utils.check_file_exists(new_file, self.env))
+
+    # remove_single_file's own existence and listing checks hit the view.
+    self.assertEqual(view.num_scans, 3)
+
+  def test_nested_views_are_shared_and_removed_on_exit(self):
+    with file_utils.cached_file_system(self.env) as view:
+      with file_utils.cached_file_system(self.env) as inner_view:
+        self.assertIs(inner_view, view)
+      file_utils.check_directory_exists(self.documents, self.env)
+    file_utils.check_directory_exists(self.documents, self.env)
+
+    self.assertEqual(view.num_scans, 1)
+    self.assertLen(self.env.shell_commands, 2)
+
+
+class CheckFileContentsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = self.enter_context(tempfile.TemporaryDirectory())
+    self.env = LocalShellEnv()
+
+  def _create_file(self, file_name: str, content: str) -> str:
+    path = os.path.join(self.directory, file_name)
+    create_file_with_contents(path, content.encode())
+    return path
+
+  def test_matching_files_are_not_transferred(self):
+    expected = {
+        self._create_file(f'{i}.md', f'Note {i}\n' * 100): f'Note {i}\n' * 100
+        for i in range(10)
+    }
+
+    results = file_utils.check_file_contents(
+        expected, self.env, exact_match=True
+    )
+
+    self.assertEqual(results, {path: True for path in expected})
+    self.assertLen(self.env.shell_commands, 1)
+
+  def test_mismatching_files_are_read_and_fuzzy_matched(self):
+    same = self._create_file('same.md', 'Hello World')
+    close = self._create_file('close.md', 'Hello World!\n')
+    different = self._create_file('different.md', 'Goodbye')
+    missing = os.path.join(self.directory, 'missing.md')
+    expected = {path: 'Hello World' for path in [same, close, different]}
+    expected[missing] = 'Hello World'
+
+    results = file_utils.check_file_contents(expected, self.env)
+
+    self.assertEqual(
+        results, {same: True, close: True, different: False, missing: False}
+    )
+    cat_commands = [
+        command
+        for command in self.env.shell_commands
+        if command.startswith('cat ')
+    ]
+    self.assertEqual(
+        cat_commands, [f'cat {path}' for path in [close, different, missing]]
+    )
+
+  def test_exact_match_on_digest_mismatch(self):
+    path = self._create_file('note.md', 'Hello World!')
+
+    self.assertFalse(
+        file_utils.check_file_content(
+            path, 'Hello World', self.env, exact_match=True
+        )
+    )
+    self.assertTrue(
+        file_utils.check_file_content(
+            path, 'Hello World!', self.env, exact_match=True
+        )
+    )
+
+  def test_fuzzy_match_reads_file_directly(self):
+    path = self._create_file('note.md', 'Hello World\n')
+
+    self.assertTrue(
+        file_utils.check_file_content(path, 'Hello World', self.env)
+    )
+    self.assertEqual(self.env.shell_commands, [f'cat {path}'])
+
+
 class FilesTest(parameterized.TestCase):
 
   def setUp(self):
@@ -109,7 +448,7 @@ class FilesTest(parameterized.TestCase):
               )
           )
           for file_name in file_names
-      ])
+      ], any_order=True)
       self.assertCountEqual(os.listdir(tmp_directory), file_names)
       mock_rmtree.assert_not_called()
     mock_rmtree.assert_called_with(tmp_local_directory)
@@ -12,9 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Utility functions for fuzzy matching."""
+"""Utility functions for fuzzy matching.
+
+Edit distances are computed with the C implementation from python-Levenshtein.
+Similarity ratios use difflib, but skip the full computation whenever one of
+difflib's cheap upper bounds already rules out a match.
+"""
 
 import difflib
+from typing import Iterable, Optional
+
+import Levenshtein
 
 
 # Threshold for determining if two strings are equal using
@@ -22,6 +30,71 @@ import difflib
 _MIN_DIFF_SIMILARITY = 0.9
 
 
+def edit_distance(
+    text1: str, text2: str, max_distance: Optional[int] = None
+) -> int:
+  """Computes the Levenshtein distance between two strings.
+
+  Args:
+    text1: The first text.
+    text2: The second text.
+    max_distance: If set, the computation stops early once the distance is
+      known to exceed it.
+
+  Returns:
+    The edit distance, or max_distance + 1 if it is larger than max_distance.
+  """
+  return Levenshtein.distance(text1, text2, score_cutoff=max_distance)
+
+
+def edit_distances(
+    text: str, candidates: Iterable[str], max_distance: Optional[int] = None
+) -> list[int]:
+  """Computes the edit distance between a text and each of the candidates.
+
+  Args:
+    text: The text to compare against.
+    candidates: The texts to compare to `text`.
+    max_distance: See `edit_distance`.
+
+  Returns:
+    The edit distance to each candidate, in order.
+  """
+  return [
+      Levenshtein.distance(text, candidate, score_cutoff=max_distance)
+      for candidate in candidates
+  ]
+
+
+def text_similarity(text1: str, text2: str, ignore_case: bool = True) -> float:
+  """Computes similiarity between two texts.
+
+  Args:
+    text1: The first text.
+    text2: The second text.
+    ignore_case: Whether to ignore case during comparison.
+
+  Returns:
+    The difflib.SequenceMatcher ratio, between 0 and 1.
+  """
+  if ignore_case:
+    text1 = text1.lower()
+    text2 = text2.lower()
+
+  return difflib.SequenceMatcher(None, text1, text2).ratio()
+
+
+def _ratio_at_least(
+    matcher: difflib.SequenceMatcher, min_similarity: float
+) -> bool:
+  """Returns whether matcher.ratio() >= min_similarity, using cheap bounds."""
+  return (
+      matcher.real_quick_ratio() >= min_similarity
+      and matcher.quick_ratio() >= min_similarity
+      and matcher.ratio() >= min_similarity
+  )
+
+
 def fuzzy_match(text1: str, text2: str, ignore_case: bool = True) -> bool:
   """Compares two strings.
 
@@ -37,15 +110,51 @@ def fuzzy_match(text1: str, text2: str, ignore_case: bool = True) -> bool:
     return False
   text1 = str(text1)
   text2 = str(text2)
+  if ignore_case:
+    text1 = text1.lower()
+    text2 = text2.lower()
+  if text1 == text2:
+    return True
 
-  def text_similarity(text1: str, text2: str, ignore_case: bool) -> float:
-    """Computes similiarity between two texts."""
-    if ignore_case:
-      text1 = text1.lower()
-      text2 = text2.lower()
+  matcher = difflib.SequenceMatcher(None, text1, text2)
+  return _ratio_at_least(matcher, _MIN_DIFF_SIMILARITY)
 
-    return difflib.SequenceMatcher(None, text1, text2).ratio()
-  return (
-      text_similarity(text1, text2, ignore_case=ignore_case)
-      >= _MIN_DIFF_SIMILARITY
-  )
+
+def fuzzy_match_many(
+    candidates: Iterable[str], reference: str, ignore_case: bool = True
+) -> list[bool]:
+  """Compares each candidate to a reference string.
+
+  Equivalent to `[fuzzy_match(c, reference, ignore_case) for c in candidates]`,
+  but only analyzes the reference string once.
+
+  Args:
+    candidates: The texts to compare, e.g. the bodies of all messages.
+    reference: The expected text.
+    ignore_case: Whether to ignore case during comparison.
+
+  Returns:
+    Whether each candidate is approximately equal to the reference.
+  """
+  if reference is None:
+    return [False for _ in candidates]
+  reference = str(reference)
+  if ignore_case:
+    reference = reference.lower()
+  matcher = difflib.SequenceMatcher(None)
+  matcher.set_seq2(reference)
+
+  matches = []
+  for candidate in candidates:
+    if candidate is None:
+      matches.append(False)
+      continue
+    candidate = str(candidate)
+    if ignore_case:
+      candidate = candidate.lower()
+    if candidate == reference:
+      matches.append(True)
+      continue
+    matcher.set_seq1(candidate)
+    matches.append(_ratio_at_least(matcher, _MIN_DIFF_SIMILARITY))
+  return matches
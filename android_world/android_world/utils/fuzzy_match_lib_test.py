@@ -0,0 +1,136 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for fuzzy_match_lib."""
+
+import difflib
+import random
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from android_world.utils import fuzzy_match_lib
+
+
+def _reference_edit_distance(text1: str, text2: str) -> int:
+  """Textbook dynamic-programming Levenshtein distance."""
+  previous = list(range(len(text2) + 1))
+  for i, char1 in enumerate(text1, start=1):
+    current = [i]
+    for j, char2 in enumerate(text2, start=1):
+      current.append(
+          min(
+              previous[j] + 1,
+              current[j - 1] + 1,
+              previous[j - 1] + (char1 != char2),
+          )
+      )
+    previous = current
+  return previous[-1]
+
+
+def _random_texts(seed: int, count: int, alphabet: str = 'abcAB '):
+  rng = random.Random(seed)
+  return [
+      ''.join(rng.choices(alphabet, k=rng.randint(0, 12)))
+      for _ in range(count)
+  ]
+
+
+class EditDistanceTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      ('', '', 0),
+      ('abc', '', 3),
+      ('kitten', 'sitting', 3),
+      ('Settings', 'Setting', 1),
+  )
+  def test_edit_distance(self, text1, text2, expected):
+    self.assertEqual(fuzzy_match_lib.edit_distance(text1, text2), expected)
+
+  def test_edit_distance_matches_reference(self):
+    texts = _random_texts(seed=0, count=60)
+    for text1, text2 in zip(texts, reversed(texts)):
+      self.assertEqual(
+          fuzzy_match_lib.edit_distance(text1, text2),
+          _reference_edit_distance(text1, text2),
+          msg=(text1, text2),
+      )
+
+  @parameterized.parameters(0, 1, 2, 5)
+  def test_bounded_edit_distance(self, max_distance):
+    texts = _random_texts(seed=max_distance, count=60)
+    for text1, text2 in zip(texts, reversed(texts)):
+      self.assertEqual(
+          fuzzy_match_lib.edit_distance(text1, text2, max_distance),
+          min(_reference_edit_distance(text1, text2), max_distance + 1),
+          msg=(text1, text2),
+      )
+
+  def test_edit_distances_matches_edit_distance(self):
+    candidates = _random_texts(seed=1, count=30)
+    for max_distance in (None, 1):
+      self.assertEqual(
+          fuzzy_match_lib.edit_distances('abc', candidates, max_distance),
+          [
+              fuzzy_match_lib.edit_distance('abc', c, max_distance)
+              for c in candidates
+          ],
+      )
+
+
+class FuzzyMatchTest(parameterized.TestCase):
+
+  @parameterized.parameters(True, False)
+  def test_fuzzy_match_matches_difflib(self, ignore_case):
+    texts = _random_texts(seed=2, count=200, alphabet='aabAB')
+    for text1, text2 in zip(texts, reversed(texts)):
+      if ignore_case:
+        expected_ratio = difflib.SequenceMatcher(
+            None, text1.lower(), text2.lower()
+        ).ratio()
+      else:
+        expected_ratio = difflib.SequenceMatcher(None, text1, text2).ratio()
+      self.assertEqual(
+          fuzzy_match_lib.fuzzy_match(text1, text2, ignore_case),
+          expected_ratio >= 0.9,
+          msg=(text1, text2),
+      )
+
+  def test_fuzzy_match_none(self):
+    self.assertFalse(fuzzy_match_lib.fuzzy_match(None, 'abc'))
+    self.assertFalse(fuzzy_match_lib.fuzzy_match('abc', None))
+
+  def test_fuzzy_match_non_string(self):
+    self.assertTrue(fuzzy_match_lib.fuzzy_match(123, '123'))
+
+  @parameterized.parameters(True, False)
+  def test_fuzzy_match_many_matches_fuzzy_match(self, ignore_case):
+    candidates = _random_texts(seed=3, count=100, alphabet='aabAB') + [None]
+    for reference in ('aabab', 'AAB', ''):
+      self.assertEqual(
+          fuzzy_match_lib.fuzzy_match_many(candidates, reference, ignore_case),
+          [
+              fuzzy_match_lib.fuzzy_match(c, reference, ignore_case)
+              for c in candidates
+          ],
+      )
+
+  def test_fuzzy_match_many_none_reference(self):
+    self.assertEqual(
+        fuzzy_match_lib.fuzzy_match_many(['a', 'b'], None), [False, False]
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
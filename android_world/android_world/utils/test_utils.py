@@ -99,6 +99,9 @@ class AdbEvalTestBase(absltest.TestCase):
     self.mock_get_current_activity = mock.patch.object(
         adb_utils, 'get_current_activity'
     ).start()
+    self.mock_get_device_state = mock.patch.object(
+        adb_utils, 'get_device_state'
+    ).start()
     self.mock_forest_to_ui_elements = mock.patch.object(
         representation_utils, 'forest_to_ui_elements'
     ).start()
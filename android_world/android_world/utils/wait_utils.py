@@ -0,0 +1,117 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Utilities to wait for the device to reach a given state."""
+
+import dataclasses
+import time
+from typing import Callable, Generic, TypeVar
+
+from absl import logging
+
+T = TypeVar('T')
+
+
+@dataclasses.dataclass(frozen=True)
+class WaitResult(Generic[T]):
+  """Result of waiting for a condition.
+
+  Attributes:
+    value: The last value returned by the poll function.
+    satisfied: Whether the condition held for `value` before the deadline.
+    elapsed_sec: Time spent waiting, in seconds.
+    num_polls: Number of times the poll function was called.
+  """
+
+  value: T
+  satisfied: bool
+  elapsed_sec: float
+  num_polls: int
+
+
+def wait_until(
+    poll_fn: Callable[[], T],
+    condition: Callable[[T], bool],
+    timeout_sec: float,
+    initial_interval_sec: float = 0.1,
+    max_interval_sec: float = 1.0,
+    backoff_factor: float = 2.0,
+) -> WaitResult[T]:
+  """Polls until a condition holds, backing off exponentially between polls.
+
+  The poll function is always called at least once, and once more at the
+  deadline if the condition has not held before then.
+
+  Args:
+    poll_fn: Function returning the current value, e.g. the UI elements on
+      screen.
+    condition: Predicate on the value returned by `poll_fn`.
+    timeout_sec: Maximum time to wait, in seconds.
+    initial_interval_sec: Time to sleep after the first unsuccessful poll.
+    max_interval_sec: Upper bound on the time to sleep between two polls.
+    backoff_factor: Factor by which the sleep interval grows after each
+      unsuccessful poll.
+
+  Returns:
+    The last polled value and whether the condition held for it.
+  """
+  start = time.monotonic()
+  deadline = start + timeout_sec
+  interval = initial_interval_sec
+  num_polls = 0
+  while True:
+    value = poll_fn()
+    num_polls += 1
+    now = time.monotonic()
+    if condition(value):
+      return WaitResult(value, True, now - start, num_polls)
+    if now >= deadline:
+      return WaitResult(value, False, now - start, num_polls)
+    time.sleep(min(interval, deadline - now))
+    interval = min(interval * backoff_factor, max_interval_sec)
+
+
+def report_wait(
+    result: WaitResult[T], description: str, fixed_wait_sec: float
+) -> float:
+  """Logs how long a wait took compared to the fixed sleep it replaces.
+
+  Args:
+    result: The result of `wait_until`.
+    description: What was waited for, e.g. "call to end".
+    fixed_wait_sec: Duration of the fixed sleep previously used instead.
+
+  Returns:
+    The time saved compared to the fixed sleep, in seconds. Negative if the
+    wait took longer.
+  """
+  saved_sec = fixed_wait_sec - result.elapsed_sec
+  if result.satisfied:
+    logging.info(
+        'Waited %.2fs (%d polls) for %s, %.2fs less than a fixed %.1fs sleep.',
+        result.elapsed_sec,
+        result.num_polls,
+        description,
+        saved_sec,
+        fixed_wait_sec,
+    )
+  else:
+    logging.warning(
+        'Gave up waiting for %s after %.2fs (%d polls); last value: %r.',
+        description,
+        result.elapsed_sec,
+        result.num_polls,
+        result.value,
+    )
+  return saved_sec
@@ -0,0 +1,82 @@
+# Copyright 2025 The android_world Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import time
+from unittest import mock
+
+from absl.testing import absltest
+from android_world.utils import wait_utils
+
+
+class WaitUntilTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.mock_sleep = mock.patch.object(time, 'sleep').start()
+    # Each call to the clock advances it by half a second.
+    self.mock_monotonic = mock.patch.object(
+        time, 'monotonic', side_effect=itertools.count(step=0.5)
+    ).start()
+
+  def tearDown(self):
+    super().tearDown()
+    mock.patch.stopall()
+
+  def test_returns_immediately_if_condition_holds(self):
+    result = wait_utils.wait_until(lambda: 1, lambda x: x == 1, timeout_sec=5)
+
+    self.assertTrue(result.satisfied)
+    self.assertEqual(result.value, 1)
+    self.assertEqual(result.num_polls, 1)
+    self.mock_sleep.assert_not_called()
+
+  def test_backs_off_exponentially_up_to_max_interval(self):
+    values = iter(range(10))
+
+    result = wait_utils.wait_until(
+        lambda: next(values),
+        lambda x: x == 5,
+        timeout_sec=100,
+        initial_interval_sec=0.1,
+        max_interval_sec=0.5,
+    )
+
+    self.assertTrue(result.satisfied)
+    self.assertEqual(result.num_polls, 6)
+    self.assertEqual(
+        [call.args[0] for call in self.mock_sleep.call_args_list],
+        [0.1, 0.2, 0.4, 0.5, 0.5],
+    )
+
+  def test_times_out(self):
+    result = wait_utils.wait_until(lambda: 0, lambda x: x == 1, timeout_sec=2)
+
+    self.assertFalse(result.satisfied)
+    self.assertEqual(result.value, 0)
+    self.assertGreaterEqual(result.elapsed_sec, 2)
+    self.assertEqual(result.num_polls, 4)
+
+  def test_report_wait_returns_time_saved(self):
+    result = wait_utils.WaitResult(
+        value=0, satisfied=True, elapsed_sec=0.5, num_polls=2
+    )
+
+    self.assertAlmostEqual(
+        wait_utils.report_wait(result, 'the test', fixed_wait_sec=5.0), 4.5
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
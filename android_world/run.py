@@ -21,6 +21,7 @@ command-line flags.
 """
 
 from collections.abc import Sequence
+import contextlib
 import os
 
 from absl import app
@@ -30,12 +31,17 @@ from android_world import checkpointer as checkpointer_lib
 from android_world import registry
 from android_world import suite_utils
 from android_world.agents import base_agent
+from android_world.agents import http_utils
 from android_world.agents import human_agent
 from android_world.agents import infer
+from android_world.agents import llm_replay
 from android_world.agents import m3a
+from android_world.agents import prompt_budget
 from android_world.agents import random_agent
 from android_world.agents import seeact
+from android_world.agents import seeact_utils
 from android_world.agents import t3a
+from android_world.env import emulator_snapshot
 from android_world.env import env_launcher
 from android_world.env import interface
 
@@ -129,6 +135,64 @@ _OUTPUT_PATH = flags.DEFINE_string(
 
 # Agent specific.
 _AGENT_NAME = flags.DEFINE_string('agent_name', 'm3a_gpt4v', help='Agent name.')
+_M3A_PIPELINE_SUMMARIZATION = flags.DEFINE_boolean(
+    'm3a_pipeline_summarization',
+    False,
+    'Whether M3A overlaps the summarization LLM call of a step with the next'
+    ' observation.',
+)
+_NUM_ACTION_CANDIDATES = flags.DEFINE_integer(
+    'num_action_candidates',
+    1,
+    'Number of concurrent action selection calls per step for M3A and T3A;'
+    ' the first valid output is used.',
+)
+_PROMPT_MAX_UI_ELEMENT_TOKENS = flags.DEFINE_integer(
+    'prompt_max_ui_element_tokens',
+    None,
+    'If set, M3A and T3A filter, compact and truncate UI element lists to'
+    ' about this many tokens.',
+)
+_PROMPT_MAX_HISTORY_STEPS = flags.DEFINE_integer(
+    'prompt_max_history_steps',
+    None,
+    'If set, M3A and T3A only include the summaries of this many recent steps'
+    ' in prompts.',
+)
+_CACHE_FRIENDLY_PROMPTS = flags.DEFINE_boolean(
+    'cache_friendly_prompts',
+    False,
+    'Whether M3A and T3A put all static instructions at the start of action'
+    ' selection prompts, so providers can serve them from their prompt cache.',
+)
+_LLM_RECORD_PATH = flags.DEFINE_string(
+    'llm_record_path',
+    None,
+    'If set, appends the OpenAI requests and responses of the run to this'
+    ' JSONL file, for later use with --llm_replay_path.',
+)
+_LLM_REPLAY_PATH = flags.DEFINE_string(
+    'llm_replay_path',
+    None,
+    'If set, answers OpenAI requests from a file written with'
+    ' --llm_record_path instead of calling the API.',
+)
+_RESET_SNAPSHOT_NAME = flags.DEFINE_string(
+    'reset_snapshot_name',
+    None,
+    'If set, resets the device before each task by loading the emulator'
+    ' snapshot with this name, when that is cheaper than restoring each app.'
+    ' The snapshot is saved after --perform_emulator_setup. Otherwise, if it'
+    ' does not exist yet, it is saved at the start of the run, after restoring'
+    " the suite's apps from their app snapshots.",
+)
+_RESET_MODE = flags.DEFINE_enum_class(
+    'reset_mode',
+    emulator_snapshot.ResetMode.AUTO,
+    emulator_snapshot.ResetMode,
+    'How to reset the device when --reset_snapshot_name is set.',
+    case_sensitive=False,
+)
 
 _FIXED_TASK_SEED = flags.DEFINE_boolean(
     'fixed_task_seed',
@@ -164,17 +228,39 @@ def _get_agent(
   # Gemini.
   elif _AGENT_NAME.value == 'm3a_gemini_gcp':
     agent = m3a.M3A(
-        env, infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest')
+        env,
+        infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest'),
+        pipeline_summarization=_M3A_PIPELINE_SUMMARIZATION.value,
+        num_action_candidates=_NUM_ACTION_CANDIDATES.value,
+        budget=_prompt_budget(),
+        cache_friendly_prompts=_CACHE_FRIENDLY_PROMPTS.value,
     )
   elif _AGENT_NAME.value == 't3a_gemini_gcp':
     agent = t3a.T3A(
-        env, infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest')
+        env,
+        infer.GeminiGcpWrapper(model_name='gemini-1.5-pro-latest'),
+        num_action_candidates=_NUM_ACTION_CANDIDATES.value,
+        budget=_prompt_budget(),
+        cache_friendly_prompts=_CACHE_FRIENDLY_PROMPTS.value,
     )
   # GPT.
   elif _AGENT_NAME.value == 't3a_gpt4':
-    agent = t3a.T3A(env, infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'))
+    agent = t3a.T3A(
+        env,
+        infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'),
+        num_action_candidates=_NUM_ACTION_CANDIDATES.value,
+        budget=_prompt_budget(),
+        cache_friendly_prompts=_CACHE_FRIENDLY_PROMPTS.value,
+    )
   elif _AGENT_NAME.value == 'm3a_gpt4v':
-    agent = m3a.M3A(env, infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'))
+    agent = m3a.M3A(
+        env,
+        infer.Gpt4Wrapper('gpt-4-turbo-2024-04-09'),
+        pipeline_summarization=_M3A_PIPELINE_SUMMARIZATION.value,
+        num_action_candidates=_NUM_ACTION_CANDIDATES.value,
+        budget=_prompt_budget(),
+        cache_friendly_prompts=_CACHE_FRIENDLY_PROMPTS.value,
+    )
   # SeeAct.
   elif _AGENT_NAME.value == 'seeact':
     agent = seeact.SeeAct(env)
@@ -194,6 +280,73 @@ def _get_agent(
   return agent
 
 
+def _prompt_budget() -> prompt_budget.PromptBudget | None:
+  """Returns the prompt budget configured by the flags, if any."""
+  if (
+      _PROMPT_MAX_UI_ELEMENT_TOKENS.value is None
+      and _PROMPT_MAX_HISTORY_STEPS.value is None
+  ):
+    return None
+  return prompt_budget.PromptBudget(
+      max_ui_element_tokens=_PROMPT_MAX_UI_ELEMENT_TOKENS.value,
+      max_history_steps=_PROMPT_MAX_HISTORY_STEPS.value,
+  )
+
+
+def _prompt_cache_stats(
+    agent: base_agent.EnvironmentInteractingAgent,
+) -> infer.PromptCacheStats | None:
+  """Returns the prompt cache usage of the agent's LLM calls, if tracked."""
+  if isinstance(agent, seeact.SeeAct):
+    return seeact_utils.PROMPT_CACHE.stats
+  llm = getattr(agent, 'llm', None)
+  if isinstance(llm, (infer.LlmWrapper, infer.MultimodalLlmWrapper)):
+    return llm.prompt_cache_stats
+  return None
+
+
+def _llm_transport() -> contextlib.AbstractContextManager[object]:
+  """Returns a context routing LLM requests as configured by the flags."""
+  if _LLM_RECORD_PATH.value and _LLM_REPLAY_PATH.value:
+    raise ValueError('--llm_record_path and --llm_replay_path are exclusive.')
+  if _LLM_RECORD_PATH.value:
+    return http_utils.use_transport(
+        llm_replay.RecordingTransport(_LLM_RECORD_PATH.value)
+    )
+  if _LLM_REPLAY_PATH.value:
+    return http_utils.use_transport(
+        llm_replay.ReplayTransport(_LLM_REPLAY_PATH.value)
+    )
+  return contextlib.nullcontext()
+
+
+def _device_resetter(
+    env: interface.AsyncEnv,
+    suite: suite_utils.Suite,
+) -> emulator_snapshot.DeviceResetter | None:
+  """Returns the device resetter configured by the command-line flags."""
+  if not _RESET_SNAPSHOT_NAME.value:
+    return None
+  console = emulator_snapshot.EmulatorConsole(port=_DEVICE_CONSOLE_PORT.value)
+  resetter = emulator_snapshot.DeviceResetter(
+      env,
+      emulator_snapshot.SnapshotPool(console),
+      snapshot_name=_RESET_SNAPSHOT_NAME.value,
+      mode=_RESET_MODE.value,
+  )
+  if _EMULATOR_SETUP.value:
+    # setup_apps just saved every app snapshot from this device state.
+    resetter.save()
+  else:
+    resetter.ensure_saved([
+        app_name
+        for instances in suite.values()
+        for instance in instances
+        for app_name in instance.app_names
+    ])
+  return resetter
+
+
 def _main() -> None:
   """Runs eval suite and gets rewards back."""
   env = env_launcher.load_and_setup_env(
@@ -214,6 +367,7 @@ def _main() -> None:
   suite.suite_family = _SUITE_FAMILY.value
 
   agent = _get_agent(env, _SUITE_FAMILY.value)
+  device_resetter = _device_resetter(env, suite)
 
   if _SUITE_FAMILY.value.startswith('miniwob'):
     # MiniWoB pages change quickly, don't need to wait for screen to stabilize.
@@ -230,16 +384,21 @@ def _main() -> None:
       f'Starting eval with agent {_AGENT_NAME.value} and writing to'
       f' {checkpoint_dir}'
   )
-  suite_utils.run(
-      suite,
-      agent,
-      checkpointer=checkpointer_lib.IncrementalCheckpointer(checkpoint_dir),
-      demo_mode=False,
-  )
+  with _llm_transport():
+    suite_utils.run(
+        suite,
+        agent,
+        checkpointer=checkpointer_lib.IncrementalCheckpointer(checkpoint_dir),
+        demo_mode=False,
+        device_resetter=device_resetter,
+    )
   print(
       f'Finished running agent {_AGENT_NAME.value} on {_SUITE_FAMILY.value}'
       f' family. Wrote to {checkpoint_dir}.'
   )
+  prompt_cache_stats = _prompt_cache_stats(agent)
+  if prompt_cache_stats is not None:
+    print(f'Prompt cache: {prompt_cache_stats}')
   env.close()
 
 
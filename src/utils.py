@@ -8,7 +8,7 @@ import subprocess
 from pathlib import Path
 from typing import Dict, List
 
-from fuzzywuzzy import fuzz, process
+import Levenshtein
 
 logger = logging.getLogger(__name__)
 
@@ -76,10 +76,22 @@ def validate_action(action: str, ui_elements: List[str]) -> bool:
 
     return False
 
+def fuzzy_ratio(a: str, b: str) -> int:
+    """Return similarity ratio (0-100), identical to ``fuzzywuzzy.fuzz.ratio``.
+
+    Calls the C implementation from python-Levenshtein directly, which is what
+    fuzzywuzzy uses under the hood, without its per-call wrapper overhead.
+    """
+    if a == b:
+        return 100
+    if not a or not b:
+        return 0
+    return int(round(100 * Levenshtein.ratio(a, b)))
+
 def compare_actions(predicted: str, ground_truth: str) -> Dict:
     """Return dict with exact match bool & fuzzy ratio (0-100)."""
     exact_match = predicted.strip() == ground_truth.strip()
-    fuzzy_score = fuzz.ratio(predicted.strip(), ground_truth.strip())
+    fuzzy_score = fuzzy_ratio(predicted.strip(), ground_truth.strip())
     return {
         "exact_match": exact_match,
         "fuzzy_score": fuzzy_score,
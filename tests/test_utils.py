@@ -1,6 +1,9 @@
+import random
+
 import pytest
+from fuzzywuzzy import fuzz
 
-from src.utils import validate_action, compare_actions
+from src.utils import validate_action, compare_actions, fuzzy_ratio
 
 
 def test_validate_action_click():
@@ -17,4 +20,19 @@ def test_validate_action_nav():
 def test_compare_actions_exact():
     res = compare_actions('CLICK("Settings")', 'CLICK("Settings")')
     assert res["exact_match"]
-    assert res["fuzzy_score"] == 100 
\ No newline at end of file
+    assert res["fuzzy_score"] == 100 
+
+
+def test_compare_actions_partial():
+    res = compare_actions('CLICK("Settings")', 'CLICK("Setting")')
+    assert not res["exact_match"]
+    assert 0 < res["fuzzy_score"] < 100
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fuzzy_ratio_matches_fuzzywuzzy(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        a = "".join(rng.choices("abcAB( )", k=rng.randint(0, 12)))
+        b = "".join(rng.choices("abcAB( )", k=rng.randint(0, 12)))
+        assert fuzzy_ratio(a, b) == fuzz.ratio(a, b), (a, b)